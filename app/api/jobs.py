@@ -0,0 +1,252 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from app.core.config import settings
+from app.core.checkpoint import run_config
+from app.core.serialization import json_default
+from app.engine.workflow import prepare_run, astream_run, apending_nodes
+
+# مفاتيح الحالة النهائية التي تُعاد للعميل (الأسعار والرسائل والتتبع الخام لا تُرسل)
+RESULT_KEYS = (
+    "symbol", "sector", "final_report", "forecast_summary", "fundamental_summary",
+    "fundamental_data", "technical_report", "sentiment_report", "risk_report", "defense_report",
+)
+
+
+class QueueFull(Exception):
+    """الطابور ممتلئ: على العميل إعادة المحاولة بعد retry_after ثانية."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"طابور التحليل ممتلئ، أعد المحاولة بعد {retry_after} ثانية.")
+        self.retry_after = retry_after
+
+
+class Job:
+    """
+    طلب تحليل واحد في الطابور وحالته (queued → running → done / error).
+    events: سجل أحداث التقدم المرقمة (seq) لبثها للعملاء (SSE) وإعادة تشغيلها عند إعادة الاتصال.
+    """
+    __slots__ = ("id", "inputs", "status", "submitted_at", "started_at", "finished_at",
+                 "state", "error", "pending", "resume", "cleanup", "events", "_seq", "_changed")
+
+    def __init__(self, inputs: dict, cleanup: str = None):
+        self.inputs, _ = prepare_run(inputs)
+        self.id = self.inputs["run_id"]      # معرف المهمة هو معرف التشغيل (نقاط الحفظ والتتبع)
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.state = None
+        self.error = None
+        self.pending = ()
+        self.resume = False
+        self.cleanup = cleanup               # ملف مؤقت (صورة مرفوعة) يُحذف بعد النجاح أو عند إزالة المهمة
+        self.events = []                     # [(seq, النوع، البيانات)]
+        self._seq = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, kind: str, data):
+        """إضافة حدث للسجل وإيقاظ كل المشتركين المنتظرين."""
+        self._seq += 1
+        self.events.append((self._seq, kind, data))
+        # كل دفعة أحداث توقظ المنتظرين الحاليين، والمنتظرون الجدد ينتظرون الدفعة التالية
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def events_after(self, seq: int) -> list:
+        return [event for event in self.events if event[0] > seq]
+
+    async def wait_for_events(self, seq: int):
+        """انتظار حدث أحدث من seq (يعود فوراً إذا وُجد أو انتهت المهمة)."""
+        if self.finished or (self.events and self.events[-1][0] > seq):
+            return
+        await self._changed.wait()
+
+    def release_inputs(self):
+        """حذف الملف المؤقت للمهمة (لا يُستدعى بعد الفشل: الاستئناف يحتاج الصورة)."""
+        if self.cleanup:
+            try:
+                os.remove(self.cleanup)
+            except OSError:
+                pass
+            self.cleanup = None
+
+    def _compact(self):
+        # بعد الانتهاء: رموز التقرير لا حاجة لها (النص الكامل في النتيجة)، نبقي أحداث التقدم فقط
+        self.events = [event for event in self.events if event[1] != "token"]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def to_dict(self) -> dict:
+        info = {
+            "job_id": self.id,
+            "status": self.status,
+            "symbol": (self.state or {}).get("symbol") or self.inputs.get("symbol"),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.finished_at and self.started_at:
+            info["wall_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.status == "error":
+            info.update(error=self.error, pending_nodes=list(self.pending))
+        return info
+
+
+def sse_message(event: tuple) -> str:
+    """حدث بصيغة Server-Sent Events (id = رقم الحدث لاستئناف البث بـ Last-Event-ID)."""
+    seq, kind, data = event
+    return f"id: {seq}\nevent: {kind}\ndata: {json.dumps(data, default=json_default, ensure_ascii=False)}\n\n"
+
+
+def result_payload(state: dict) -> dict:
+    """نتيجة التحليل بصيغة JSON (الحقول المفيدة للعميل فقط)."""
+    state = state or {}
+    payload = {k: state.get(k) for k in RESULT_KEYS}
+    payload["status"] = "ok" if state.get("market_data") is not None else "no_data"
+    payload["cached"] = bool(state.get("cache_hit"))
+    payload["nodes"] = {span["name"]: span["attributes"]["node.wall_ms"] for span in state.get("trace_spans", [])}
+    return json.loads(json.dumps(payload, default=json_default, ensure_ascii=False))
+
+
+class JobQueue:
+    """
+    طابور مهام التحليل مع عدد محدود من العمال (Bounded Workers) على حلقة أحداث واحدة.
+
+    - كل عامل مهمة asyncio تسحب من الطابور وتشغل المخطط غير المتزامن،
+      فيتشارك العمال النماذج المحملة ومجمع DuckDB ولقطات الأسعار.
+    - التحكم بالقبول (Admission Control): الطابور محدود بـ max_queued؛ عند امتلائه
+      يُرفض الطلب فوراً (QueueFull) مع تقدير لزمن إعادة المحاولة بدل تراكم الطلبات.
+    - المهام المنتهية تبقى في الذاكرة لقراءة نتيجتها، بحد أقصى retention مهمة.
+    """
+
+    def __init__(self, app, workers: int = None, max_queued: int = None, retention: int = None):
+        self.app = app
+        self.workers = workers or settings.API_WORKERS
+        self.max_queued = max_queued or settings.API_QUEUE_SIZE
+        self.retention = retention or settings.API_JOB_RETENTION
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._jobs = OrderedDict()   # job_id -> Job
+        self._tasks = []
+        self._metrics = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0, "running": 0, "run_ms_total": 0.0}
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"✅ API: {self.workers} عامل تحليل، طابور بسعة {self.max_queued}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # المهام في الذاكرة فقط: لا استئناف بعد الإيقاف، فنحذف ملفاتها المؤقتة
+        for job in self._jobs.values():
+            job.release_inputs()
+
+    def submit(self, inputs: dict, cleanup: str = None) -> Job:
+        """إضافة تحليل للطابور. Raises: QueueFull إذا تجاوز الطابور سعته."""
+        job = Job(inputs, cleanup=cleanup)
+        self._enqueue(job)
+        self._jobs[job.id] = job
+        self._metrics["submitted"] += 1
+        self._trim()
+        return job
+
+    def resume(self, job: Job) -> Job:
+        """إعادة مهمة فاشلة للطابور لتُستأنف من آخر خطوة مكتملة (نقاط الحفظ)."""
+        if job.status != "error":
+            raise ValueError(f"المهمة {job.id} ليست في حالة خطأ ({job.status}).")
+        job.resume = True
+        self._enqueue(job)
+        job.status, job.error, job.pending = "queued", None, ()
+        job.started_at = job.finished_at = None
+        job.publish("status", job.to_dict())
+        return job
+
+    def _enqueue(self, job: Job):
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._metrics["rejected"] += 1
+            raise QueueFull(self.retry_after()) from None
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """ترتيب المهمة في الطابور (0 إذا لم تعد منتظرة)."""
+        if job.status != "queued":
+            return 0
+        waiting = [j for j in self._jobs.values() if j.status == "queued"]
+        return waiting.index(job) + 1 if job in waiting else 0
+
+    def retry_after(self) -> int:
+        """تقدير (بالثواني) لزمن تفريغ مكان في الطابور: متوسط زمن التحليل × المنتظرين ÷ العمال."""
+        finished = self._metrics["done"] + self._metrics["failed"]
+        avg_s = self._metrics["run_ms_total"] / finished / 1000 if finished else 30.0
+        return max(1, round(avg_s * max(self._queue.qsize(), 1) / self.workers))
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.status, job.started_at = "running", time.time()
+        self._metrics["running"] += 1
+        job.publish("status", job.to_dict())
+        try:
+            if job.resume:
+                # استئناف من آخر خطوة مكتملة في نقاط الحفظ (بدون ذاكرة النتائج)
+                stream = astream_run(self.app, None, run_config(job.id), use_cache=False, progress=True)
+            else:
+                _, config = prepare_run(job.inputs)
+                stream = astream_run(self.app, job.inputs, config, progress=True)
+            async for kind, value in stream:
+                if kind == "final":
+                    job.state = value or {}
+                else:
+                    job.publish(kind, value)
+            job.status = "done"
+            self._metrics["done"] += 1
+        except Exception as e:
+            try:
+                job.pending = await apending_nodes(self.app, job.id)
+            except Exception:
+                job.pending = ()
+            # الحالة تتغير بعد آخر انتظار: المشتركون لا يرون "انتهت" قبل حدث الخطأ
+            job.status, job.error = "error", str(e)
+            self._metrics["failed"] += 1
+        finally:
+            job.finished_at = time.time()
+            self._metrics["running"] -= 1
+            self._metrics["run_ms_total"] += (job.finished_at - job.started_at) * 1000
+            job._compact()
+            job.publish(job.status, job.to_dict())
+            # المهمة الفاشلة تحتفظ بمدخلاتها للاستئناف حتى تُزال من الذاكرة (_trim)
+            if job.status == "done":
+                job.release_inputs()
+
+    def _trim(self):
+        # حذف أقدم المهام المنتهية عند تجاوز حد الاحتفاظ (المنتظرة والجارية لا تُحذف)
+        excess = len(self._jobs) - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.finished][:max(excess, 0)]:
+            self._jobs.pop(job_id).release_inputs()
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس الطابور (لنقطة /health ولوحة المراقبة)."""
+        snapshot = dict(self._metrics)
+        snapshot.update(
+            queued=self._queue.qsize(),
+            max_queued=self.max_queued,
+            workers=self.workers,
+            jobs=len(self._jobs),
+        )
+        return snapshot
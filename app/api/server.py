@@ -0,0 +1,184 @@
+import asyncio
+import base64
+import binascii
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.checkpoint import aclose_checkpointer
+from app.core.registry import warmup
+from app.engine.workflow import acreate_workflow
+from app.api.jobs import JobQueue, QueueFull, result_payload, sse_message
+
+# خدمة HTTP للتحليل: الطلبات تُضاف لطابور محدود وتُنفذ بعدد ثابت من العمال،
+# والعميل يتابع الحالة ويقرأ النتيجة بمعرف المهمة (بدل حجز اتصال طوال التحليل).
+#   uvicorn app.api.server:app --host 0.0.0.0 --port 8000
+# ⚠️ عملية واحدة فقط (workers=1): DuckDB يسمح بكاتب واحد لملف المستودع،
+#    والتزامن يتم داخل العملية عبر API_WORKERS.
+
+class AnalysisRequest(BaseModel):
+    symbol: Optional[str] = None
+    user_request: str = "قم بعمل تحليل استثماري شامل لهذا السهم."
+    screenshot_base64: Optional[str] = None   # صورة صفقة (JPG/PNG) مرمزة Base64 بدل الرمز
+
+
+@asynccontextmanager
+async def lifespan(api: FastAPI):
+    # المخطط غير المتزامن ونقاط حفظه يُنشآن داخل حلقة الأحداث التي ستشغلهما
+    workflow = acreate_workflow()
+    queue = JobQueue(workflow)
+    queue.start()
+    api.state.jobs = queue
+    # تحميل النماذج في الخلفية: الخدمة تقبل الطلبات فوراً
+    warming = asyncio.create_task(asyncio.to_thread(warmup))
+    try:
+        yield
+    finally:
+        await queue.stop()
+        await warming
+        await aclose_checkpointer(workflow.checkpointer)
+
+
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.VERSION, lifespan=lifespan)
+
+
+def _job_or_404(job_id: str):
+    job = app.state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"لا توجد مهمة بالمعرف {job_id}")
+    return job
+
+
+def _save_screenshot(encoded: str) -> str:
+    # الحد على طول النص المرمز (كل 3 بايت = 4 محارف) حتى لا نفك ترميز جسم ضخم في الذاكرة
+    max_bytes = settings.API_MAX_SCREENSHOT_BYTES
+    if len(encoded) > -(-max_bytes // 3) * 4:
+        raise HTTPException(
+            status_code=413, detail=f"الصورة أكبر من الحد المسموح ({max_bytes // (1024 * 1024)} MB)."
+        )
+    try:
+        data = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=422, detail="screenshot_base64 ليست صورة Base64 صالحة.")
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_file:
+        tmp_file.write(data)
+        return tmp_file.name
+
+
+def _discard(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _busy(e: QueueFull) -> JSONResponse:
+    # ضغط عكسي (Backpressure): 503 مع Retry-After بدل قبول طلب لن يُخدم قريباً
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(e), "retry_after": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: AnalysisRequest):
+    """إضافة تحليل للطابور. Returns: معرف المهمة وترتيبها (202)، أو 503 إذا كان الطابور ممتلئاً."""
+    symbol = (request.symbol or "").strip().upper() or None
+    if not symbol and not request.screenshot_base64:
+        raise HTTPException(status_code=422, detail="يجب تحديد symbol أو screenshot_base64.")
+
+    screenshot_path = _save_screenshot(request.screenshot_base64) if request.screenshot_base64 else None
+    inputs = {"symbol": symbol, "user_request": request.user_request, "retry_count": 0}
+    if screenshot_path:
+        inputs["screenshot_path"] = screenshot_path
+
+    queue = app.state.jobs
+    try:
+        job = queue.submit(inputs, cleanup=screenshot_path)
+    except QueueFull as e:
+        if screenshot_path:
+            _discard(screenshot_path)
+        return _busy(e)
+    return {**job.to_dict(), "position": queue.position(job)}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = _job_or_404(job_id)
+    return {**job.to_dict(), "position": app.state.jobs.position(job)}
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """النتيجة (200) عند الانتهاء، 202 إذا كانت المهمة لم تنته بعد، 500 إذا فشلت."""
+    job = _job_or_404(job_id)
+    if job.status == "done":
+        return {**job.to_dict(), "result": result_payload(job.state)}
+    if job.status == "error":
+        return JSONResponse(status_code=500, content=job.to_dict())
+    return JSONResponse(status_code=202, content={**job.to_dict(), "position": app.state.jobs.position(job)})
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: Optional[int] = Header(default=None)):
+    """
+    بث تقدم المهمة (Server-Sent Events) حتى انتهائها:
+        status      تغيرت حالة المهمة (running / queued عند الاستئناف)
+        node_start  بدأت عقدة             {node, label}
+        node_end    انتهت عقدة             {node, label, status, duration_ms, outputs}
+        draft/token مسودة التقرير ورموزه أثناء الكتابة
+        done/error  انتهت المهمة (النتيجة الكاملة من /jobs/{id}/result)
+    العميل الذي يعيد الاتصال بـ Last-Event-ID يكمل من بعد آخر حدث استلمه.
+    """
+    job = _job_or_404(job_id)
+
+    async def stream():
+        seen = last_event_id or 0
+        while True:
+            for event in job.events_after(seen):
+                seen = event[0]
+                yield sse_message(event)
+            if job.finished and not job.events_after(seen):
+                return
+            await job.wait_for_events(seen)
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/jobs/{job_id}/resume", status_code=202)
+async def resume_job(job_id: str):
+    """استئناف مهمة فاشلة من آخر خطوة مكتملة (409 إذا لم تكن فاشلة)."""
+    job = _job_or_404(job_id)
+    try:
+        app.state.jobs.resume(job)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFull as e:
+        return _busy(e)
+    return {**job.to_dict(), "position": app.state.jobs.position(job)}
+
+
+@app.get("/health")
+async def health():
+    info = {"status": "ok", "version": settings.VERSION, "queue": app.state.jobs.stats()}
+    # ميزانية النماذج تظهر بعد تحميل أول نموذج فقط (لا نستورد openai من أجل الفحص)
+    llm = sys.modules.get("app.core.llm")
+    if llm is not None:
+        info["llm"] = llm.get_llm_budget().stats()
+        if settings.LLM_CACHE_ENABLED:
+            info["llm_cache"] = sys.modules["app.core.llm_cache"].get_llm_cache_store().stats()
+    return info
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=settings.API_HOST, port=settings.API_PORT)
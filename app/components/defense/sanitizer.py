@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
+from app.core.market_data import PriceSeries
 
 class DataSanitizer:
     def __init__(self, model_path="ml_artifacts/isolation_forest.pkl"):
@@ -22,12 +23,13 @@ class DataSanitizer:
         else:
             print(f"⚠️ تحذير: ملف الدفاع غير موجود في {model_path}. سيتم تمرير البيانات دون فحص.")
 
-    def check_and_clean(self, df: pd.DataFrame, col='close') -> tuple[pd.DataFrame, str]:
+    def check_and_clean(self, df, col='close') -> tuple:
         """
         يفحص البيانات ويكتشف الهجمات أو الأخطاء (Anomalies) ويعالجها.
+        df: PriceSeries (من حالة المخطط) أو DataFrame.
         
         Returns:
-            - df_clean: البيانات بعد التنظيف
+            - df_clean: البيانات بعد التنظيف (نفس الكائن إذا لم يتغير شيء، ومن نفس النوع)
             - report: تقرير عما تم اكتشافه
         """
         # حماية من البيانات الفارغة
@@ -41,7 +43,8 @@ class DataSanitizer:
         try:
             # 1. تجهيز البيانات للفحص
             # Isolation Forest يحتاج مصفوفة 2D
-            data_values = df[[col]].values
+            values = np.asarray(df[col], dtype=float)
+            data_values = values.reshape(-1, 1)
 
             # 2. الكشف (Detection)
             # النتيجة: 1 (طبيعي) ، -1 (شاذ/هجوم)
@@ -60,13 +63,17 @@ class DataSanitizer:
             # استراتيجية: الاستبدال بالاستيفاء الخطي (Linear Interpolation)
             # لا نحذف الصفوف لأن ذلك يكسر التسلسل الزمني
             
-            df_clean = df.copy()
+            # نعمل على نسخة من العمود فقط: السلسلة الأصلية مشتركة بين العمال ولا تُعدل
+            # ملء أماكن الشذوذ بمتوسط القيم المجاورة (والأطراف بأقرب قيمة سليمة)
+            normal = anomalies != -1
+            positions = np.arange(len(values))
+            cleaned = np.interp(positions, positions[normal], values[normal])
             
-            # تحديد أماكن الشذوذ واستبدالها بـ NaN
-            df_clean.loc[anomalies == -1, col] = np.nan
-            
-            # ملء الفراغات بمتوسط القيم المجاورة
-            df_clean[col] = df_clean[col].interpolate(method='linear', limit_direction='both')
+            if isinstance(df, PriceSeries):
+                df_clean = df.replace(**{col: cleaned})
+            else:
+                df_clean = df.copy()
+                df_clean[col] = cleaned
             
             report = f"🚨 تم اكتشاف {num_anomalies} نقاط شاذة وتم إصلاحها (Sanitized)."
             print(f"   >> {report}")
@@ -9,10 +9,13 @@ class VolatilityGuard:
         """
         self.window = window
         self.threshold = threshold
+        # عدد أيام الإغلاق التي نحتاجها فعلاً (window عائد = window + 1 سعر)
+        # المتصل يمرر الذيل فقط: guard.check_volatility(series.tail(guard.lookback))
+        self.lookback = window + 1
 
-    def check_volatility(self, df: pd.DataFrame) -> dict:
+    def check_volatility(self, df) -> dict:
         """
-        يفحص استقرار السعر.
+        يفحص استقرار السعر (df: PriceSeries أو DataFrame فيه عمود close).
         Returns:
             dict: {is_volatile (bool), current_volatility (float), message (str)}
         """
@@ -24,38 +27,57 @@ class VolatilityGuard:
             }
 
         try:
-            # 1. حساب العائد اليومي (Daily Returns)
-            # pct_change يحسب نسبة التغير بين اليوم والأمس
-            df['returns'] = df['close'].pct_change()
+            # 1. حساب العائد اليومي (Daily Returns) على آخر النافذة فقط
+            # نسبة التغير بين اليوم والأمس (نقرأ المصفوفة فقط بدون إضافة أعمدة للبيانات)
+            returns = pd.Series(np.asarray(df['close'], dtype=float)[-self.lookback:]).pct_change()
 
             # 2. حساب الانحراف المعياري للعائد (Rolling Standard Deviation)
             # هذا هو المقياس العالمي للتذبذب (Volatility)
-            current_volatility = df['returns'].tail(self.window).std()
+            current_volatility = returns.tail(self.window).std()
             
-            # التعامل مع القيم الفارغة (NaN)
-            if pd.isna(current_volatility):
-                current_volatility = 0.0
-
             # 3. الحكم (Decision)
-            is_volatile = current_volatility > self.threshold
-            
-            status = "خطر (High Risk)" if is_volatile else "آمن (Stable)"
-            score_percentage = current_volatility * 100
-
-            message = f"مستوى التذبذب الحالي: {score_percentage:.2f}% - الحالة: {status}"
-            
-            if is_volatile:
-                print(f"⚠️ تحذير: تم رصد تذبذب عالي ({score_percentage:.2f}%)")
-
-            return {
-                "is_volatile": is_volatile,
-                "score": current_volatility,
-                "message": message
-            }
+            return self._judge(current_volatility)
 
         except Exception as e:
             return {
                 "is_volatile": False, 
                 "score": 0.0, 
                 "message": f"خطأ في حساب التذبذب: {e}"
-            }
\ No newline at end of file
+            }
+
+    def check_features(self, features: pd.DataFrame) -> dict:
+        """
+        نفس الفحص لكن من الخصائص المحسوبة مسبقاً في price_features
+        (FeatureStore.read / latest) بدون إعادة حساب العوائد.
+        متاح فقط لنافذة features.VOLATILITY_WINDOW (العمود vol_14)، وإلا نعود للحساب من الأسعار.
+        """
+        column = f"vol_{self.window}"
+        if (features is None or features.empty or column not in features.columns
+                or pd.isna(features[column].iloc[-1])):
+            return {
+                "is_volatile": False,
+                "score": 0.0,
+                "message": "بيانات غير كافية لفحص التذبذب"
+            }
+        return self._judge(features[column].iloc[-1])
+
+    def _judge(self, current_volatility: float) -> dict:
+        # التعامل مع القيم الفارغة (NaN)
+        if pd.isna(current_volatility):
+            current_volatility = 0.0
+
+        is_volatile = current_volatility > self.threshold
+        
+        status = "خطر (High Risk)" if is_volatile else "آمن (Stable)"
+        score_percentage = current_volatility * 100
+
+        message = f"مستوى التذبذب الحالي: {score_percentage:.2f}% - الحالة: {status}"
+        
+        if is_volatile:
+            print(f"⚠️ تحذير: تم رصد تذبذب عالي ({score_percentage:.2f}%)")
+
+        return {
+            "is_volatile": is_volatile,
+            "score": float(current_volatility),
+            "message": message
+        }
@@ -15,16 +15,17 @@ class TimeSeriesForecaster:
             SeasonalNaive(season_length=5) # النموذج الموسمي: يتوقع تكرار نمط الأسبوع الماضي
         ]
         
-    def predict_trend(self, df: pd.DataFrame, horizon: int = 7) -> dict:
+    def predict_trend(self, df, horizon: int = 7) -> dict:
         """
         يقوم بتحليل السلسلة الزمنية والتنبؤ بالمستقبل.
         
         Args:
-            df: يجب أن يحتوي على الأعمدة ['date', 'close', 'symbol']
+            df: PriceSeries أو DataFrame يحتوي على الأعمدة ['date', 'close', 'symbol']
             horizon: عدد الأيام المراد التنبؤ بها (الافتراضي 7)
             
         Returns:
-            dict: يحتوي على السعر المتوقع، نسبة التغير، وإشارة الترند.
+            dict: يحتوي على السعر المتوقع، نسبة التغير، وإشارة الترند،
+                  و raw_forecast: {'ds': تواريخ، اسم كل نموذج: مصفوفة القيم}.
         """
         # حماية من البيانات غير الكافية
         if df.empty or len(df) < 30:
@@ -33,12 +34,13 @@ class TimeSeriesForecaster:
         try:
             # 1. تجهيز البيانات لتناسب مكتبة StatsForecast
             # المكتبة تشترط أسماء أعمدة محددة: (ds: التاريخ, y: القيمة, unique_id: الرمز)
-            input_df = df.rename(columns={'date': 'ds', 'close': 'y', 'symbol': 'unique_id'})
-            input_df['ds'] = pd.to_datetime(input_df['ds'])
-            
-            # هام جداً: نحتفظ فقط بالأعمدة الأساسية ونتخلص من الحجم وغيره
+            # هام جداً: نبني الجدول من الأعمدة الأساسية فقط ونتخلص من الحجم وغيره
             # لتجنب خطأ "Exogenous Variables" عند التنبؤ بالمستقبل
-            input_df = input_df[['unique_id', 'ds', 'y']]
+            input_df = pd.DataFrame({
+                'unique_id': df['symbol'],
+                'ds': pd.to_datetime(np.asarray(df['date'])),
+                'y': np.asarray(df['close'], dtype=float),
+            })
 
             # 2. تشغيل المحرك
             sf = StatsForecast(
@@ -54,7 +56,7 @@ class TimeSeriesForecaster:
             forecast_df = sf.predict(h=horizon)
             
             # 3. تحليل النتائج واستخلاص "الزبدة"
-            last_actual_price = df['close'].iloc[-1]
+            last_actual_price = float(np.asarray(df['close'])[-1])
             
             # نعتمد على AutoARIMA كنموذج رئيسي للدقة
             future_price = forecast_df['AutoARIMA'].iloc[-1]
@@ -76,8 +78,11 @@ class TimeSeriesForecaster:
                 "forecast_price_7d": future_price,
                 "change_pct": change_pct,
                 "trend_signal": trend,
-                # نعيد البيانات الخام لرسمها في الواجهة لاحقاً
-                "raw_forecast": forecast_df 
+                # نعيد البيانات الخام لرسمها في الواجهة لاحقاً (مصفوفات بدل DataFrame في الحالة)
+                "raw_forecast": {
+                    column: forecast_df[column].to_numpy()
+                    for column in forecast_df.columns if column != 'unique_id'
+                }
             }
 
         except Exception as e:
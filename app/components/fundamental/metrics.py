@@ -1,4 +1,4 @@
-import yfinance as yf
+from app.core.fetcher import get_market_fetcher
 import pandas as pd
 from typing import Dict, Any
 
@@ -14,13 +14,13 @@ class FundamentalMetrics:
         print(f"--- 📊 Fundamental: جلب القوائم المالية لـ {symbol} ---")
         
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            fetcher = get_market_fetcher()
+            info = fetcher.info(symbol)
             
             # في حال فشل الجلب أو الرمز خاطئ
             if not info or 'regularMarketPrice' not in info:
                 # محاولة ثانية للتأكد (أحياناً yfinance يعيد قاموساً فارغاً أول مرة)
-                info = ticker.info
+                info = fetcher.info(symbol)
                 if not info:
                     return {"status": "error", "message": "لم يتم العثور على بيانات مالية"}
 
@@ -107,13 +107,13 @@ class FundamentalMetrics:
         print(f"--- 📊 Fundamental: جلب القوائم المالية لـ {symbol} ---")
         
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            fetcher = get_market_fetcher()
+            info = fetcher.info(symbol)
             
             # في حال فشل الجلب أو الرمز خاطئ
             if not info or 'regularMarketPrice' not in info:
                 # محاولة ثانية للتأكد
-                info = ticker.info
+                info = fetcher.info(symbol)
                 if not info:
                     return {"status": "error", "message": "لم يتم العثور على بيانات مالية"}
 
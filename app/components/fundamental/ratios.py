@@ -1,4 +1,4 @@
-import yfinance as yf
+from app.core.fetcher import get_market_fetcher
 import pandas as pd
 import numpy as np
 
@@ -15,8 +15,10 @@ class FinancialRatios:
         print(f"--- 📊 Ratios: حساب النسب المالية لـ {symbol} ---")
         
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            # نطلب الملخص والقوائم المالية معاً بالتوازي
+            info, financials = get_market_fetcher().many([("info", symbol), ("financials", symbol)])
+            if isinstance(info, Exception):
+                raise info
             
             # حماية: إذا لم تتوفر البيانات
             if not info:
@@ -48,7 +50,8 @@ class FinancialRatios:
             
             # محاولة حساب تغطية الفائدة يدوياً إذا توفرت البيانات
             try:
-                financials = ticker.financials
+                if isinstance(financials, Exception):
+                    raise financials
                 if not financials.empty:
                     ebit = financials.loc['Ebit'].iloc[0] if 'Ebit' in financials.index else 0
                     interest = financials.loc['Interest Expense'].iloc[0] if 'Interest Expense' in financials.index else 1
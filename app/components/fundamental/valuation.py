@@ -1,4 +1,4 @@
-import yfinance as yf
+from app.core.fetcher import get_market_fetcher
 import pandas as pd
 import numpy as np
 
@@ -19,11 +19,15 @@ class ValuationModel:
         print(f"--- 💎 Valuation: حساب القيمة العادلة (Intrinsic Value) لـ {symbol} ---")
         
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            # نطلب الملخص والتدفق النقدي والميزانية معاً بالتوازي
+            info, cash_flow_stmt, balance_sheet = get_market_fetcher().many(
+                [("info", symbol), ("cashflow", symbol), ("balance_sheet", symbol)]
+            )
+            for result in (info, cash_flow_stmt):
+                if isinstance(result, Exception):
+                    raise result
             
             # 1. جلب بيانات التدفق النقدي (Free Cash Flow)
-            cash_flow_stmt = ticker.cashflow
             if cash_flow_stmt.empty:
                  return {"status": "error", "message": "لا توجد بيانات تدفق نقدي متاحة لحساب القيمة."}
             
@@ -74,8 +78,9 @@ class ValuationModel:
             total_value = sum(future_cash_flows) + discounted_terminal_value
             
             # تعديل القيمة بناءً على الكاش والديون (للحصول على قيمة حقوق المساهمين)
-            balance_sheet = ticker.balance_sheet
             try:
+                if isinstance(balance_sheet, Exception):
+                    raise balance_sheet
                 cash_and_equivalents = balance_sheet.loc['Cash And Cash Equivalents'].iloc[0]
                 total_debt = balance_sheet.loc['Total Debt'].iloc[0] if 'Total Debt' in balance_sheet.index else 0
                 equity_value = total_value + cash_and_equivalents - total_debt
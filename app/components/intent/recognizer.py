@@ -0,0 +1,287 @@
+import json
+import os
+import re
+import threading
+from collections import deque
+from app.core.config import settings
+from app.core.database import get_db_pool
+
+# مسار الذاكرة الدلالية (القطاعات، ويمكن إضافة "ALIASES" فيها بنفس صيغة الجدول أدناه)
+SEMANTIC_CACHE_PATH = "cache/semantic_net.json"
+
+# الأسماء الشائعة (عربي وإنجليزي) → الرمز. تُكتب بأي شكل: التطبيع يوحد الهمزات والتشكيل وحالة الأحرف
+ALIASES = {
+    # السوق السعودي
+    "2222.SR": ("أرامكو", "أرامكو السعودية", "aramco", "saudi aramco"),
+    "1120.SR": ("الراجحي", "مصرف الراجحي", "al rajhi", "alrajhi"),
+    "2010.SR": ("سابك", "sabic"),
+    "1180.SR": ("البنك الأهلي", "الأهلي السعودي", "snb"),
+    "7010.SR": ("اس تي سي", "الاتصالات السعودية", "stc"),
+    "2082.SR": ("أكوا باور", "acwa power"),
+    # السوق الأمريكي
+    "AAPL": ("أبل", "آبل", "apple"),
+    "NVDA": ("انفيديا", "إنفيديا", "نفيديا", "nvidia"),
+    "TSLA": ("تسلا", "tesla"),
+    "MSFT": ("مايكروسوفت", "microsoft"),
+    "GOOGL": ("جوجل", "قوقل", "google", "alphabet"),
+    "AMZN": ("أمازون", "amazon"),
+    "META": ("ميتا", "فيسبوك", "facebook"),
+    "INTC": ("إنتل", "انتل", "intel"),
+    "AMD": ("اي ام دي",),
+    # السلع والعملات المشفرة والعملات
+    "GC=F": ("الذهب", "gold", "xauusd"),      # "ذهب" وحدها فعل (ذهبَ) وليست اسماً
+    "SI=F": ("الفضة", "فضة", "silver"),
+    "CL=F": ("النفط", "نفط", "البترول", "crude oil", "oil"),
+    "BTC-USD": ("بيتكوين", "البيتكوين", "bitcoin", "btc"),
+    "ETH-USD": ("إيثريوم", "ايثيريوم", "ethereum", "eth"),
+    "EURUSD=X": ("اليورو دولار", "يورو دولار", "eurusd"),
+    "GBPUSD=X": ("الجنيه الإسترليني", "gbpusd"),
+}
+
+# كلمات تدل على طلب تحليل (بعد التطبيع، تُبحث كجزء من النص)
+ANALYSIS_KEYWORDS = (
+    "حلل", "تحليل", "سعر", "سهم", "توصيه", "تقييم", "توقع", "اشتري", "شراء", "بيع", "استثمار",
+    "analy", "price", "stock", "forecast", "buy", "sell", "invest",
+)
+
+# سوابق عربية ملتصقة بالاسم (والذهب، بأرامكو، للراجحي...)
+CLITICS = {"و", "ب", "ل", "ف", "ك", "ال", "وب", "ول", "فب", "فل", "بال", "وال", "فال", "كال", "لل", "ولل", "فلل"}
+# لام الجر تحذف ألف "ال": للراجحي = ل + الراجحي (الاسم بدون "ال" يُقبل بعدها فقط)
+ARTICLE_CLITICS = {"لل", "ولل", "فلل"}
+
+# رمز مكتوب صراحة وغير موجود في الفهرس (TSLA, 4190.SR, BTC-USD)
+TICKER_PATTERN = re.compile(r"(?<![\w.])(\d{4}\.SR|[A-Z]{2,5}(?:[.\-=][A-Z]{1,4})?)(?![\w.])")
+NOT_TICKERS = {
+    "AI", "OK", "USA", "USD", "SAR", "CEO", "IPO", "ETF", "GDP", "RSI", "MACD", "EPS", "ROE", "PE", "API",
+    "BUY", "SELL", "HOLD",
+}
+
+# درجات الثقة (ما دون settings.INTENT_MIN_CONFIDENCE يُحال لنموذج اللغة)
+CONFIDENCE = {
+    "explicit": 0.95,     # رمز واحد من الفهرس + كلمة تحليل
+    "ticker": 0.8,        # رمز من الفهرس مكتوب صراحة (TSLA, 2222.SR) بدون كلمة تحليل
+    "named": 0.5,         # اسم من الفهرس بدون كلمة تحليل: قد يكون كلمة عادية (apple, oil, gold)
+    "follow_up": 0.8,     # نفس رمز التحليل السابق بدون كلمة تحليل: سؤال متابعة
+    "pattern": 0.75,      # رمز مكتوب صراحة خارج الفهرس + كلمة تحليل
+    "chat": 0.9,          # لا رمز ولا كلمة تحليل: دردشة
+    "ambiguous": 0.4,     # أكثر من رمز في الرسالة
+    "pattern_only": 0.5,  # رمز محتمل خارج الفهرس بدون كلمة تحليل
+    "unknown_name": 0.3,  # كلمة تحليل بدون رمز معروف (اسم شركة خارج الفهرس)
+}
+
+_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")   # التشكيل والتطويل
+_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي",
+    **{chr(0x0660 + d): str(d) for d in range(10)},   # الأرقام العربية-الهندية
+    **{chr(0x06F0 + d): str(d) for d in range(10)},
+})
+_SEPARATORS = re.compile(r"[^\w.\-=]+")
+_LOOSE_PUNCT = re.compile(r"(?<!\w)[.\-=]+|[.\-=]+(?!\w)")   # نقطة أو شرطة ليست داخل رمز
+_ARABIC = re.compile(r"[\u0600-\u06FF]")
+
+
+def normalize_text(text: str) -> str:
+    """
+    تطبيع النص للبحث: حذف التشكيل، توحيد الهمزات والياء والتاء المربوطة والأرقام،
+    أحرف صغيرة، وكل ما ليس حرفاً أو رقماً (أو . - = داخل رمز) يصبح مسافة واحدة.
+    """
+    text = _DIACRITICS.sub("", text or "").translate(_LETTERS).lower()
+    text = _LOOSE_PUNCT.sub(" ", _SEPARATORS.sub(" ", text))
+    return " ".join(text.split())
+
+
+class _AhoCorasick:
+    """فهرس Aho-Corasick: كل الأسماء في مرور واحد على النص مهما كان عددها."""
+
+    def __init__(self, patterns: dict):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for pattern, value in patterns.items():
+            node = 0
+            for char in pattern:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.out[node].append((len(pattern), value))
+
+        # روابط الفشل بالعرض أولاً (BFS)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def search(self, text: str):
+        """Yields: (البداية، النهاية، القيمة) لكل تطابق."""
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, value in self.out[node]:
+                yield i + 1 - length, i + 1, value
+
+
+class TickerRecognizer:
+    """
+    معرّف محلي لنية المستخدم في الدردشة (بدون نموذج لغة):
+    هل يطلب تحليل رمز؟ وما الرمز؟ ومدى الثقة في الحكم.
+
+    الفهرس يُبنى من الرموز المخزنة في قاعدة البيانات، قطاعات الذاكرة الدلالية،
+    وجدول الأسماء العربية والإنجليزية (ALIASES). الحالات الغامضة فقط تُحال لنموذج اللغة.
+    """
+
+    def __init__(self, aliases: dict = None, semantic_path: str = SEMANTIC_CACHE_PATH):
+        self.aliases = aliases or ALIASES
+        self.semantic_path = semantic_path
+        self._lock = threading.Lock()
+        self._metrics = {"calls": 0, "analysis": 0, "chat": 0, "low_confidence": 0}
+        self.refresh()
+
+    def _known_symbols(self) -> set:
+        symbols = set()
+        try:
+            with get_db_pool().connection() as conn:
+                rows = conn.execute(
+                    "SELECT symbol FROM fetch_log UNION SELECT DISTINCT symbol FROM stock_prices"
+                ).fetchall()
+            symbols.update(row[0] for row in rows)
+        except Exception as e:
+            print(f"⚠️ Intent: تعذر قراءة الرموز المخزنة: {e}")
+        return symbols
+
+    def _semantic_net(self) -> dict:
+        if os.path.exists(self.semantic_path):
+            try:
+                with open(self.semantic_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ Intent: فشل تحميل الشبكة الدلالية: {e}")
+        return {}
+
+    def refresh(self, extra_symbols: list = ()):
+        """إعادة بناء الفهرس (مثلاً بعد جلب رموز جديدة)."""
+        semantic_net = self._semantic_net()
+        symbols = self._known_symbols() | set(semantic_net.get("SECTORS", {})) | set(extra_symbols)
+
+        entries = {}   # النص المطبع → (الرمز، يُقبل بعد "لل" فقط)
+        for symbol in symbols:
+            # الرموز الحرفية القصيرة (ON, GE) كلمات عادية: تُعرف فقط إذا كُتبت بأحرف كبيرة (TICKER_PATTERN)
+            if symbol.isalpha() and len(symbol) < 3:
+                continue
+            entries[normalize_text(symbol)] = (symbol.upper(), False)
+            if symbol.upper().endswith(".SR"):
+                entries[normalize_text(symbol[:-3])] = (symbol.upper(), False)   # رقم الشركة وحده (2222)
+        # الأسماء تتقدم على الرموز المخزنة (ARAMCO في القطاعات → 2222.SR)
+        for symbol, names in {**self.aliases, **semantic_net.get("ALIASES", {})}.items():
+            for name in (symbol, *names):
+                name = normalize_text(name)
+                entries[name] = (symbol, False)
+                if name.startswith("ال"):
+                    entries.setdefault(name[2:], (symbol, True))
+
+        index = _AhoCorasick({key: value for key, value in entries.items() if key})
+        with self._lock:
+            self._entries, self._index = entries, index
+
+    def add(self, symbol: str):
+        """إضافة رمز للفهرس (بعد تحليل ناجح لرمز لم يكن معروفاً)."""
+        key = normalize_text(symbol)
+        with self._lock:
+            known = key in self._entries
+        if not known:
+            self.refresh(extra_symbols=[symbol])
+
+    def _matches(self, text: str) -> list:
+        """التطابقات عند حدود الكلمات (مع السوابق العربية)، الأطول أولاً بدون تداخل."""
+        with self._lock:
+            index = self._index
+        found = []
+        for start, end, (symbol, article_dropped) in index.search(text):
+            if end < len(text) and text[end] != " ":
+                continue
+            word_start = text.rfind(" ", 0, start) + 1
+            prefix = text[word_start:start]
+            if article_dropped and prefix not in ARTICLE_CLITICS:
+                continue
+            if prefix and not (prefix in CLITICS and _ARABIC.match(text[start])):
+                continue
+            found.append((start, end, symbol))
+
+        chosen, covered_until = [], -1
+        for start, end, symbol in sorted(found, key=lambda m: (m[0], m[0] - m[1])):
+            if start >= covered_until:
+                chosen.append((start, end, symbol))
+                covered_until = end
+        return chosen
+
+    def recognize(self, user_text: str, last_symbol: str = None) -> dict:
+        """
+        Returns:
+            dict: {is_analysis, symbol, confidence (0..1), source (index/pattern/none), matches}
+            confidence أقل من settings.INTENT_MIN_CONFIDENCE تعني أن الحكم يحتاج نموذج اللغة.
+        """
+        text = normalize_text(user_text)
+        matches = self._matches(text)
+        symbols = list(dict.fromkeys(symbol for _, _, symbol in matches))
+        wants_analysis = any(keyword in text for keyword in ANALYSIS_KEYWORDS)
+
+        if len(symbols) == 1:
+            symbol = symbols[0]
+            if not wants_analysis and last_symbol and symbol == last_symbol.upper():
+                result = self._result(False, None, "follow_up", "index")
+            elif wants_analysis:
+                result = self._result(True, symbol, "explicit", "index")
+            else:
+                written = symbol in TICKER_PATTERN.findall(user_text or "")
+                result = self._result(True, symbol, "ticker" if written else "named", "index")
+        elif symbols:
+            result = self._result(True, symbols[0], "ambiguous", "index")
+        else:
+            candidates = [t for t in TICKER_PATTERN.findall(user_text or "") if t not in NOT_TICKERS]
+            if candidates:
+                result = self._result(True, candidates[0], "pattern" if wants_analysis else "pattern_only", "pattern")
+            elif wants_analysis:
+                result = self._result(True, None, "unknown_name", "none")
+            else:
+                result = self._result(False, None, "chat", "none")
+
+        result["matches"] = [text[start:end] for start, end, _ in matches]
+        self._count(result)
+        return result
+
+    @staticmethod
+    def _result(is_analysis: bool, symbol: str, reason: str, source: str) -> dict:
+        return {
+            "is_analysis": is_analysis,
+            "symbol": symbol,
+            "confidence": CONFIDENCE[reason],
+            "reason": reason,
+            "source": source,
+        }
+
+    def _count(self, result: dict):
+        with self._lock:
+            self._metrics["calls"] += 1
+            if result["confidence"] < settings.INTENT_MIN_CONFIDENCE:
+                self._metrics["low_confidence"] += 1
+            else:
+                self._metrics["analysis" if result["is_analysis"] else "chat"] += 1
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس المعرّف (نسبة الرسائل المحسومة محلياً)."""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["index_entries"] = len(self._entries)
+        decided = snapshot["calls"] - snapshot["low_confidence"]
+        snapshot["local_rate"] = decided / snapshot["calls"] if snapshot["calls"] else 0.0
+        return snapshot
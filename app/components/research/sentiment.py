@@ -1,8 +1,26 @@
 import os
-from tavily import TavilyClient
-from langchain_openai import ChatOpenAI
+from tavily import TavilyClient, AsyncTavilyClient
 from langchain_core.prompts import PromptTemplate
 from app.core.config import settings
+from app.core.registry import get_component
+from app.core.tracing import record
+
+# نستخدم Prompt هندسي دقيق للحصول على نتائج مهيكلة
+SENTIMENT_PROMPT = PromptTemplate.from_template("""
+            أنت خبير مالي متخصص في تحليل سيكولوجية السوق (Market Sentiment).
+            لديك ملخص لأحدث الأخبار عن سهم {symbol}:
+            
+            {news}
+            
+            المطلوب منك بدقة:
+            1. حلل النبرة العامة (Tone) للأخبار: هل هي متفائلة (Bullish) أم متشائمة (Bearish) أم محايدة؟
+            2. أعطني درجة رقمية دقيقة من -1.0 (انهيار/سلبي جداً) إلى 1.0 (نمو/إيجابي جداً).
+            3. اكتب ملخصاً موجزاً (سطرين أو ثلاثة) يشرح السبب وراء تقييمك (ذكر الأحداث الرئيسية).
+            
+            تنسيق الإجابة المطلوب (التزم به حرفياً):
+            SCORE: [الرقم هنا]
+            REASON: [الملخص هنا]
+            """)
 
 class SentimentEngine:
     def __init__(self):
@@ -10,10 +28,15 @@ class SentimentEngine:
         if not settings.TAVILY_API_KEY:
             print("⚠️ تحذير: مفتاح Tavily غير موجود. تحليل المشاعر لن يعمل.")
             self.tavily = None
+            self.atavily = None
         else:
             self.tavily = TavilyClient(api_key=settings.TAVILY_API_KEY)
+            # عميل HTTP غير متزامن للمسار aanalyze (لا يحجز خيطاً أثناء انتظار الشبكة)
+            self.atavily = AsyncTavilyClient(api_key=settings.TAVILY_API_KEY)
             
-        self.llm = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY, temperature=0)
+        # النموذج المشترك (مجمع الاتصالات والميزانية في app/core/llm.py)
+        self.llm = get_component("llm.sentiment")
+        self.chain = SENTIMENT_PROMPT | self.llm
 
     def analyze(self, symbol: str):
         """
@@ -28,61 +51,78 @@ class SentimentEngine:
             return 0.0, "تعذر التحليل: مفتاح البحث غير متوفر."
 
         try:
-            # 1. البحث في الويب (آخر 3 أيام للحصول على أخبار طازجة)
-            # نستخدم كلمات مفتاحية دقيقة لتقليل الضوضاء
-            query = f"{symbol} stock news market sentiment analysis financial reports"
-            response = self.tavily.search(
-                query=query, 
-                topic="news", 
-                days=3, 
-                max_results=5
-            )
-            
-            # تجميع محتوى الأخبار
-            articles = [r['content'] for r in response['results']]
-            news_text = "\n\n".join(articles)
+            # 1. البحث في الويب
+            record(external_calls=1)
+            response = self.tavily.search(**self._search_params(symbol))
+            news_text = self._news_text(response)
             
             if not news_text:
                 return 0.0, "لا توجد أخبار حديثة كافية للتحليل."
 
             # 2. التحليل باستخدام الذكاء الاصطناعي (LLM)
-            # نستخدم Prompt هندسي دقيق للحصول على نتائج مهيكلة
-            prompt = PromptTemplate.from_template("""
-            أنت خبير مالي متخصص في تحليل سيكولوجية السوق (Market Sentiment).
-            لديك ملخص لأحدث الأخبار عن سهم {symbol}:
-            
-            {news}
-            
-            المطلوب منك بدقة:
-            1. حلل النبرة العامة (Tone) للأخبار: هل هي متفائلة (Bullish) أم متشائمة (Bearish) أم محايدة؟
-            2. أعطني درجة رقمية دقيقة من -1.0 (انهيار/سلبي جداً) إلى 1.0 (نمو/إيجابي جداً).
-            3. اكتب ملخصاً موجزاً (سطرين أو ثلاثة) يشرح السبب وراء تقييمك (ذكر الأحداث الرئيسية).
-            
-            تنسيق الإجابة المطلوب (التزم به حرفياً):
-            SCORE: [الرقم هنا]
-            REASON: [الملخص هنا]
-            """)
-            
-            chain = prompt | self.llm
-            result = chain.invoke({"symbol": symbol, "news": news_text})
-            content = result.content
+            result = self.chain.invoke({"symbol": symbol, "news": news_text})
             
             # 3. استخراج النتائج (Parsing)
-            score = 0.0
-            reason = content
-            
-            for line in content.split('\n'):
-                if "SCORE:" in line:
-                    try:
-                        score_str = line.replace("SCORE:", "").strip()
-                        score = float(score_str)
-                    except:
-                        pass
-                if "REASON:" in line:
-                    reason = line.replace("REASON:", "").strip()
+            return self._parse(result.content)
+
+        except Exception as e:
+            print(f"❌ خطأ في تحليل المشاعر: {e}")
+            return 0.0, f"حدث خطأ أثناء تحليل الأخبار: {str(e)}"
+
+    async def aanalyze(self, symbol: str):
+        """
+        نسخة غير متزامنة من analyze (بحث HTTP غير متزامن + ainvoke).
+        """
+        print(f"--- 📰 Sentiment: جاري البحث عن أخبار {symbol} ---")
+        
+        if not self.atavily:
+            return 0.0, "تعذر التحليل: مفتاح البحث غير متوفر."
+
+        try:
+            record(external_calls=1)
+            response = await self.atavily.search(**self._search_params(symbol))
+            news_text = self._news_text(response)
             
-            return score, reason
+            if not news_text:
+                return 0.0, "لا توجد أخبار حديثة كافية للتحليل."
+
+            result = await self.chain.ainvoke({"symbol": symbol, "news": news_text})
+            return self._parse(result.content)
 
         except Exception as e:
             print(f"❌ خطأ في تحليل المشاعر: {e}")
-            return 0.0, f"حدث خطأ أثناء تحليل الأخبار: {str(e)}"
\ No newline at end of file
+            return 0.0, f"حدث خطأ أثناء تحليل الأخبار: {str(e)}"
+
+    @staticmethod
+    def _search_params(symbol: str) -> dict:
+        # آخر 3 أيام للحصول على أخبار طازجة
+        # نستخدم كلمات مفتاحية دقيقة لتقليل الضوضاء
+        return {
+            "query": f"{symbol} stock news market sentiment analysis financial reports",
+            "topic": "news",
+            "days": 3,
+            "max_results": 5,
+        }
+
+    @staticmethod
+    def _news_text(response: dict) -> str:
+        # تجميع محتوى الأخبار
+        articles = [r['content'] for r in response['results']]
+        return "\n\n".join(articles)
+
+    @staticmethod
+    def _parse(content: str):
+        score = 0.0
+        reason = content
+        
+        for line in content.split('\n'):
+            if "SCORE:" in line:
+                try:
+                    score_str = line.replace("SCORE:", "").strip()
+                    score = float(score_str)
+                except:
+                    pass
+            if "REASON:" in line:
+                reason = line.replace("REASON:", "").strip()
+        
+        return score, reason
@@ -0,0 +1,124 @@
+import re
+
+# الأقسام التي يطلبها المراسل في REPORT_PROMPT (عنوان Markdown يحتوي أي كلمة من المجموعة)
+REQUIRED_SECTIONS = {
+    "الملخص والتوصية": ("الملخص", "التوصية", "summary", "recommendation"),
+    "الوضع المالي": ("الوضع المالي", "المالي", "financial", "fundamental"),
+    "التوقيت الفني": ("الفني", "نبض السوق", "technical"),
+    "المخاطر": ("المخاطر", "risk"),
+}
+
+# كلمات التوصية (عربي وإنجليزي)
+# الكلمة العربية يجب أن تكون كلمة كاملة (مع سوابق ال/و/ف/ب/لل فقط):
+# "بيع" داخل "المبيعات" أو "طبيعي" ليست توصية. (\b لا يكفي: الحروف العربية تُعد \w)
+RECOMMENDATION_PATTERN = re.compile(
+    r"((?<![\u0600-\u06FF])(?:و|ف)?(?:ال|ب|لل|بال)?(?:شراء|بيع|انتظار|احتفاظ|تجميع)(?![\u0600-\u06FF])"
+    r"|\b(?:buy|sell|hold|accumulate|strong buy|strong sell)\b)",
+    re.IGNORECASE,
+)
+
+# قائمة خيارات مفصولة بشرطة مائلة ("شراء/بيع/انتظار"): صدى لقالب الأمر وليست توصية
+SLASH_LIST_PATTERN = re.compile(r"[^\s/()]+(?:\s*/\s*[^\s/()]+)+")
+
+# سعر: رقم مع رمز أو اسم عملة، أو بعد كلمة سعر (الرقم وحده مثل 3.5% ليس سعراً)
+PRICE_PATTERN = re.compile(
+    r"([$€£]\s?[\d٠-٩][\d٠-٩,٬]*(?:[.٫][\d٠-٩]+)?"
+    r"|[\d٠-٩][\d٠-٩,٬]*(?:[.٫][\d٠-٩]+)?\s?(?:دولار|ريال|\$|usd|sar)"
+    r"|(?:سعر|السعر|الإغلاق|يتداول عند|price|close[ds]?)\D{0,20}?[\d٠-٩][\d٠-٩,٬]*(?:[.٫][\d٠-٩]+)?(?![\d٠-٩.٫,٬]*\s?%))",
+    re.IGNORECASE,
+)
+
+# مفردات التحليل الفني (بديل عن السعر الصريح في المعيار الأول)
+# مصطلحات محددة فقط: "الاتجاه" أو "التذبذب" وحدها كلمات عامة
+TECHNICAL_PATTERN = re.compile(
+    r"(الدعم|المقاومة|المتوسط المتحرك|مؤشر القوة النسبية|(?:ال)?اتجاه (?:ال)?(?:صاعد|هابط)"
+    r"|\b(?:rsi|macd|support|resistance|moving average|uptrend|downtrend)\b)",
+    re.IGNORECASE,
+)
+
+HEADING_PATTERN = re.compile(r"^\s*#{1,6}\s*(.+)$", re.MULTILINE)
+
+# القسم الذي يجب أن تكون التوصية تحته
+RECOMMENDATION_SECTION = "الملخص والتوصية"
+
+# أقل طول لتقرير حقيقي (أقصر من ذلك = فارغ أو رسالة خطأ)
+MIN_REPORT_CHARS = 80
+
+
+class ReportValidator:
+    """
+    فحص قواعدي (بدون نموذج لغة) لمعايير الناقد:
+    1. هل يحتوي التقرير على سعر حالي أو تحليل فني؟
+    2. هل يحتوي على توصية واضحة (شراء/بيع/احتفاظ) تحت قسم الملخص والتوصية؟
+    إضافة إلى أقسام Markdown التي يطلبها المراسل.
+
+    الحكم حتمي (نفس التقرير → نفس القرار): مقبول، مرفوض، أو غامض (None)
+    والحالة الغامضة فقط تُحال إلى الناقد الذكي.
+    """
+
+    def __init__(self, required_sections: dict = None, min_chars: int = MIN_REPORT_CHARS):
+        self.required_sections = required_sections or REQUIRED_SECTIONS
+        self.min_chars = min_chars
+
+    def check(self, report: str) -> dict:
+        """
+        Returns:
+            dict: {passed (True/False/None), missing (list), message (str)}
+            passed=None تعني أن القواعد لا تكفي للحكم.
+        """
+        text = (report or "").strip()
+        if len(text) < self.min_chars:
+            return {
+                "passed": False,
+                "missing": ["محتوى التقرير"],
+                "message": "التقرير فارغ أو قصير جداً."
+            }
+
+        sections = self._sections(text)
+        summary = " ".join(
+            body for heading, body in sections
+            if any(k.lower() in heading for k in self.required_sections.get(RECOMMENDATION_SECTION, REQUIRED_SECTIONS[RECOMMENDATION_SECTION]))
+        )
+        has_recommendation = bool(RECOMMENDATION_PATTERN.search(SLASH_LIST_PATTERN.sub(" ", summary)))
+        has_price = bool(PRICE_PATTERN.search(text))
+        has_technical = bool(TECHNICAL_PATTERN.search(text))
+
+        headings = [heading for heading, _ in sections]
+        missing_sections = [
+            section for section, keywords in self.required_sections.items()
+            if not any(k.lower() in h for h in headings for k in keywords)
+        ]
+
+        missing = []
+        if not has_recommendation:
+            missing.append("توصية واضحة (شراء/بيع/احتفاظ)")
+        if not (has_price or has_technical):
+            missing.append("سعر حالي أو تحليل فني")
+
+        # الحكم
+        if not missing and not missing_sections:
+            return {"passed": True, "missing": [], "message": "التقرير مطابق للمعايير (فحص القواعد)."}
+
+        if len(missing) == 2:
+            # لا توصية ولا سعر ولا تحليل فني: مرفوض بدون الحاجة لسؤال النموذج
+            return {
+                "passed": False,
+                "missing": missing + missing_sections,
+                "message": "ينقص التقرير: " + "، ".join(missing + missing_sections)
+            }
+
+        # معيار واحد ناقص أو أقسام مفقودة فقط: قد تكون الصياغة مختلفة، نترك الحكم للناقد الذكي
+        return {
+            "passed": None,
+            "missing": missing + missing_sections,
+            "message": "غير محسوم بالقواعد، ينقص: " + "، ".join(missing + missing_sections)
+        }
+
+    @staticmethod
+    def _sections(text: str) -> list:
+        """[(العنوان بأحرف صغيرة، نص القسم)] بترتيب التقرير."""
+        matches = list(HEADING_PATTERN.finditer(text))
+        return [
+            (m.group(1).lower(), text[m.end():matches[i + 1].start() if i + 1 < len(matches) else len(text)])
+            for i, m in enumerate(matches)
+        ]
@@ -3,6 +3,9 @@ import pandas as pd
 import numpy as np
 import os
 
+# أقصى نافذة تحتاجها الخصائص: RSI(14) على الفروقات + هامش بسيط
+FEATURE_WINDOW = 20
+
 class CrashClassifier:
     def __init__(self, model_path="ml_artifacts/xgb_crash.json"):
         """
@@ -22,7 +25,7 @@ class CrashClassifier:
         else:
             print(f"⚠️ تنبيه: ملف النموذج غير موجود في {model_path}. سيعمل النظام بدون حماية مؤقتاً.")
 
-    def predict_risk(self, df: pd.DataFrame) -> float:
+    def predict_risk(self, df) -> float:
         """
         يستقبل بيانات السهم التاريخية، يحسب المؤشرات، ويتنبأ بالخطر.
         Returns:
@@ -37,37 +40,65 @@ class CrashClassifier:
             # يجب أن نحسب نفس الخصائص التي تدرب عليها النموذج في المصنع:
             # [RSI, Volatility, Price_Change]
             
+            # نعمل على آخر النافذة فقط (النتيجة مطابقة للحساب على التاريخ الكامل)
+            # (df: PriceSeries أو DataFrame فيه عمود close)
+            closes = pd.Series(np.asarray(df['close'], dtype=float)[-FEATURE_WINDOW:])
+
             # أ) تغيير السعر (Price Change)
-            last_price = df['close'].iloc[-1]
-            prev_price = df['close'].iloc[-2]
+            last_price = closes.iloc[-1]
+            prev_price = closes.iloc[-2]
             price_change = (last_price - prev_price) / prev_price
             
             # ب) التذبذب (Volatility) - انحراف معياري لآخر 5 أيام
-            volatility = df['close'].pct_change().tail(5).std()
+            volatility = closes.pct_change().tail(5).std()
             
             # ج) مؤشر القوة النسبية (RSI) - معادلة يدوية سريعة
-            delta = df['close'].diff()
+            delta = closes.diff()
             gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
             loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
             rs = gain / loss
             rsi = 100 - (100 / (1 + rs)).iloc[-1]
             
-            # تنظيف القيم (NaN handling)
-            volatility = 0.0 if np.isnan(volatility) else volatility
-            rsi = 50.0 if np.isnan(rsi) else rsi # 50 هو خط المنتصف (محايد)
-            price_change = 0.0 if np.isnan(price_change) else price_change
+            # 2. التنبؤ (Prediction)
+            features = self._feature_matrix([rsi], [volatility], [price_change])
+            return float(self._predict(features)[0])
 
-            # 2. تجهيز البيانات للنموذج
-            # المصفوفة يجب أن تكون بنفس ترتيب التدريب: [RSI, Volatility, PriceChange]
-            features = np.array([[rsi, volatility, price_change]])
-            
-            # 3. التنبؤ (Prediction)
-            # نستخدم predict_proba للحصول على "احتمالية" وليس مجرد 0 أو 1
-            # [0] تعني الصف الأول، [1] تعني احتمالية الكلاس 1 (الانهيار)
-            crash_prob = self.model.predict_proba(features)[0][1]
-            
-            return float(crash_prob)
+        except Exception as e:
+            print(f"⚠️ خطأ أثناء حساب المخاطر: {e}")
+            return 0.0 # نفشل بأمان (Fail Safe)
 
+    def predict_from_features(self, features: pd.DataFrame) -> pd.Series:
+        """
+        التنبؤ لعدة رموز دفعة واحدة من الخصائص المحسوبة مسبقاً في price_features
+        (مثلاً FeatureStore().latest()) بدون إعادة حساب النوافذ المتحركة.
+        Returns:
+            Series: {الرمز: احتمالية الانهيار}
+        """
+        if not self.is_ready or features is None or features.empty:
+            return pd.Series(0.0, index=getattr(features, 'symbol', []), dtype=float)
+
+        try:
+            matrix = self._feature_matrix(features['rsi_14'], features['vol_5'], features['ret'])
+            return pd.Series(self._predict(matrix), index=features['symbol'].values, dtype=float)
         except Exception as e:
             print(f"⚠️ خطأ أثناء حساب المخاطر: {e}")
-            return 0.0 # نفشل بأمان (Fail Safe)
\ No newline at end of file
+            return pd.Series(0.0, index=features['symbol'].values, dtype=float)
+
+    @staticmethod
+    def _feature_matrix(rsi, volatility, price_change) -> np.ndarray:
+        """
+        تجهيز البيانات للنموذج بنفس ترتيب التدريب: [RSI, Volatility, PriceChange]
+        مع تنظيف القيم الفارغة (NaN handling).
+        """
+        matrix = np.column_stack([
+            np.asarray(rsi, dtype=float),
+            np.asarray(volatility, dtype=float),
+            np.asarray(price_change, dtype=float),
+        ])
+        # 50 هو خط المنتصف (محايد) لـ RSI، وصفر للتذبذب وتغير السعر
+        return np.where(np.isnan(matrix), np.array([50.0, 0.0, 0.0]), matrix)
+
+    def _predict(self, features: np.ndarray) -> np.ndarray:
+        # نستخدم predict_proba للحصول على "احتمالية" وليس مجرد 0 أو 1
+        # [:, 1] تعني احتمالية الكلاس 1 (الانهيار)
+        return self.model.predict_proba(features)[:, 1]
\ No newline at end of file
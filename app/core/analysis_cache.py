@@ -0,0 +1,171 @@
+import hashlib
+import pickle
+import re
+import threading
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.core.database import get_db_pool
+
+# مفاتيح الحالة التي تُحفظ من التحليل المكتمل (نتيجة التحليل فقط، بدون الأسعار والتتبع والرسائل)
+# الأسعار لا تُحفظ: المفتاح يتضمن آخر يوم تداول، فتُقرأ من مخزن اللقطات عند الإصابة
+CACHED_KEYS = (
+    "symbol", "sector", "user_request", "final_report",
+    "fundamental_data", "fundamental_summary", "technical_report",
+    "forecast_summary", "forecast_data", "sentiment_report", "risk_report",
+    "defense_report", "is_quality_passed",
+)
+
+
+def normalize_request(user_request: str) -> str:
+    """توحيد نص الطلب (مسافات وحالة الأحرف) حتى لا يفوّت الاختلاف الشكلي الإصابة."""
+    return re.sub(r"\s+", " ", (user_request or "").strip().lower())
+
+
+def config_fingerprint() -> str:
+    """
+    بصمة إعدادات النماذج: أي تغيير في النموذج أو درجات الحرارة أو نسخة النظام أو ANALYSIS_CACHE_VERSION
+    يجعل كل النتائج المخزنة قبله غير صالحة تلقائياً (مفتاح جديد).
+    """
+    parts = (
+        settings.VERSION, settings.MODEL_NAME, str(settings.TEMPERATURE),
+        str(sorted(settings.LLM_TEMPERATURES.items())), settings.ANALYSIS_CACHE_VERSION,
+    )
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+class AnalysisCache:
+    """
+    ذاكرة نتائج التحليل الكامل في جدول analysis_cache داخل DuckDB.
+
+    المفتاح: (الرمز، الطلب بعد التوحيد، آخر يوم تداول، بصمة الإعدادات).
+    تكرار نفس التحليل قبل وصول يوم تداول جديد يُجاب من الجدول بدل تشغيل المخطط.
+    - الصلاحية (TTL): النتيجة تنتهي بعد ttl ثانية حتى لو لم تتغير البيانات.
+    - السعة (LRU): عند تجاوز max_entries نحذف الأقدم استخداماً.
+    """
+
+    def __init__(self, ttl: int = None, max_entries: int = None):
+        self.ttl = settings.ANALYSIS_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_entries = max_entries or settings.ANALYSIS_CACHE_MAX_ENTRIES
+        self.pool = get_db_pool()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def last_bar_date(self, symbol: str):
+        """آخر يوم تداول مخزن للرمز (من fetch_log)، أو None إذا لم يُجلب بعد."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT last_bar_date FROM fetch_log WHERE symbol = ?", [symbol.strip().upper()]
+            ).fetchone()
+        return row[0] if row else None
+
+    def key(self, symbol: str, user_request: str, last_bar_date=None) -> str:
+        """
+        مفتاح النتيجة. last_bar_date: إذا لم يُمرر يُقرأ من fetch_log
+        (يجب أن تكون الأسعار محدّثة قبلها، مثلاً عبر DataLoader.ensure_fresh).
+        """
+        clean_symbol = symbol.strip().upper()
+        if last_bar_date is None:
+            last_bar_date = self.last_bar_date(clean_symbol)
+        raw = "|".join((clean_symbol, normalize_request(user_request), str(last_bar_date), config_fingerprint()))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str):
+        """النتيجة المخزنة (قاموس بمفاتيح CACHED_KEYS) أو None عند عدم الإصابة أو انتهاء الصلاحية."""
+        now = datetime.now()
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT payload, created_at FROM analysis_cache WHERE key = ? AND created_at >= ?",
+                [key, now - timedelta(seconds=self.ttl)],
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE analysis_cache SET last_hit_at = ?, hits = hits + 1 WHERE key = ?", [now, key]
+                )
+
+        with self._lock:
+            self._metrics["hits" if row is not None else "misses"] += 1
+        if row is None:
+            return None
+
+        result = pickle.loads(row[0])
+        result["cached_at"] = row[1].isoformat()
+        return result
+
+    def put(self, key: str, state: dict) -> bool:
+        """
+        حفظ نتيجة تحليل مكتمل. التحليلات الفاشلة أو بدون تقرير أو التي رفضها الناقد
+        (أو قبلها قسراً بعد تجاوز المحاولات) لا تُحفظ.
+        Returns: True إذا حُفظت.
+        """
+        if not state or not state.get("final_report") or state.get("market_data") is None:
+            return False
+        if state.get("is_quality_passed") is False or state.get("quality_forced"):
+            return False
+
+        payload = pickle.dumps({k: state[k] for k in CACHED_KEYS if k in state}, protocol=pickle.HIGHEST_PROTOCOL)
+        now = datetime.now()
+        with self.pool.connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO analysis_cache
+                    (key, symbol, user_request, created_at, last_hit_at, hits, payload)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+            """, [key, state.get("symbol"), normalize_request(state.get("user_request")), now, now, payload])
+            evicted = self._evict(conn, now)
+
+        with self._lock:
+            self._metrics["stores"] += 1
+            self._metrics["evictions"] += evicted
+        return True
+
+    def _evict(self, conn, now) -> int:
+        # 1. النتائج المنتهية الصلاحية
+        expired = conn.execute(
+            "DELETE FROM analysis_cache WHERE created_at < ? RETURNING key", [now - timedelta(seconds=self.ttl)]
+        ).fetchall()
+        # 2. ما زاد عن السعة: الأقدم استخداماً أولاً (LRU)
+        overflow = conn.execute("""
+            DELETE FROM analysis_cache WHERE key IN (
+                SELECT key FROM analysis_cache ORDER BY last_hit_at DESC OFFSET ?
+            ) RETURNING key
+        """, [self.max_entries]).fetchall()
+        return len(expired) + len(overflow)
+
+    def invalidate(self, symbol: str = None) -> int:
+        """حذف النتائج المخزنة (لرمز واحد أو للكل). Returns: عدد الصفوف المحذوفة."""
+        with self.pool.connection() as conn:
+            if symbol is None:
+                rows = conn.execute("DELETE FROM analysis_cache RETURNING key").fetchall()
+            else:
+                rows = conn.execute(
+                    "DELETE FROM analysis_cache WHERE symbol = ? RETURNING key", [symbol.strip().upper()]
+                ).fetchall()
+        return len(rows)
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس الذاكرة (للوحة الإدارة والمراقبة)."""
+        with self._lock:
+            snapshot = dict(self._metrics)
+        with self.pool.connection() as conn:
+            snapshot["entries"] = conn.execute("SELECT count(*) FROM analysis_cache").fetchone()[0]
+        snapshot["ttl"] = self.ttl
+        snapshot["max_entries"] = self.max_entries
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+
+# نسخة واحدة من الذاكرة (Singleton Pattern)
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+def get_analysis_cache() -> AnalysisCache:
+    """
+    يعيد ذاكرة نتائج التحليل المشتركة. إذا لم تكن موجودة، يقوم بإنشائها.
+    """
+    global _analysis_cache
+
+    if _analysis_cache is None:
+        with _analysis_cache_lock:
+            if _analysis_cache is None:
+                _analysis_cache = AnalysisCache()
+    return _analysis_cache
@@ -0,0 +1,183 @@
+import os
+import uuid
+from datetime import date, timedelta
+from app.core.config import settings
+from app.core.database import get_db_pool, archive_scan_sql, create_price_view
+
+class PriceArchive:
+    """
+    الطبقة الباردة لتاريخ الأسعار (Cold Tier).
+
+    الصفوف القديمة تُصدّر من stock_prices إلى ملفات Parquet مقسمة بأسلوب Hive
+    (symbol=.../year=...) ثم تُحذف من قاعدة البيانات، فيبقى ملف DuckDB صغيراً
+    وسريعاً في النسخ الاحتياطي والإقلاع. القراءة تتم عبر العرض price_history
+    الذي يوحد الطبقتين بشكل شفاف.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.ARCHIVE_PATH
+        self.pool = get_db_pool()
+
+    def compact(self, older_than_days: int = None) -> dict:
+        """
+        نقل الصفوف الأقدم من older_than_days يوماً إلى الأرشيف.
+        العملية قابلة للإعادة بأمان: الصف الموجود مسبقاً في الأرشيف لا يُصدّر مرتين،
+        بل يُعاد كتابة قسمه (symbol/year) بالقيم الساخنة، لأن الساخن أحدث
+        (مثلاً بعد إعادة تحميل كاملة عدّلت التاريخ بسبب تجزئة السهم).
+
+        Returns:
+            dict: {rows, symbols, cutoff, rewritten}
+        """
+        days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+        cutoff = date.today() - timedelta(days=days)
+        target = os.path.abspath(self.path)
+
+        print(f"--- 🧊 Archive: نقل الأسعار الأقدم من {cutoff} إلى {target} ---")
+
+        # التاريخ يُولد داخلياً (وليس من المستخدم)، لذا يمكن تضمينه مباشرة في أمر COPY
+        aged = f"""
+            SELECT h.symbol, h.date, h.open, h.high, h.low, h.close, h.volume,
+                   year(h.date) AS year
+            FROM stock_prices h
+            WHERE h.date < DATE '{cutoff.isoformat()}'
+        """
+
+        with self.pool.connection() as conn:
+            rows, symbols = conn.execute(
+                f"SELECT COUNT(*), COUNT(DISTINCT symbol) FROM ({aged})"
+            ).fetchone()
+
+            # 1. الأقسام التي تحتوي أياماً ساخنة مؤرشفة مسبقاً: تُعاد كتابتها (الساخن يفوز)
+            rewritten = self._rewrite_overlapping(conn, aged)
+
+            # 2. التصدير إلى Parquet (إضافة ملفات جديدة دون المساس بالقديمة)
+            archive_scan = archive_scan_sql(self.path)
+            if archive_scan is not None:
+                aged += f"""
+                  AND NOT EXISTS (
+                      SELECT 1 FROM {archive_scan} a
+                      WHERE a.symbol = h.symbol AND a.date = h.date
+                  )
+                """
+            if conn.execute(f"SELECT COUNT(*) FROM ({aged})").fetchone()[0]:
+                os.makedirs(target, exist_ok=True)
+                conn.execute(f"""
+                    COPY ({aged}) TO '{target}'
+                    (FORMAT PARQUET, PARTITION_BY (symbol, year), APPEND)
+                """)
+
+            # 3. الحذف من الطبقة الساخنة داخل معاملة واحدة
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                conn.execute("DELETE FROM stock_prices WHERE date < ?", [cutoff])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            # 4. تحديث العرض الموحد ليشمل الملفات الجديدة
+            create_price_view(conn, self.path)
+
+        print(f"   ✅ تم أرشفة {rows} صف لـ {symbols} رمز (أُعيدت كتابة {rewritten} قسم).")
+        return {"rows": rows, "symbols": symbols, "cutoff": cutoff, "rewritten": rewritten}
+
+    def _partition_files(self, conn, where: str = "TRUE", params: list = ()) -> dict:
+        """{(الرمز، السنة): [ملفات القسم]} للأقسام المطابقة للشرط (على الأعمدة a.symbol و a.year)."""
+        archive_scan = archive_scan_sql(self.path)
+        if archive_scan is None:
+            return {}
+        archive_scan = archive_scan.replace("hive_partitioning", "filename = true, hive_partitioning")
+        rows = conn.execute(
+            f"SELECT DISTINCT a.symbol, a.year, a.filename FROM {archive_scan} a WHERE {where}", list(params)
+        ).fetchall()
+        files = {}
+        for symbol, year, filename in rows:
+            files.setdefault((symbol, year), []).append(filename)
+        return files
+
+    def _rewrite_overlapping(self, conn, aged: str) -> int:
+        """
+        دمج الصفوف الساخنة في أقسام الأرشيف التي تحتوي نفس الأيام:
+        القسم يُكتب من جديد (الأرشيف القديم + الساخن، والساخن يفوز عند التكرار) ثم تُحذف ملفاته القديمة.
+        Returns: عدد الأقسام المعاد كتابتها.
+        """
+        archive_scan = archive_scan_sql(self.path)
+        if archive_scan is None:
+            return 0
+        overlapping = conn.execute(f"""
+            SELECT DISTINCT h.symbol, h.year FROM ({aged}) h
+            JOIN {archive_scan} a ON a.symbol = h.symbol AND a.date = h.date
+        """).fetchall()
+        if not overlapping:
+            return 0
+
+        files = self._partition_files(
+            conn, "list_contains(?, a.symbol || '|' || a.year)", [[f"{s}|{y}" for s, y in overlapping]]
+        )
+        columns = "date, open, high, low, close, volume"
+        for (symbol, year), old_files in files.items():
+            # الملف الجديد يُكتب باسم مؤقت (لا يطابق *.parquet) ثم يحل محل الملفات القديمة
+            folder = os.path.dirname(old_files[0])
+            tmp_path = os.path.join(folder, f"rewrite_{uuid.uuid4().hex}.tmp")
+            conn.execute(f"""
+                COPY (
+                    SELECT {columns} FROM ({aged}) h WHERE h.symbol = $symbol AND h.year = $year
+                    UNION ALL
+                    SELECT {columns} FROM read_parquet($old_files) a
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM ({aged}) h WHERE h.symbol = $symbol AND h.date = a.date
+                    )
+                    ORDER BY date
+                ) TO '{tmp_path}' (FORMAT PARQUET)
+            """, {"symbol": symbol, "year": year, "old_files": old_files})
+            for old_file in old_files:
+                os.remove(old_file)
+            os.replace(tmp_path, os.path.join(folder, f"data_{uuid.uuid4().hex}.parquet"))
+        return len(files)
+
+    def drop_range(self, ranges: dict) -> int:
+        """
+        حذف الأيام المؤرشفة التي أُعيد تحميلها كاملة (تاريخها المؤرشف لم يعد مطابقاً
+        بعد تعديل التجزئة/التوزيعات)، ثم تحديث العرض الموحد.
+        الأيام الأقدم من مدى إعادة التحميل تبقى (لا مصدر آخر لها).
+
+        Args:
+            ranges: {الرمز: (أول يوم، آخر يوم)} من البيانات المعاد تحميلها.
+        Returns: عدد الأقسام المعاد كتابتها أو المحذوفة.
+        """
+        if not ranges:
+            return 0
+        with self.pool.connection() as conn:
+            files = self._partition_files(
+                conn,
+                "list_contains(?, a.symbol || '|' || a.year)",
+                [[f"{symbol}|{year}" for symbol, (first, last) in ranges.items()
+                  for year in range(first.year, last.year + 1)]],
+            )
+            for (symbol, year), old_files in files.items():
+                first, last = ranges[symbol]
+                folder = os.path.dirname(old_files[0])
+                tmp_path = os.path.join(folder, f"rewrite_{uuid.uuid4().hex}.tmp")
+                kept = conn.execute(f"""
+                    COPY (
+                        SELECT date, open, high, low, close, volume FROM read_parquet($old_files)
+                        WHERE date < $first OR date > $last
+                        ORDER BY date
+                    ) TO '{tmp_path}' (FORMAT PARQUET)
+                """, {"old_files": old_files, "first": first, "last": last}).fetchone()[0]
+                for old_file in old_files:
+                    os.remove(old_file)
+                if kept:
+                    os.replace(tmp_path, os.path.join(folder, f"data_{uuid.uuid4().hex}.parquet"))
+                    continue
+                os.remove(tmp_path)
+                # حذف مجلدات الأقسام الفارغة (year=... ثم symbol=...)
+                for empty in (folder, os.path.dirname(folder)):
+                    try:
+                        os.rmdir(empty)
+                    except OSError:
+                        pass
+            create_price_view(conn, self.path)
+        if files:
+            print(f"   🧊 Archive: حذف الأيام المعاد تحميلها من {len(files)} قسم مؤرشف.")
+        return len(files)
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from app.core.config import settings
+
+# نقاط الحفظ (Checkpoints) في ملف SQLite مستقل عن مستودع DuckDB:
+# LangGraph يحفظ الحالة بعد كل خطوة مكتملة، فإذا سقط التحليل في المراسل أو الناقد
+# نستأنف من آخر عقدة مكتملة بدل إعادة التحميل والتحليل الأساسي والمشاعر والكمي.
+
+def _serializer():
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    # pickle_fallback: الحالة تحمل كائنات خاصة (PriceSeries, MarketDataHandle)
+    # لا يعرفها msgpack، فتُحفظ عبر pickle (__reduce__) بدل أن يفشل الحفظ
+    return JsonPlusSerializer(pickle_fallback=True)
+
+
+def new_run_id() -> str:
+    """معرف تشغيل جديد (هو نفسه thread_id في نقاط الحفظ و trace_id في التتبع)."""
+    return uuid.uuid4().hex
+
+
+def run_config(run_id: str) -> dict:
+    """إعدادات LangGraph لتشغيل (أو استئناف) تحليل بمعرفه."""
+    return {"configurable": {"thread_id": run_id}}
+
+
+def _memory_saver(reason: Exception):
+    # بدون langgraph-checkpoint-sqlite / aiosqlite: نقاط حفظ في الذاكرة (الاستئناف داخل نفس العملية فقط)
+    from langgraph.checkpoint.memory import MemorySaver
+
+    print(f"⚠️ Checkpoints: {reason}. نقاط الحفظ في الذاكرة فقط (ثبّت langgraph-checkpoint-sqlite و aiosqlite).")
+    return MemorySaver(serde=_serializer())
+
+
+def _checkpoint_time(checkpoint_id: str) -> float:
+    """وقت إنشاء نقطة الحفظ (Unix) من معرفها: LangGraph يولد المعرفات بصيغة UUIDv6 (الوقت مضمّن فيها)."""
+    value = uuid.UUID(checkpoint_id).int
+    ticks = ((value >> 80) << 12) | ((value >> 64) & 0x0FFF)   # وحدات 100ns منذ 1582-10-15
+    return (ticks - 0x01B21DD213814000) / 1e7
+
+
+def prune_checkpoints(path: str = None, max_age_days: int = None, max_runs: int = None) -> int:
+    """
+    حذف نقاط حفظ التشغيلات القديمة (كل خطوة تحمل نسخة من الحالة بما فيها الأسعار):
+    - كل تشغيل آخر خطوة فيه أقدم من max_age_days يوماً.
+    - ما زاد عن آخر max_runs تشغيل.
+    Returns: عدد التشغيلات المحذوفة.
+    """
+    path = path or settings.CHECKPOINT_PATH
+    max_age_days = settings.CHECKPOINT_RETENTION_DAYS if max_age_days is None else max_age_days
+    max_runs = settings.CHECKPOINT_MAX_RUNS if max_runs is None else max_runs
+    if not os.path.exists(path):
+        return 0
+
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        try:
+            latest = conn.execute(
+                "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return 0   # ملف جديد لم تُنشأ جداوله بعد
+
+        # معرفات UUIDv6 مرتبة زمنياً: الأحدث أولاً
+        latest.sort(key=lambda row: row[1], reverse=True)
+        cutoff = time.time() - max_age_days * 86400
+        expired = [
+            (thread_id,) for i, (thread_id, checkpoint_id) in enumerate(latest)
+            if i >= max_runs or _checkpoint_time(checkpoint_id) < cutoff
+        ]
+        if expired:
+            with conn:
+                conn.executemany("DELETE FROM checkpoints WHERE thread_id = ?", expired)
+                conn.executemany("DELETE FROM writes WHERE thread_id = ?", expired)
+            print(f"🧹 Checkpoints: حذف نقاط حفظ {len(expired)} تشغيل قديم.")
+        return len(expired)
+    finally:
+        conn.close()
+
+
+def _prune_quietly():
+    # التنظيف لا يجب أن يمنع التحليل
+    try:
+        prune_checkpoints()
+    except Exception as e:
+        print(f"⚠️ Checkpoints: تعذر تنظيف نقاط الحفظ القديمة: {e}")
+
+
+# نسخة واحدة من الحافظ المتزامن (Singleton Pattern)
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+
+def get_checkpointer():
+    """
+    يعيد حافظ نقاط SQLite المشترك للمخطط المتزامن (None إذا كان الحفظ معطلاً).
+    اتصال واحد مشترك بين الخيوط، و SqliteSaver يسلسل الكتابة بقفل داخلي.
+    عند الإنشاء تُحذف نقاط التشغيلات القديمة (CHECKPOINT_RETENTION_DAYS / CHECKPOINT_MAX_RUNS).
+    """
+    global _checkpointer
+
+    if not settings.CHECKPOINT_ENABLED:
+        return None
+
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                try:
+                    from langgraph.checkpoint.sqlite import SqliteSaver
+                except ImportError as e:
+                    _checkpointer = _memory_saver(e)
+                    return _checkpointer
+
+                os.makedirs(os.path.dirname(settings.CHECKPOINT_PATH) or ".", exist_ok=True)
+                _prune_quietly()
+                conn = sqlite3.connect(settings.CHECKPOINT_PATH, check_same_thread=False)
+                _checkpointer = SqliteSaver(conn, serde=_serializer())
+                print(f"✅ Checkpoints: نقاط الحفظ في {settings.CHECKPOINT_PATH}")
+    return _checkpointer
+
+
+def aget_checkpointer():
+    """
+    حافظ نقاط غير متزامن (aiosqlite) للمخطط غير المتزامن.
+    يرتبط بحلقة الأحداث الحالية، لذلك يُنشأ داخلها (وليس Singleton).
+    Returns: None إذا كان الحفظ معطلاً أو لا توجد حلقة أحداث تعمل.
+    """
+    if not settings.CHECKPOINT_ENABLED:
+        return None
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        print("⚠️ Checkpoints: لا توجد حلقة أحداث تعمل، سيعمل المخطط غير المتزامن بدون نقاط حفظ.")
+        return None
+
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        return _memory_saver(e)
+
+    os.makedirs(os.path.dirname(settings.CHECKPOINT_PATH) or ".", exist_ok=True)
+    _prune_quietly()
+    return AsyncSqliteSaver(aiosqlite.connect(settings.CHECKPOINT_PATH), serde=_serializer())
+
+
+async def aclose_checkpointer(checkpointer):
+    """
+    إغلاق اتصال الحافظ غير المتزامن عند انتهاء الجلسة
+    (خيط aiosqlite ليس Daemon، فإذا بقي مفتوحاً يمنع خروج البرنامج).
+    """
+    try:
+        import aiosqlite
+    except ImportError:
+        return   # حافظ الذاكرة (لا اتصال لإغلاقه)
+
+    conn = getattr(checkpointer, "conn", None)
+    if isinstance(conn, aiosqlite.Connection):
+        await conn.close()
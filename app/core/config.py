@@ -22,17 +22,119 @@ class Settings:
     DB_PATH: str = os.getenv("DB_PATH", "data/finance.duckdb")
     VECTOR_DB_PATH: str = os.getenv("VECTOR_DB_PATH", "data/vector_store")
     
-    # إعدادات النماذج
-    MODEL_NAME: str = "gpt-4o-mini"
+    # الأرشيف البارد: ملفات Parquet مقسمة حسب (الرمز، السنة)
+    # الصفوف الأقدم من ARCHIVE_AFTER_DAYS تُنقل إليه عند تشغيل compact_archive.py
+    ARCHIVE_PATH: str = os.getenv("ARCHIVE_PATH", "data/archive")
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
+    
+    # مجمع اتصالات DuckDB (عدد المؤشرات المتزامنة ومهلة الانتظار بالثواني)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    
+    # إعدادات مزامنة الأسعار (Incremental Sync)
+    # عدد الأيام التي نعيد جلبها قبل آخر تاريخ مخزن لالتقاط تعديلات التجزئة والتوزيعات
+    SYNC_OVERLAP_DAYS: int = int(os.getenv("SYNC_OVERLAP_DAYS", "7"))
+    # مدة صلاحية الأسعار المخزنة (بالثواني) قبل إعادة سؤال المصدر أثناء جلسة التداول
+    MARKET_DATA_TTL_SECONDS: int = int(os.getenv("MARKET_DATA_TTL_SECONDS", "900"))
+    # عدد لقطات الأسعار المحفوظة في الذاكرة (app/core/market_data.py)
+    SNAPSHOT_CAPACITY: int = int(os.getenv("SNAPSHOT_CAPACITY", "64"))
+
+    # محرك الجلب من المصدر الخارجي (app/core/fetcher.py)
+    # FETCH_PROVIDER: "yfinance" أو "stub" (مصدر محلي وهمي للاختبار بدون شبكة)
+    FETCH_PROVIDER: str = os.getenv("FETCH_PROVIDER", "yfinance")
+    FETCH_MAX_CONCURRENCY: int = int(os.getenv("FETCH_MAX_CONCURRENCY", "4"))
+    FETCH_RATE_PER_SEC: float = float(os.getenv("FETCH_RATE_PER_SEC", "2"))
+    FETCH_BURST: int = int(os.getenv("FETCH_BURST", "5"))
+    FETCH_MAX_RETRIES: int = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+    FETCH_BACKOFF_SECONDS: float = float(os.getenv("FETCH_BACKOFF_SECONDS", "0.5"))
+
+    # التتبع (Tracing): امتداد لكل عقدة في المخطط يُصدّر كسطر JSON (متوافق مع OpenTelemetry)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "1").lower() not in ("0", "false", "no")
+    TRACE_PATH: str = os.getenv("TRACE_PATH", "data/traces.jsonl")
+
+    # نقاط الحفظ (Checkpoints): حالة كل تحليل تُحفظ بعد كل خطوة لاستئنافه عند الفشل
+    CHECKPOINT_ENABLED: bool = os.getenv("CHECKPOINT_ENABLED", "1").lower() not in ("0", "false", "no")
+    CHECKPOINT_PATH: str = os.getenv("CHECKPOINT_PATH", "data/checkpoints.sqlite")
+    # الاحتفاظ: التشغيلات الأقدم من عدد الأيام أو الزائدة عن العدد تُحذف عند فتح الحافظ
+    CHECKPOINT_RETENTION_DAYS: int = int(os.getenv("CHECKPOINT_RETENTION_DAYS", "7"))
+    CHECKPOINT_MAX_RUNS: int = int(os.getenv("CHECKPOINT_MAX_RUNS", "1000"))
+
+    # ذاكرة نتائج التحليل الكامل (app/core/analysis_cache.py): نفس الرمز والطلب قبل يوم تداول جديد
+    # ANALYSIS_CACHE_VERSION: غيّره لإبطال كل النتائج المخزنة (مثلاً بعد تعديل الأوامر)
+    ANALYSIS_CACHE_ENABLED: bool = os.getenv("ANALYSIS_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+    ANALYSIS_CACHE_TTL_SECONDS: int = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "3600"))
+    ANALYSIS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500"))
+    ANALYSIS_CACHE_VERSION: str = os.getenv("ANALYSIS_CACHE_VERSION", "1")
+
+    # ذاكرة ردود النماذج (app/core/llm_cache.py): ملف SQLite مشترك بين العمليات (الواجهة، الخدمة، الدفعات)
+    # تُفعّل فقط للأغراض المذكورة في LLM_CACHE_TTL_SECONDS وبدرجة حرارة 0 (الرد حتمي)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite")
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    # صلاحية الرد المخزن (بالثواني) حسب الغرض
+    LLM_CACHE_TTL_SECONDS: dict = {
+        "sentiment": 6 * 3600,      # الأخبار تتجدد خلال اليوم
+        "critic": 7 * 86400,        # نفس التقرير → نفس الحكم
+        "intent": 30 * 86400,       # تصنيف نية المستخدم في الواجهة
+    }
+
+    # وضع الدفعات (python main.py --watchlist FILE): عدد التحليلات المتزامنة وملف النتائج
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_OUTPUT_PATH: str = os.getenv("BATCH_OUTPUT_PATH", "data/watchlist_results.jsonl")
+    
+    # خدمة HTTP (app/api/server.py): عدد العمال، سعة الطابور، وعدد المهام المنتهية المحفوظة
+    API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    API_WORKERS: int = int(os.getenv("API_WORKERS", "4"))
+    API_QUEUE_SIZE: int = int(os.getenv("API_QUEUE_SIZE", "64"))
+    API_JOB_RETENTION: int = int(os.getenv("API_JOB_RETENTION", "1000"))
+    # أقصى حجم لصورة الصفقة المرفوعة (بعد فك Base64)، وما زاد يُرفض بـ 413 قبل فك الترميز
+    API_MAX_SCREENSHOT_BYTES: int = int(os.getenv("API_MAX_SCREENSHOT_BYTES", str(10 * 1024 * 1024)))
+    
+    # نية المستخدم في الدردشة (app/components/intent/recognizer.py): ما دون هذه الثقة يُحال لنموذج اللغة
+    INTENT_MIN_CONFIDENCE: float = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.7"))
+
+    # إعدادات النماذج (كل النماذج تُبنى في app/core/llm.py)
+    MODEL_NAME: str = os.getenv("MODEL_NAME", "gpt-4o-mini")
     TEMPERATURE: float = 0.0
+    # درجة الحرارة حسب الغرض (الغرض غير المذكور يستخدم TEMPERATURE)
+    LLM_TEMPERATURES: dict = {
+        "chat": 0.7,        # الدردشة الحرة
+        "reporter": 0.3,    # صياغة التقرير
+        "writer": 0.3,
+        "critic": 0.0,      # النقد صارم ومنطقي
+        "vision": 0.0,
+        "intent": 0.0,
+        "commander": 0.0,
+        "sentiment": 0.0,
+    }
 
-# إنشاء نسخة واحدة للاستخدام في كامل المشروع
-settings = Settings()
+    # حدود استدعاءات النماذج المشتركة على مستوى العملية (LLMBudget)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_TOKENS_PER_MINUTE: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+    # هامش التوكنز المحجوز للرد قبل معرفة الاستهلاك الفعلي
+    LLM_COMPLETION_TOKENS_ESTIMATE: int = int(os.getenv("LLM_COMPLETION_TOKENS_ESTIMATE", "600"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+    LLM_BACKOFF_SECONDS: float = float(os.getenv("LLM_BACKOFF_SECONDS", "1.0"))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    # مجمع اتصالات HTTP المشترك بين كل النماذج
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
 
-# --- فحص الأمان (Sanity Check) ---
-# لن يقلع النظام إذا كانت المفاتيح ناقصة
-if not settings.OPENAI_API_KEY:
-    raise ValueError("❌ خطأ قاتل: مفتاح OPENAI_API_KEY غير موجود في ملف .env")
+    _validated: bool = False
 
-if not settings.TAVILY_API_KEY:
-    print("⚠️ تحذير: مفتاح TAVILY_API_KEY غير موجود. البحث في الويب لن يعمل.")
\ No newline at end of file
+    def validate(self):
+        """
+        فحص الأمان (Sanity Check): لن يعمل أي نموذج إذا كانت المفاتيح ناقصة.
+        يُستدعى عند بناء أول نموذج لغة (app/core/registry.py) بدل وقت الاستيراد،
+        فالمسارات التي لا تستخدم النماذج (قاعدة البيانات، الأرشيف، الاختبارات) تعمل بدونها.
+        """
+        if not self.OPENAI_API_KEY:
+            raise ValueError("❌ خطأ قاتل: مفتاح OPENAI_API_KEY غير موجود في ملف .env")
+
+        if not self._validated:
+            self._validated = True
+            if not self.TAVILY_API_KEY:
+                print("⚠️ تحذير: مفتاح TAVILY_API_KEY غير موجود. البحث في الويب لن يعمل.")
+
+# إنشاء نسخة واحدة للاستخدام في كامل المشروع
+settings = Settings()
\ No newline at end of file
@@ -1,40 +1,251 @@
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 import duckdb
 from app.core.config import settings
 
-# متغير عالمي لحفظ الاتصال (Singleton Pattern)
+class ConnectionPool:
+    """
+    مجمع اتصالات (Connection Pool) فوق قاعدة DuckDB واحدة.
+
+    DuckDB لا يسمح بمشاركة نفس الاتصال بين عدة خيوط (Threads)، لذلك نفتح
+    قاعدة البيانات مرة واحدة فقط (منعاً لتضارب قفل الملف) ونوزع منها
+    مؤشرات مستقلة (cursor) لكل خيط أو مهمة، بحد أقصى size مؤشر في نفس الوقت.
+
+    الاستخدام:
+        with pool.connection() as conn:
+            conn.execute("SELECT ...")
+    """
+
+    def __init__(self, db_path: str, size: int = 8, timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+
+        # الاتصال الجذري: يفتح الملف ويُستخدم فقط لتوليد المؤشرات وتهيئة الجداول
+        self.root = duckdb.connect(db_path, read_only=False)
+
+        self._idle = []                              # مؤشرات جاهزة لإعادة الاستخدام
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # المؤشر المحجوز للخيط/المهمة الحالية (لإعادة الاستخدام عند الاستدعاء المتداخل)
+        self._held = ContextVar(f"duckdb_pool_{id(self)}", default=None)
+
+        # مقاييس الأداء (Checkout Metrics)
+        self._metrics = {
+            "checkouts": 0,       # عدد مرات الحجز
+            "reused": 0,          # حجوزات متداخلة أعادت استخدام نفس المؤشر
+            "waits": 0,           # مرات الانتظار لأن المجمع ممتلئ
+            "timeouts": 0,        # مرات فشل الحجز بعد انتهاء المهلة
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "created": 0,         # عدد المؤشرات التي تم إنشاؤها
+            "in_use": 0,
+            "peak_in_use": 0,
+        }
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        يحجز مؤشراً مستقلاً للخيط/المهمة الحالية ويعيده للمجمع عند الخروج.
+        الاستدعاءات المتداخلة في نفس الخيط تعيد استخدام نفس المؤشر (ونفس المعاملة).
+        """
+        held = self._held.get()
+        if held is not None and held[1] == threading.get_ident():
+            with self._lock:
+                self._metrics["reused"] += 1
+            yield held[0]
+            return
+
+        conn = self._checkout(self.timeout if timeout is None else timeout)
+        token = self._held.set((conn, threading.get_ident()))
+        try:
+            yield conn
+        finally:
+            self._held.reset(token)
+            self._checkin(conn)
+
+    def _checkout(self, timeout: float):
+        started = time.perf_counter()
+        waited = not self._slots.acquire(blocking=False)
+        if waited and not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise TimeoutError(f"❌ Database: لا يوجد اتصال متاح في المجمع بعد {timeout} ثانية.")
+
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+
+        created = conn is None
+        if created:
+            try:
+                conn = self.root.cursor()
+            except Exception:
+                self._slots.release()
+                raise
+
+        with self._lock:
+            m = self._metrics
+            m["checkouts"] += 1
+            m["created"] += int(created)
+            m["in_use"] += 1
+            m["peak_in_use"] = max(m["peak_in_use"], m["in_use"])
+            if waited:
+                m["waits"] += 1
+                m["wait_ms_total"] += wait_ms
+                m["wait_ms_max"] = max(m["wait_ms_max"], wait_ms)
+        return conn
+
+    def _checkin(self, conn):
+        with self._lock:
+            self._metrics["in_use"] -= 1
+            self._idle.append(conn)
+        self._slots.release()
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس المجمع (للوحة الإدارة والمراقبة)."""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["idle"] = len(self._idle)
+        snapshot["size"] = self.size
+        snapshot["wait_ms_avg"] = snapshot["wait_ms_total"] / snapshot["waits"] if snapshot["waits"] else 0.0
+        return snapshot
+
+
+# نسخة واحدة من المجمع (Singleton Pattern)
 # الهدف: منع فتح ملف قاعدة البيانات عدة مرات مما يسبب تضارباً (File Lock)
-_db_connection = None
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> ConnectionPool:
+    """
+    يعيد مجمع الاتصالات المشترك. إذا لم يكن موجوداً، يقوم بإنشائه.
+    """
+    global _db_pool
+
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                try:
+                    # 1. فتح قاعدة البيانات مرة واحدة (read_only=False يسمح بالكتابة والقراءة)
+                    pool = ConnectionPool(settings.DB_PATH, size=settings.DB_POOL_SIZE, timeout=settings.DB_POOL_TIMEOUT)
+
+                    print(f"✅ Database: تم الاتصال بنجاح بالمستودع {settings.DB_PATH} (مجمع من {pool.size} اتصال)")
+
+                    # 2. التأكد من وجود الجداول الأساسية
+                    _init_schema(pool.root)
+                    _db_pool = pool
+
+                except Exception as e:
+                    print(f"❌ Database Error: فشل خطير في الاتصال بقاعدة البيانات: {e}")
+                    raise e # نوقف النظام لأن العمل بدون قاعدة بيانات مستحيل
+
+    return _db_pool
+
+def _init_schema(conn):
+    """
+    التأكد من وجود الجداول الأساسية (هيكل البيانات)
+    حتى لو كان الملف جديداً، هذا يضمن أن الجدول جاهز لاستقبال البيانات
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stock_prices (
+            symbol VARCHAR,
+            date DATE,
+            open DOUBLE,
+            high DOUBLE,
+            low DOUBLE,
+            close DOUBLE,
+            volume BIGINT,
+            PRIMARY KEY (symbol, date)
+        )
+    """)
+
+    # سجل الجلب: متى جلبنا كل رمز آخر مرة، وما آخر يوم تداول لدينا، ومن أي مصدر
+    # (يستخدمه DataLoader لتخطي الشبكة إذا كانت البيانات حديثة)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fetch_log (
+            symbol VARCHAR PRIMARY KEY,
+            last_fetch_at TIMESTAMP,
+            last_bar_date DATE,
+            source VARCHAR
+        )
+    """)
+
+    # الخصائص الفنية المحسوبة مسبقاً من الأسعار (يحدّثها FeatureStore في app/core/features.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_features (
+            symbol VARCHAR,
+            date DATE,
+            close DOUBLE,
+            ret DOUBLE,
+            vol_5 DOUBLE,
+            vol_14 DOUBLE,
+            rsi_14 DOUBLE,
+            PRIMARY KEY (symbol, date)
+        )
+    """)
+
+    # نتائج التحليل الكامل المخزنة (يديرها AnalysisCache في app/core/analysis_cache.py)
+    # payload: مفاتيح الحالة النهائية بصيغة pickle (تحمل مصفوفات NumPy للتنبؤ)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            key VARCHAR PRIMARY KEY,
+            symbol VARCHAR,
+            user_request VARCHAR,
+            created_at TIMESTAMP,
+            last_hit_at TIMESTAMP,
+            hits INTEGER,
+            payload BLOB
+        )
+    """)
+
+    # العرض الموحد للطبقة الساخنة + أرشيف Parquet
+    create_price_view(conn)
+
+def archive_scan_sql(archive_path: str = None):
+    """
+    تعبير SQL لقراءة أرشيف Parquet المقسم (symbol=.../year=...)، أو None إذا كان الأرشيف فارغاً.
+    """
+    archive_path = archive_path or settings.ARCHIVE_PATH
+    pattern = os.path.join(os.path.abspath(archive_path), "**", "*.parquet")
+    if not glob.glob(pattern, recursive=True):
+        return None
+    return (
+        f"read_parquet('{pattern}', hive_partitioning = true, "
+        f"hive_types = {{'symbol': VARCHAR, 'year': INTEGER}})"
+    )
+
+def create_price_view(conn, archive_path: str = None):
+    """
+    ينشئ (أو يحدّث) العرض price_history الذي يوحد الطبقتين:
+    - الساخنة: جدول stock_prices داخل DuckDB.
+    - الباردة: ملفات Parquet المقسمة في الأرشيف.
+    القراءة عبر هذا العرض تستفيد من تقليم الأقسام (Partition Pruning) عند الفلترة بالرمز.
+    عند تكرار نفس اليوم في الطبقتين، الأولوية للطبقة الساخنة.
+    """
+    columns = "symbol, date, open, high, low, close, volume"
+    archive_scan = archive_scan_sql(archive_path)
+
+    if archive_scan is None:
+        # لا يوجد أرشيف بعد: العرض هو الجدول الساخن فقط
+        conn.execute(f"CREATE OR REPLACE VIEW price_history AS SELECT {columns} FROM stock_prices")
+        return
+
+    conn.execute(f"""
+        CREATE OR REPLACE VIEW price_history AS
+        SELECT {columns} FROM stock_prices
+        UNION ALL
+        SELECT {columns} FROM {archive_scan} a
+        ANTI JOIN stock_prices h USING (symbol, date)
+    """)
 
 def get_db_connection():
     """
-    يعيد اتصالاً نشطاً بقاعدة البيانات. إذا لم يكن موجوداً، يقوم بإنشائه.
+    يعيد الاتصال الجذري بقاعدة البيانات (للسكربتات أحادية الخيط مثل init_db.py).
+    ⚠️ العمال والخدمات المتزامنة يجب أن تستخدم get_db_pool().connection() بدلاً منه.
     """
-    global _db_connection
-    
-    if _db_connection is None:
-        try:
-            # 1. فتح الاتصال (read_only=False يسمح بالكتابة والقراءة)
-            _db_connection = duckdb.connect(settings.DB_PATH, read_only=False)
-            
-            print(f"✅ Database: تم الاتصال بنجاح بالمستودع {settings.DB_PATH}")
-            
-            # 2. التأكد من وجود الجدول الأساسي (هيكل البيانات)
-            # حتى لو كان الملف جديداً، هذا يضمن أن الجدول جاهز لاستقبال البيانات
-            _db_connection.execute("""
-                CREATE TABLE IF NOT EXISTS stock_prices (
-                    symbol VARCHAR,
-                    date DATE,
-                    open DOUBLE,
-                    high DOUBLE,
-                    low DOUBLE,
-                    close DOUBLE,
-                    volume BIGINT,
-                    PRIMARY KEY (symbol, date)
-                )
-            """)
-            
-        except Exception as e:
-            print(f"❌ Database Error: فشل خطير في الاتصال بقاعدة البيانات: {e}")
-            raise e # نوقف النظام لأن العمل بدون قاعدة بيانات مستحيل
-            
-    return _db_connection
\ No newline at end of file
+    return get_db_pool().root
@@ -0,0 +1,153 @@
+import pandas as pd
+from app.core.database import get_db_pool
+from app.core.tracing import record
+
+# أعمدة جدول الخصائص الفنية المحسوبة مسبقاً
+FEATURE_COLUMNS = ('symbol', 'date', 'close', 'ret', 'vol_5', 'vol_14', 'rsi_14')
+
+# نافذة التذبذب المحسوب مسبقاً (العمود vol_14): من يحسب التذبذب بنفس النافذة يقرؤه بدل إعادة حسابه
+VOLATILITY_WINDOW = 14
+
+# كم يوماً تقويمياً نقرأ قبل آخر يوم محسوب لتكتمل النوافذ المتحركة (14 يوم تداول + هامش للعطل)
+FEATURE_CONTEXT_DAYS = 45
+
+class FeatureStore:
+    """
+    جدول الخصائص الفنية (price_features) المحسوب بدوال النوافذ في DuckDB.
+
+    لكل (رمز، يوم): العائد اليومي، التذبذب لآخر 5 و14 عائداً، ومؤشر RSI(14).
+    التعريفات مطابقة لحسابات pandas في CrashClassifier و VolatilityGuard
+    (انحراف معياري للعينة، ومتوسط بسيط للمكاسب والخسائر في RSI).
+
+    التحديث تزايدي: نحسب الأيام الأحدث من آخر يوم موجود فقط، مع قراءة
+    نافذة سياق قصيرة قبله. DataLoader يلغي الأيام التي أعاد كتابتها ثم يحدّث الجدول.
+    """
+
+    def __init__(self):
+        self.pool = get_db_pool()
+
+    def refresh(self, symbols: list = None) -> int:
+        """
+        حساب الخصائص للأيام الجديدة فقط (لكل الرموز إذا لم تُحدد).
+        Returns: عدد الصفوف المضافة.
+        """
+        params = []
+        symbol_filter = ""
+        if symbols is not None:
+            symbols = [s.strip().upper() for s in symbols]
+            if not symbols:
+                return 0
+            symbol_filter = "AND list_contains(?, p.symbol)"
+            params.append(symbols)
+
+        query = f"""
+            INSERT OR REPLACE INTO price_features
+            WITH bounds AS (
+                SELECT symbol, MAX(date) AS done FROM price_features GROUP BY symbol
+            ),
+            src AS (
+                SELECT p.symbol, p.date, p.close, b.done
+                FROM price_history p
+                LEFT JOIN bounds b ON b.symbol = p.symbol
+                WHERE (b.done IS NULL OR p.date > b.done - INTERVAL {FEATURE_CONTEXT_DAYS} DAY)
+                {symbol_filter}
+            ),
+            deltas AS (
+                SELECT *,
+                       close / lag(close) OVER w - 1 AS ret,
+                       close - lag(close) OVER w AS delta
+                FROM src
+                WINDOW w AS (PARTITION BY symbol ORDER BY date)
+            ),
+            windows AS (
+                SELECT symbol, date, close, done, ret,
+                       CASE WHEN count(ret) OVER w5 = 5 THEN stddev_samp(ret) OVER w5 END AS vol_5,
+                       CASE WHEN count(ret) OVER w14 = 14 THEN stddev_samp(ret) OVER w14 END AS vol_14,
+                       CASE WHEN count(delta) OVER w14 = 14 THEN avg(greatest(delta, 0)) OVER w14 END AS gain,
+                       avg(greatest(-delta, 0)) OVER w14 AS loss
+                FROM deltas
+                WINDOW w5 AS (PARTITION BY symbol ORDER BY date ROWS 4 PRECEDING),
+                       w14 AS (PARTITION BY symbol ORDER BY date ROWS 13 PRECEDING)
+            )
+            SELECT symbol, date, close, ret, vol_5, vol_14,
+                   CASE
+                       WHEN gain IS NULL THEN NULL
+                       WHEN loss = 0 THEN CASE WHEN gain = 0 THEN NULL ELSE 100.0 END
+                       ELSE 100 - 100 / (1 + gain / loss)
+                   END AS rsi_14
+            FROM windows
+            WHERE done IS NULL OR date > done
+        """
+
+        with self.pool.connection() as conn:
+            row = conn.execute(query, params).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, conn, since: dict, replace_symbols: list = ()):
+        """
+        حذف الخصائص التي لم تعد صالحة بعد كتابة أسعار جديدة (داخل معاملة المتصل).
+
+        Args:
+            since: {الرمز: أول يوم أُعيدت كتابته} → نحذف من هذا اليوم فصاعداً.
+            replace_symbols: رموز استُبدل تاريخها كاملاً → نحذف كل خصائصها.
+        """
+        if replace_symbols:
+            conn.execute(
+                "DELETE FROM price_features WHERE list_contains(?, symbol)", [list(replace_symbols)]
+            )
+        if since:
+            conn.execute("""
+                DELETE FROM price_features f
+                USING (SELECT unnest(?) AS symbol, unnest(?) AS since) n
+                WHERE f.symbol = n.symbol AND f.date >= n.since
+            """, [list(since), list(since.values())])
+
+    def latest(self, symbols: list = None) -> pd.DataFrame:
+        """
+        آخر صف خصائص لكل رمز (للفحص السريع على مستوى السوق كاملاً).
+        قراءة فقط: الأيام الناقصة تُحسب عبر refresh (DataLoader يستدعيها بعد كل كتابة).
+        """
+        params = []
+        where = ""
+        if symbols is not None:
+            where = "WHERE list_contains(?, symbol)"
+            params.append([s.strip().upper() for s in symbols])
+
+        with self.pool.connection() as conn:
+            return conn.execute(f"""
+                SELECT * FROM price_features {where}
+                QUALIFY row_number() OVER (PARTITION BY symbol ORDER BY date DESC) = 1
+                ORDER BY symbol
+            """, params).df()
+
+    def read(self, symbol: str, lookback: int = None) -> pd.DataFrame:
+        """
+        سلسلة الخصائص لرمز واحد مرتبة زمنياً (آخر lookback يوم فقط إذا حُدد).
+        قراءة فقط (بدون refresh). df.attrs["missing"]: عدد أيام الأسعار الأحدث
+        من آخر يوم خصائص (0 = الخصائص مكتملة)، ليعود المتصل للحساب من الأسعار.
+        """
+        clean_symbol = symbol.strip().upper()
+        query = "SELECT * FROM price_features WHERE symbol = ? ORDER BY date DESC"
+        params = [clean_symbol]
+        if lookback is not None:
+            query += " LIMIT ?"
+            params.append(int(lookback))
+
+        with self.pool.connection() as conn:
+            df = conn.execute(query, params).df()
+            if df.empty:
+                missing = conn.execute(
+                    "SELECT count(*) FROM price_history WHERE symbol = ?", [clean_symbol]
+                ).fetchone()[0]
+            else:
+                missing = conn.execute(
+                    "SELECT count(*) FROM price_history WHERE symbol = ? AND date > ?",
+                    [clean_symbol, df["date"].iloc[0]],
+                ).fetchone()[0]
+        record(rows=len(df))
+        if missing:
+            print(f"⚠️ Features: {missing} يوم تداول بدون خصائص محسوبة لـ {clean_symbol}.")
+
+        df = df.iloc[::-1].reset_index(drop=True)
+        df.attrs["missing"] = missing
+        return df
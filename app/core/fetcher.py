@@ -0,0 +1,343 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from datetime import date, timedelta
+import pandas as pd
+from app.core.config import settings
+from app.core.tracing import record
+
+# أنواع الطلبات المدعومة (نفس أسماء خصائص yf.Ticker قدر الإمكان)
+FETCH_KINDS = ("history", "download", "info", "financials", "cashflow", "balance_sheet")
+
+# رموز HTTP المؤقتة: انتهاء المهلة، تجاوز المعدل، وأخطاء الخادم
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class RetryableFetchError(Exception):
+    """خطأ مؤقت من المصدر (مثل تجاوز حد الطلبات) يستحق إعادة المحاولة."""
+
+
+def is_transient(error: Exception, transient_errors: tuple = ()) -> bool:
+    """
+    هل يستحق الخطأ إعادة المحاولة؟ المهلة وانقطاع الاتصال وردود HTTP المؤقتة (429 / 5xx) فقط.
+    الباقي (رمز خاطئ، معاملات غير صالحة، خطأ برمجي) نهائي ويُرفع مباشرة.
+    """
+    if isinstance(error, (RetryableFetchError, TimeoutError, ConnectionError, *transient_errors)):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in TRANSIENT_STATUS_CODES
+
+
+class YFinanceProvider:
+    """
+    المصدر الحقيقي: Yahoo Finance عبر مكتبة yfinance (استدعاءات متزامنة).
+    """
+    name = "yfinance"
+
+    def __init__(self):
+        import yfinance as yf
+        from yfinance import exceptions as yf_errors
+        from curl_cffi.requests import exceptions as http_errors   # عميل HTTP الخاص بـ yfinance
+        self._yf = yf
+        # أخطاء مؤقتة تستحق إعادة المحاولة (غيرها نهائي: رمز خاطئ، مدى غير صالح...)
+        self.transient_errors = (
+            yf_errors.YFRateLimitError,
+            http_errors.Timeout,
+            http_errors.ConnectionError,
+        )
+
+    def call(self, kind: str, target, **kwargs):
+        if kind == "download":
+            return self._yf.download(target, progress=False, **kwargs)
+
+        ticker = self._yf.Ticker(target)
+        if kind == "history":
+            return ticker.history(**kwargs)
+        return getattr(ticker, kind)
+
+
+class StubProvider:
+    """
+    مصدر محلي وهمي (بدون شبكة) لاختبار محرك الجلب وقياس أدائه.
+    يولد بيانات ثابتة لكل رمز، ويمكنه محاكاة زمن الاستجابة وأخطاء تجاوز الحد.
+
+    Args:
+        latency: زمن الاستجابة لكل طلب (بالثواني).
+        fail_rate: احتمال رفض الطلب بخطأ مؤقت (محاكاة Throttling).
+        unknown: رموز غير موجودة (ترجع نتائج فارغة مثل yfinance).
+    """
+    name = "stub"
+    transient_errors = ()
+
+    def __init__(self, latency: float = 0.05, fail_rate: float = 0.0, unknown=(), seed: int = 0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.unknown = {s.upper() for s in unknown}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.active = 0
+        self.peak_active = 0
+
+    def call(self, kind: str, target, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            throttled = self._random.random() < self.fail_rate
+            self.failures += int(throttled)
+        try:
+            time.sleep(self.latency)
+            if throttled:
+                raise RetryableFetchError("Too Many Requests (stub)")
+            if kind == "download":
+                return self._download(target, **kwargs)
+            if kind == "history":
+                return self._history(target, **kwargs)
+            if kind == "info":
+                return self._info(target)
+            return self._statement(target, kind)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _history(self, symbol: str, start=None, period: str = "1y", **kwargs) -> pd.DataFrame:
+        if symbol.upper() in self.unknown:
+            return pd.DataFrame()
+        days = {"1mo": 30, "3mo": 90, "6mo": 182, "1y": 365, "2y": 730, "5y": 1825}.get(period, 365)
+        end = date.today()
+        begin = pd.Timestamp(start).date() if start is not None else end - timedelta(days=days)
+        index = pd.bdate_range(begin, end, name="Date")
+        # سعر ثابت يعتمد على الرمز والتاريخ (نفس النتيجة في كل طلب)
+        base = 50 + sum(map(ord, symbol)) % 200
+        close = [base * (1 + 0.1 * math.sin(d.toordinal() / 15)) for d in index]
+        return pd.DataFrame({
+            "Open": close, "High": [c * 1.01 for c in close], "Low": [c * 0.99 for c in close],
+            "Close": close, "Volume": 1_000_000,
+        }, index=index)
+
+    def _download(self, tickers, group_by: str = "ticker", **kwargs) -> pd.DataFrame:
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {t: self._history(t, **kwargs) for t in tickers}
+        frames = {t: f for t, f in frames.items() if not f.empty}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def _info(self, symbol: str) -> dict:
+        if symbol.upper() in self.unknown:
+            return {}
+        price = self._history(symbol, period="1mo")["Close"].iloc[-1]
+        return {
+            "symbol": symbol, "regularMarketPrice": price, "currentPrice": price,
+            "marketCap": price * 1e9, "sharesOutstanding": 1e9,
+            "trailingPE": 18.0, "forwardPE": 16.0, "pegRatio": 1.2, "priceToBook": 3.0,
+            "priceToSalesTrailing12Months": 4.0,
+            "profitMargins": 0.2, "operatingMargins": 0.25, "returnOnEquity": 0.18, "returnOnAssets": 0.08,
+            "totalDebt": 2e9, "debtToEquity": 80.0, "currentRatio": 1.5, "quickRatio": 1.1,
+            "freeCashflow": 5e9, "revenueGrowth": 0.08, "earningsGrowth": 0.1,
+            "sector": "Technology", "industry": "Stub",
+        }
+
+    def _statement(self, symbol: str, kind: str) -> pd.DataFrame:
+        if symbol.upper() in self.unknown:
+            return pd.DataFrame()
+        columns = pd.to_datetime([f"{date.today().year - i}-12-31" for i in range(1, 5)])
+        rows = {
+            "financials": {"Ebit": 8e9, "Interest Expense": -5e8},
+            "cashflow": {"Free Cash Flow": 5e9, "Capital Expenditures": -1e9},
+            "balance_sheet": {"Cash And Cash Equivalents": 3e9, "Total Debt": 2e9},
+        }[kind]
+        return pd.DataFrame({c: rows for c in columns})
+
+
+class TokenBucket:
+    """
+    محدد معدل (Token Bucket): rate طلب في الثانية بالمتوسط، مع السماح بدفعة حتى capacity.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """ينتظر حتى يتوفر رصيد ويستهلكه. يعيد زمن الانتظار بالثواني."""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return time.monotonic() - started
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncMarketFetcher:
+    """
+    محرك جلب غير متزامن (asyncio) فوق مصدر بيانات متزامن.
+
+    - سقف عام للطلبات المتزامنة (Semaphore).
+    - محدد معدل Token Bucket لتفادي حظر المصدر (Throttling).
+    - إعادة المحاولة مع تراجع أسي عشوائي (Exponential Backoff + Full Jitter).
+
+    كل الطلبات (من أي خيط) تمر عبر نفس الحلقة، لذلك الحدود عامة على مستوى العملية.
+    """
+
+    def __init__(self, provider=None, max_concurrency: int = None, rate: float = None,
+                 burst: int = None, max_retries: int = None, backoff: float = None):
+        self.provider = provider or YFinanceProvider()
+        self.max_concurrency = max_concurrency or settings.FETCH_MAX_CONCURRENCY
+        self.rate = rate or settings.FETCH_RATE_PER_SEC
+        self.burst = burst or settings.FETCH_BURST
+        self.max_retries = settings.FETCH_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = settings.FETCH_BACKOFF_SECONDS if backoff is None else backoff
+
+        # تُنشأ داخل الحلقة عند أول استخدام
+        self._semaphore = None
+        self._bucket = None
+
+        self._metrics = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "throttle_wait_ms": 0.0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+        }
+
+    def _limits(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.rate, self.burst)
+        return self._semaphore, self._bucket
+
+    async def fetch(self, kind: str, target, **kwargs):
+        """
+        طلب واحد من المصدر ضمن حدود التزامن والمعدل، مع إعادة المحاولة عند الأخطاء المؤقتة فقط (is_transient).
+        """
+        if kind not in FETCH_KINDS:
+            raise ValueError(f"نوع طلب غير مدعوم: {kind}")
+
+        semaphore, bucket = self._limits()
+        m = self._metrics
+        m["requests"] += 1
+
+        attempt = 0
+        while True:
+            async with semaphore:
+                waited = await bucket.acquire()
+                m["throttle_wait_ms"] += waited * 1000
+                m["in_flight"] += 1
+                m["peak_in_flight"] = max(m["peak_in_flight"], m["in_flight"])
+                try:
+                    # المصدر متزامن (yfinance)، فننفذه في خيط دون حجز الحلقة
+                    return await asyncio.to_thread(self.provider.call, kind, target, **kwargs)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_transient(e, self.provider.transient_errors):
+                        m["failures"] += 1
+                        raise
+                    error = e
+                finally:
+                    m["in_flight"] -= 1
+
+            # ننتظر خارج الـ Semaphore حتى لا نحجز مكاناً أثناء التراجع
+            attempt += 1
+            m["retries"] += 1
+            delay = random.uniform(0, self.backoff * (2 ** attempt))
+            print(f"   >> ⚠️ Fetcher: فشل {kind} لـ {target} ({error}). إعادة المحاولة {attempt}/{self.max_retries} بعد {delay:.2f} ث...")
+            await asyncio.sleep(delay)
+
+    async def gather(self, requests: list, return_exceptions: bool = True) -> list:
+        """
+        تنفيذ مجموعة طلبات بالتوازي. كل طلب: (kind, target) أو (kind, target, kwargs).
+        النتائج بنفس الترتيب؛ الطلب الفاشل يعيد الاستثناء بدل النتيجة (افتراضياً).
+        """
+        tasks = []
+        for request in requests:
+            kind, target, kwargs = request if len(request) == 3 else (*request, {})
+            tasks.append(self.fetch(kind, target, **kwargs))
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس الجلب (للوحة الإدارة والمراقبة)."""
+        snapshot = dict(self._metrics)
+        snapshot.update(max_concurrency=self.max_concurrency, rate=self.rate, provider=self.provider.name)
+        return snapshot
+
+
+class MarketFetcher:
+    """
+    واجهة متزامنة (Sync Facade) للكود الحالي فوق AsyncMarketFetcher.
+
+    تشغل حلقة asyncio واحدة في خيط خلفي، وكل استدعاء متزامن يُرسل إليها وينتظر نتيجته.
+    الاستخدام:
+        fetcher = get_market_fetcher()
+        df = fetcher.history("AAPL", period="1y")
+        info, cashflow = fetcher.many([("info", "AAPL"), ("cashflow", "AAPL")])
+    """
+
+    def __init__(self, engine: AsyncMarketFetcher = None):
+        self.engine = engine or AsyncMarketFetcher()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="market-fetcher", daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def fetch(self, kind: str, target, **kwargs):
+        record(external_calls=1)
+        return self._run(self.engine.fetch(kind, target, **kwargs))
+
+    def many(self, requests: list, return_exceptions: bool = True) -> list:
+        """عدة طلبات بالتوازي (انظر AsyncMarketFetcher.gather)."""
+        record(external_calls=len(requests))
+        return self._run(self.engine.gather(requests, return_exceptions=return_exceptions))
+
+    def history(self, symbol: str, **kwargs) -> pd.DataFrame:
+        return self.fetch("history", symbol, **kwargs)
+
+    def download(self, tickers: list, **kwargs) -> pd.DataFrame:
+        return self.fetch("download", tickers, **kwargs)
+
+    def info(self, symbol: str) -> dict:
+        return self.fetch("info", symbol)
+
+    def stats(self) -> dict:
+        return self._run(self._stats())
+
+    async def _stats(self):
+        # نقرأ المقاييس من داخل الحلقة لتكون اللقطة متسقة
+        return self.engine.stats()
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+# نسخة واحدة من محرك الجلب (Singleton Pattern)
+# الهدف: حدود تزامن ومعدل مشتركة بين كل العمال والخيوط
+_market_fetcher = None
+_market_fetcher_lock = threading.Lock()
+
+def get_market_fetcher() -> MarketFetcher:
+    """
+    يعيد محرك الجلب المشترك. المصدر يحدده FETCH_PROVIDER ("yfinance" أو "stub").
+    """
+    global _market_fetcher
+
+    if _market_fetcher is None:
+        with _market_fetcher_lock:
+            if _market_fetcher is None:
+                provider = StubProvider() if settings.FETCH_PROVIDER == "stub" else YFinanceProvider()
+                _market_fetcher = MarketFetcher(AsyncMarketFetcher(provider))
+                print(f"✅ Fetcher: محرك الجلب جاهز (المصدر: {provider.name}، "
+                      f"تزامن {settings.FETCH_MAX_CONCURRENCY}، معدل {settings.FETCH_RATE_PER_SEC}/ث)")
+    return _market_fetcher
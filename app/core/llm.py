@@ -0,0 +1,401 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+import httpx
+import openai
+from langchain_openai import ChatOpenAI
+from app.core.config import settings
+from app.core.llm_cache import get_llm_cache
+
+# أخطاء مؤقتة تستحق إعادة المحاولة: 429 (تجاوز المعدل)، 5xx، وانقطاع الاتصال أو المهلة
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,   # (يشمل APITimeoutError)
+)
+
+# تقدير التوكنز لكل صورة في رسائل المحلل البصري (المحتوى Base64 لا يعكس التكلفة الفعلية)
+IMAGE_TOKENS_ESTIMATE = 1000
+
+# هل الاستدعاء الحالي داخل الميزانية مسبقاً؟ (_generate يستدعي _stream داخلياً عند streaming=True)
+# لا يُضبط داخل البث نفسه لأن قيمته كانت ستبقى للمستهلك بين الأجزاء
+_inside_budget = ContextVar("llm_inside_budget", default=False)
+
+
+class LLMBudget:
+    """
+    ميزانية مشتركة لكل استدعاءات نماذج اللغة في العملية (كل النماذج، الخيوط، وحلقات الأحداث):
+
+    - سقف للاستدعاءات المتزامنة (max_concurrency).
+    - ميزانية توكنز بالدقيقة (Token Bucket بسعة tokens_per_minute): كل استدعاء يحجز تقديراً
+      مسبقاً ثم يُسوّى بالاستهلاك الفعلي بعد الرد.
+    - تهدئة عامة (Cooldown): عند رد 429 تتوقف كل الاستدعاءات حتى انتهاء Retry-After،
+      بدل أن يعيد كل عميل المحاولة منفرداً فتتضاعف موجة الرفض (Throttling Storm).
+    """
+
+    # فترة إعادة الفحص للمنتظرين غير المتزامنين عند امتلاء السقف
+    POLL_SECONDS = 0.05
+
+    def __init__(self, max_concurrency: int = None, tokens_per_minute: int = None):
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.tokens_per_minute = tokens_per_minute or settings.LLM_TOKENS_PER_MINUTE
+        self._rate = self.tokens_per_minute / 60.0
+        self._tokens = float(self.tokens_per_minute)
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._metrics = {
+            "calls": 0,
+            "retries": 0,
+            "rate_limited": 0,     # ردود 429
+            "failures": 0,
+            "tokens": 0,           # الاستهلاك الفعلي (أو التقدير إذا لم يُعد المزود الاستهلاك)
+            "wait_ms_total": 0.0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+        }
+
+    def _try_acquire(self, tokens: int):
+        """
+        (يُستدعى والقفل محجوز) Returns: 0 عند الحجز، أو ثواني الانتظار المقدرة،
+        أو None إذا كان السقف ممتلئاً (الانتظار حتى تحرير مكان).
+        """
+        now = time.monotonic()
+        self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= self.max_concurrency:
+            return None
+        if self._tokens < tokens:
+            return (tokens - self._tokens) / self._rate
+
+        self._tokens -= tokens
+        self._in_flight += 1
+        m = self._metrics
+        m["calls"] += 1
+        m["in_flight"] = self._in_flight
+        m["peak_in_flight"] = max(m["peak_in_flight"], self._in_flight)
+        return 0
+
+    def acquire(self, tokens: int):
+        """حجز مكان وتوكنز (يحجز الخيط أثناء الانتظار)."""
+        tokens = min(tokens, self.tokens_per_minute)
+        started = time.perf_counter()
+        with self._cond:
+            while (wait := self._try_acquire(tokens)) != 0:
+                self._cond.wait(timeout=wait)
+            self._metrics["wait_ms_total"] += (time.perf_counter() - started) * 1000
+        return tokens
+
+    async def aacquire(self, tokens: int):
+        """نفس acquire دون حجز حلقة الأحداث أثناء الانتظار."""
+        tokens = min(tokens, self.tokens_per_minute)
+        started = time.perf_counter()
+        while True:
+            with self._cond:
+                wait = self._try_acquire(tokens)
+                if wait == 0:
+                    self._metrics["wait_ms_total"] += (time.perf_counter() - started) * 1000
+                    return tokens
+            await asyncio.sleep(self.POLL_SECONDS if wait is None else wait)
+
+    def release(self, reserved: int, used: int = None):
+        """تحرير المكان وتسوية الميزانية: إرجاع الفائض أو خصم الزيادة عن التقدير."""
+        with self._cond:
+            self._in_flight -= 1
+            self._metrics["in_flight"] = self._in_flight
+            if used is not None:
+                self._tokens -= used - reserved
+            self._metrics["tokens"] += reserved if used is None else used
+            self._cond.notify_all()
+
+    def cooldown(self, seconds: float):
+        """إيقاف كل الاستدعاءات الجديدة لمدة seconds (بعد رد 429)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._metrics["rate_limited"] += 1
+
+    def record(self, metric: str):
+        with self._cond:
+            self._metrics[metric] += 1
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس الميزانية (للوحة الإدارة والمراقبة)."""
+        with self._cond:
+            snapshot = dict(self._metrics)
+            snapshot["tokens_available"] = int(self._tokens)
+        snapshot.update(max_concurrency=self.max_concurrency, tokens_per_minute=self.tokens_per_minute)
+        return snapshot
+
+
+def _estimate_tokens(messages: list) -> int:
+    """تقدير مسبق للتوكنز: نص الرسائل (~4 أحرف للتوكن) + الصور + هامش للرد."""
+    chars, images = 0, 0
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "image_url":
+                images += 1
+            else:
+                chars += len(part.get("text", "") if isinstance(part, dict) else str(part))
+    return chars // 4 + images * IMAGE_TOKENS_ESTIMATE + settings.LLM_COMPLETION_TOKENS_ESTIMATE
+
+
+def _result_usage(result):
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    metadata = getattr(result.generations[0].message, "usage_metadata", None) if result.generations else None
+    return metadata.get("total_tokens") if metadata else None
+
+
+def _chunk_usage(chunk):
+    metadata = getattr(chunk.message, "usage_metadata", None)
+    return metadata.get("total_tokens") if metadata else None
+
+
+def _retry_delay(error: Exception, attempt: int, budget: LLMBudget) -> float:
+    """
+    مدة الانتظار قبل المحاولة التالية: Retry-After من المزود إن وُجد (مع تهدئة عامة عند 429)،
+    وإلا تراجع أسي عشوائي (Exponential Backoff + Full Jitter) مثل محرك الجلب.
+    """
+    delay = random.uniform(0, settings.LLM_BACKOFF_SECONDS * (2 ** attempt))
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        delay = max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        pass
+    if isinstance(error, openai.RateLimitError):
+        budget.cooldown(delay)
+    return delay
+
+
+class GuardedChatOpenAI(ChatOpenAI):
+    """
+    ChatOpenAI يمر كل استدعاء فيه (invoke / ainvoke / stream / astream) عبر الميزانية المشتركة،
+    مع إعادة المحاولة المركزية للأخطاء المؤقتة (إعادة المحاولة الداخلية في مكتبة openai معطلة).
+    البث يُعاد فقط إذا فشل قبل وصول أول جزء (لا نكرر نصاً وصل للمستخدم).
+    """
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _inside_budget.get():
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        budget = get_llm_budget()
+        attempt = 0
+        while True:
+            reserved = budget.acquire(_estimate_tokens(messages))
+            token, used = _inside_budget.set(True), None
+            try:
+                result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                used = _result_usage(result)
+                return result
+            except RETRYABLE_ERRORS as e:
+                error = e
+            finally:
+                _inside_budget.reset(token)
+                budget.release(reserved, used)
+
+            attempt = self._before_retry(error, attempt, budget)
+            time.sleep(_retry_delay(error, attempt, budget))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if _inside_budget.get():
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        budget = get_llm_budget()
+        attempt = 0
+        while True:
+            reserved = await budget.aacquire(_estimate_tokens(messages))
+            token, used = _inside_budget.set(True), None
+            try:
+                result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+                used = _result_usage(result)
+                return result
+            except RETRYABLE_ERRORS as e:
+                error = e
+            finally:
+                _inside_budget.reset(token)
+                budget.release(reserved, used)
+
+            attempt = self._before_retry(error, attempt, budget)
+            await asyncio.sleep(_retry_delay(error, attempt, budget))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if _inside_budget.get():
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return
+
+        budget = get_llm_budget()
+        attempt = 0
+        while True:
+            reserved = budget.acquire(_estimate_tokens(messages))
+            used, started = None, False
+            try:
+                for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    started = True
+                    used = _chunk_usage(chunk) or used
+                    yield chunk
+                return
+            except RETRYABLE_ERRORS as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                budget.release(reserved, used)
+
+            attempt = self._before_retry(error, attempt, budget)
+            time.sleep(_retry_delay(error, attempt, budget))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if _inside_budget.get():
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+
+        budget = get_llm_budget()
+        attempt = 0
+        while True:
+            reserved = await budget.aacquire(_estimate_tokens(messages))
+            used, started = None, False
+            try:
+                async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    started = True
+                    used = _chunk_usage(chunk) or used
+                    yield chunk
+                return
+            except RETRYABLE_ERRORS as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                budget.release(reserved, used)
+
+            attempt = self._before_retry(error, attempt, budget)
+            await asyncio.sleep(_retry_delay(error, attempt, budget))
+
+    @staticmethod
+    def _before_retry(error: Exception, attempt: int, budget: LLMBudget) -> int:
+        if attempt >= settings.LLM_MAX_RETRIES:
+            budget.record("failures")
+            raise error
+        budget.record("retries")
+        print(f"   >> ⚠️ LLM: {type(error).__name__}. إعادة المحاولة {attempt + 1}/{settings.LLM_MAX_RETRIES}...")
+        return attempt + 1
+
+
+# ==========================================
+# الموارد المشتركة (Singleton Pattern)
+# ==========================================
+_budget = None
+_clients = None
+_shared_lock = threading.Lock()
+
+def get_llm_budget() -> LLMBudget:
+    """
+    يعيد ميزانية الاستدعاءات المشتركة. إذا لم تكن موجودة، يقوم بإنشائها.
+    """
+    global _budget
+
+    if _budget is None:
+        with _shared_lock:
+            if _budget is None:
+                _budget = LLMBudget()
+    return _budget
+
+
+class LoopBoundAsyncClient(httpx.AsyncClient):
+    """
+    عميل HTTP غير متزامن يصلح لعدة حلقات أحداث: اتصالات httpx مرتبطة بالحلقة التي فتحتها،
+    والنموذج (Singleton من السجل) يُستدعى من حلقة الخدمة ومن asyncio.run في الواجهة ووضع الدفعات.
+    لذلك كل طلب يُرسل عبر عميل خاص بالحلقة الحالية (يُنشأ عند أول طلب فيها ويُنسى مع الحلقة).
+    """
+
+    def __init__(self, limits: httpx.Limits, timeout: httpx.Timeout):
+        super().__init__(limits=limits, timeout=timeout)
+        self._client_options = {"limits": limits, "timeout": timeout}
+        self._loop_clients = weakref.WeakKeyDictionary()
+        self._loop_lock = threading.Lock()
+
+    def _loop_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._loop_clients.get(loop)
+        if client is None:
+            with self._loop_lock:
+                client = self._loop_clients.get(loop)
+                if client is None:
+                    client = httpx.AsyncClient(**self._client_options)
+                    self._loop_clients[loop] = client
+        return client
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self._loop_client().send(request, **kwargs)
+
+    async def aclose(self):
+        # إغلاق عميل الحلقة الحالية فقط (عملاء الحلقات الأخرى لا يُغلقون من خارجها)
+        with self._loop_lock:
+            client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self) -> dict:
+        with self._loop_lock:
+            return {"loops": len(self._loop_clients)}
+
+
+def get_http_clients() -> tuple:
+    """
+    عميلا HTTP (متزامن وغير متزامن) مشتركان بين كل النماذج: مجمع اتصالات واحد
+    (Keep-Alive) بدل فتح اتصالات ومصافحات TLS جديدة لكل نموذج.
+    العميل غير المتزامن يحتفظ بمجمع اتصالات لكل حلقة أحداث (LoopBoundAsyncClient).
+    """
+    global _clients
+
+    if _clients is None:
+        with _shared_lock:
+            if _clients is None:
+                limits = httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                )
+                timeout = httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=10.0)
+                _clients = (
+                    httpx.Client(limits=limits, timeout=timeout),
+                    LoopBoundAsyncClient(limits=limits, timeout=timeout),
+                )
+    return _clients
+
+
+def create_chat_model(purpose: str = None, temperature: float = None, model: str = None) -> GuardedChatOpenAI:
+    """
+    المصنع الوحيد لنماذج الدردشة في المشروع (يستدعيه السجل الكسول app/core/registry.py).
+    purpose: الغرض (chat, critic, reporter...) يحدد درجة الحرارة من settings.LLM_TEMPERATURES
+    وصلاحية ذاكرة الردود من settings.LLM_CACHE_TTL_SECONDS.
+    """
+    settings.validate()
+    if temperature is None:
+        temperature = settings.LLM_TEMPERATURES.get(purpose, settings.TEMPERATURE)
+    http_client, http_async_client = get_http_clients()
+    # ذاكرة الردود للأغراض الحتمية فقط (درجة حرارة 0): نفس الرسائل → نفس الرد
+    cache = get_llm_cache(purpose) if temperature == 0 else None
+    return GuardedChatOpenAI(
+        model=model or settings.MODEL_NAME,
+        api_key=settings.OPENAI_API_KEY,
+        temperature=temperature,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=0,          # إعادة المحاولة مركزية (GuardedChatOpenAI) وليست لكل عميل
+        stream_usage=True,      # الاستهلاك الفعلي في آخر جزء من البث (لتسوية الميزانية)
+        http_client=http_client,
+        http_async_client=http_async_client,
+        cache=cache,
+    )
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.caches import BaseCache
+from app.core.config import settings
+
+# تجاوز الذاكرة للاستدعاءات داخل llm_cache_bypass() (ينتقل تلقائياً للخيوط والمهام الفرعية)
+_bypass = ContextVar("llm_cache_bypass", default=False)
+
+# مسافات النص ومحارف الأسطر المهربة داخل الرسائل المسلسلة (JSON)
+_WHITESPACE = re.compile(r"(?:\s|\\[nrt])+")
+
+
+@contextmanager
+def llm_cache_bypass():
+    """
+    تجاوز ذاكرة الردود لكل استدعاءات النموذج داخل الكتلة:
+        with llm_cache_bypass():
+            engine.analyze("AAPL")
+    الرد الجديد يحل محل المخزن (تحديث قسري).
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """توحيد المسافات والأسطر (الأوامر المكتوبة بإزاحة مختلفة تعطي نفس المفتاح)."""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+class LLMCacheStore:
+    """
+    جدول ردود النماذج في ملف SQLite مستقل (مثل نقاط الحفظ):
+    DuckDB يسمح بكاتب واحد للملف، أما هذه الذاكرة فتتشاركها الواجهة والخدمة ووضع الدفعات.
+
+    المفتاح: بصمة (الغرض + إعدادات النموذج من LangChain: الاسم ودرجة الحرارة... + الرسائل بعد التوحيد).
+    - الصلاحية (TTL) تُحدد عند الحفظ حسب الغرض (settings.LLM_CACHE_TTL_SECONDS).
+    - السعة (LRU): عند تجاوز max_entries نحذف الأقدم استخداماً.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = path or settings.LLM_CACHE_PATH
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # اتصال واحد مشترك بين الخيوط (الكتابة مسلسلة بالقفل)، و WAL للقراءة من عمليات أخرى
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                purpose TEXT,
+                created_at REAL,
+                expires_at REAL,
+                last_hit_at REAL,
+                hits INTEGER DEFAULT 0,
+                payload BLOB
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_hit ON llm_cache (last_hit_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0, "tokens_saved": 0}
+
+    @staticmethod
+    def key(purpose: str, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{purpose}|{llm_string}|{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    def get(self, key: str):
+        """الرد المخزن (قائمة Generation) أو None عند عدم الإصابة أو انتهاء الصلاحية."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM llm_cache WHERE key = ? AND expires_at > ?", [key, now]
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE llm_cache SET last_hit_at = ?, hits = hits + 1 WHERE key = ?", [now, key])
+                self._conn.commit()
+            self._metrics["hits" if row is not None else "misses"] += 1
+        return pickle.loads(row[0]) if row is not None else None
+
+    def put(self, key: str, purpose: str, generations: list, ttl: int):
+        now = time.time()
+        payload = pickle.dumps(generations, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO llm_cache (key, purpose, created_at, expires_at, last_hit_at, hits, payload)
+                VALUES (?, ?, ?, ?, ?, 0, ?)
+            """, [key, purpose, now, now + ttl, now, payload])
+            evicted = self._evict(now)
+            self._conn.commit()
+            self._metrics["stores"] += 1
+            self._metrics["evictions"] += evicted
+
+    def _evict(self, now: float) -> int:
+        # (يُستدعى والقفل محجوز) 1. المنتهية الصلاحية  2. ما زاد عن السعة، الأقدم استخداماً أولاً (LRU)
+        expired = self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", [now]).rowcount
+        overflow = self._conn.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_hit_at DESC LIMIT -1 OFFSET ?
+            )
+        """, [self.max_entries]).rowcount
+        return expired + overflow
+
+    def record(self, metric: str, value: int = 1):
+        with self._lock:
+            self._metrics[metric] += value
+
+    def clear(self, purpose: str = None) -> int:
+        """حذف الردود المخزنة (لغرض واحد أو للكل). Returns: عدد الصفوف المحذوفة."""
+        with self._lock:
+            if purpose is None:
+                deleted = self._conn.execute("DELETE FROM llm_cache").rowcount
+            else:
+                deleted = self._conn.execute("DELETE FROM llm_cache WHERE purpose = ?", [purpose]).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس الذاكرة (للوحة الإدارة والمراقبة)."""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            rows = self._conn.execute("SELECT purpose, count(*) FROM llm_cache GROUP BY purpose").fetchall()
+        snapshot["entries"] = dict(rows)
+        snapshot["max_entries"] = self.max_entries
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+
+class LLMResponseCache(BaseCache):
+    """
+    ذاكرة LangChain (model.cache) لغرض واحد: تتشارك الجدول نفسه مع باقي الأغراض
+    وتختلف بالصلاحية. LangChain يفحصها قبل الاستدعاء، فالإصابة لا تستهلك من ميزانية النماذج.
+    """
+
+    def __init__(self, purpose: str, ttl: int, store: LLMCacheStore = None):
+        self.purpose = purpose
+        self.ttl = ttl
+        self.store = store or get_llm_cache_store()
+
+    def lookup(self, prompt: str, llm_string: str):
+        if _bypass.get():
+            self.store.record("bypassed")
+            return None
+        generations = self.store.get(self.store.key(self.purpose, prompt, llm_string))
+        if generations is None:
+            return None
+        # الرد المخزن لم يستهلك توكنز هذه المرة (التتبع يقرأ usage_metadata)،
+        # والعلامة cache_hit تجعل التتبع يعده إصابة وليس استدعاءً خارجياً
+        saved = 0
+        for i, generation in enumerate(generations):
+            message = getattr(generation, "message", None)
+            if message is None:
+                continue
+            saved += (message.usage_metadata or {}).get("total_tokens", 0)
+            message = message.model_copy(update={
+                "usage_metadata": None,
+                "response_metadata": {**message.response_metadata, "cache_hit": True},
+            })
+            generations[i] = generation.model_copy(update={"message": message})
+        self.store.record("tokens_saved", saved)
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: list):
+        self.store.put(self.store.key(self.purpose, prompt, llm_string), self.purpose, return_val, self.ttl)
+
+    def clear(self, **kwargs):
+        self.store.clear(self.purpose)
+
+
+# نسخة واحدة من الجدول (Singleton Pattern)
+_store = None
+_store_lock = threading.Lock()
+
+def get_llm_cache_store() -> LLMCacheStore:
+    """
+    يعيد جدول ردود النماذج المشترك. إذا لم يكن موجوداً، يقوم بإنشائه.
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LLMCacheStore()
+                print(f"✅ LLM Cache: ذاكرة الردود في {_store.path}")
+    return _store
+
+
+def get_llm_cache(purpose: str):
+    """ذاكرة الردود لغرض (أو None إذا كانت معطلة أو لا صلاحية محددة للغرض)."""
+    ttl = settings.LLM_CACHE_TTL_SECONDS.get(purpose)
+    if not settings.LLM_CACHE_ENABLED or not ttl:
+        return None
+    return LLMResponseCache(purpose, ttl)
@@ -0,0 +1,53 @@
+from datetime import datetime, time, timedelta, timezone
+
+# جلسات التداول التقريبية بتوقيت UTC (بدون العطل الرسمية أو التوقيت الصيفي)
+# weekend: أيام الإغلاق حسب datetime.weekday() (الاثنين = 0 ... الأحد = 6)
+# None: سوق يعمل على مدار الساعة (عملات رقمية، فوركس، عقود آجلة)
+MARKET_SESSIONS = {
+    "US": {"weekend": {5, 6}, "open": time(14, 30), "close": time(21, 0)},
+    "TADAWUL": {"weekend": {4, 5}, "open": time(7, 0), "close": time(12, 0)},
+    "ALWAYS_OPEN": None,
+}
+
+def utc_now() -> datetime:
+    """الوقت الحالي بتوقيت UTC (بدون tzinfo ليتوافق مع أعمدة TIMESTAMP في DuckDB)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def market_of(symbol: str) -> str:
+    """
+    تخمين السوق من صيغة الرمز.
+    """
+    symbol = (symbol or "").upper()
+    if symbol.endswith(".SR"):
+        return "TADAWUL"
+    if "-" in symbol or "=" in symbol or symbol in ("XAUUSD", "GOLD", "EURUSD", "GBPUSD", "BTC"):
+        return "ALWAYS_OPEN"
+    return "US"
+
+def session_state(symbol: str, now: datetime = None) -> tuple[bool, datetime]:
+    """
+    يعيد (هل السوق مفتوح الآن؟، وقت آخر إغلاق مكتمل) بتوقيت UTC.
+    للأسواق المفتوحة دائماً: (True, None).
+    """
+    now = now or utc_now()
+    session = MARKET_SESSIONS[market_of(symbol)]
+    if session is None:
+        return True, None
+
+    is_open = (
+        now.weekday() not in session["weekend"]
+        and session["open"] <= now.time() < session["close"]
+    )
+
+    # نرجع للخلف حتى نجد آخر يوم تداول أُغلقت جلسته قبل الآن
+    last_close = None
+    for days_back in range(8):
+        day = (now - timedelta(days=days_back)).date()
+        if day.weekday() in session["weekend"]:
+            continue
+        close_dt = datetime.combine(day, session["close"])
+        if close_dt <= now:
+            last_close = close_dt
+            break
+
+    return is_open, last_close
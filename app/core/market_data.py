@@ -0,0 +1,291 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.core.database import get_db_pool
+from app.core.single_flight import SingleFlight
+from app.core.tracing import record
+
+class MarketDataHandle:
+    """
+    مرجع خفيف ومُرقّم (Versioned) للقطة أسعار رمز واحد في الذاكرة.
+
+    يُمرر في FinancialState بدل إعادة قراءة الأسعار من المستودع في كل عامل:
+    أي عامل يطلب البيانات عبر المرجع يحصل على نفس اللقطة طالما لم يتغير إصدارها.
+    الإصدار هو last_fetch_at من fetch_log (يتغير فقط عند جلب جديد من المصدر).
+    """
+    __slots__ = ("symbol", "version", "rows")
+
+    def __init__(self, symbol: str, version: str = None, rows: int = 0):
+        self.symbol = symbol
+        self.version = version
+        self.rows = rows
+
+    def __repr__(self):
+        return f"MarketDataHandle({self.symbol!r}, version={self.version!r}, rows={self.rows})"
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, MarketDataHandle)
+            and (self.symbol, self.version) == (other.symbol, other.version)
+        )
+
+    def __hash__(self):
+        return hash((self.symbol, self.version))
+
+
+class PriceSeries:
+    """
+    سلسلة أسعار رمز واحد بصيغة مصفوفات NumPy متجاورة وغير قابلة للتعديل.
+
+    هذا ما يُمرر في FinancialState بدل DataFrame: أخف في الذاكرة، والقص (tail / slice)
+    يعيد نظرات (Views) بدون نسخ، ولا يستطيع أي عامل تعديل البيانات المشتركة بالخطأ.
+    التحويل إلى DataFrame يتم فقط عند حافة الواجهة (to_frame).
+
+    الوصول بالأعمدة يعمل مثل DataFrame: series['close'] ، series['date'] ...
+    """
+    __slots__ = ("symbol", "version", "date", "open", "high", "low", "close", "volume")
+
+    # الأعمدة بنفس ترتيب DataLoader.get_data
+    COLUMNS = ("symbol", "date", "open", "high", "low", "close", "volume")
+    _ARRAYS = ("date", "open", "high", "low", "close", "volume")
+    _DTYPES = {
+        "date": "datetime64[D]",
+        "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64,
+        "volume": np.int64,
+    }
+
+    def __init__(self, symbol: str, date, open, high, low, close, volume, version: str = None):
+        object.__setattr__(self, "symbol", symbol)
+        object.__setattr__(self, "version", version)
+        columns = {"date": date, "open": open, "high": high, "low": low, "close": close, "volume": volume}
+        for name in self._ARRAYS:
+            array = np.ascontiguousarray(columns[name], dtype=self._DTYPES[name])
+            if array.flags.writeable:
+                # المصفوفة ملك هذه السلسلة فقط (نسخة أو مصفوفة جديدة): نقفلها
+                if array is columns[name] or array.base is not None:
+                    array = array.copy()
+                array.flags.writeable = False
+            object.__setattr__(self, name, array)
+
+        if len({len(getattr(self, name)) for name in self._ARRAYS}) > 1:
+            raise ValueError("❌ PriceSeries: أطوال الأعمدة غير متساوية.")
+
+    @classmethod
+    def from_table(cls, table, symbol: str, version: str = None) -> "PriceSeries":
+        """بناء السلسلة من جدول Arrow (الأعمدة الرقمية بدون نسخ)."""
+        columns = {
+            name: table.column(name).combine_chunks().to_numpy(zero_copy_only=False)
+            for name in cls._ARRAYS
+        }
+        return cls(symbol, version=version, **columns)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbol: str = None, version: str = None) -> "PriceSeries":
+        """بناء السلسلة من DataFrame بأعمدة get_data (للسكربتات والبيانات القديمة)."""
+        if symbol is None:
+            symbol = str(df['symbol'].iloc[0]) if 'symbol' in df.columns and len(df) else None
+        columns = {name: df[name].to_numpy() for name in cls._ARRAYS}
+        columns["date"] = pd.to_datetime(df['date']).to_numpy().astype("datetime64[D]")
+        return cls(symbol, version=version, **columns)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PriceSeries غير قابلة للتعديل: استخدم replace() لإنشاء نسخة معدلة.")
+
+    def __len__(self):
+        return len(self.close)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def columns(self) -> tuple:
+        return self.COLUMNS
+
+    def __getitem__(self, key):
+        """
+        series['close'] → مصفوفة العمود (للقراءة فقط).
+        series[-30:] → سلسلة جديدة من نظرات على نفس الذاكرة (بدون نسخ).
+        """
+        if isinstance(key, str):
+            if key == "symbol":
+                return self.symbol
+            if key in self._ARRAYS:
+                return getattr(self, key)
+            raise KeyError(key)
+        if isinstance(key, slice):
+            return self._derive(**{name: getattr(self, name)[key] for name in self._ARRAYS})
+        raise TypeError("PriceSeries تقبل اسم عمود أو شريحة (slice) فقط.")
+
+    def tail(self, n: int) -> "PriceSeries":
+        """آخر n يوم (نظرة بدون نسخ)."""
+        return self[max(len(self) - n, 0):]
+
+    def replace(self, **columns) -> "PriceSeries":
+        """نسخة بأعمدة مستبدلة (مثلاً close بعد التعقيم) تشارك باقي الأعمدة بدون نسخ."""
+        unknown = set(columns) - set(self._ARRAYS)
+        if unknown:
+            raise KeyError(f"أعمدة غير معروفة: {sorted(unknown)}")
+        return self._derive(**{name: columns.get(name, getattr(self, name)) for name in self._ARRAYS})
+
+    def _derive(self, **columns) -> "PriceSeries":
+        series = object.__new__(PriceSeries)
+        object.__setattr__(series, "symbol", self.symbol)
+        object.__setattr__(series, "version", self.version)
+        for name in self._ARRAYS:
+            array = columns[name]
+            if array is not getattr(self, name) and array.flags.writeable:
+                array = np.array(array, dtype=self._DTYPES[name])
+                array.flags.writeable = False
+            object.__setattr__(series, name, array)
+        return series
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame جديد بنفس شكل DataLoader.get_data (عمود date بصيغة datetime64[us]).
+        للواجهات فقط: النسخة مستقلة ويمكن تعديلها بحرية.
+        """
+        return pd.DataFrame({
+            "symbol": np.full(len(self), self.symbol, dtype=object),
+            "date": self.date.astype("datetime64[us]"),
+            "open": self.open.copy(),
+            "high": self.high.copy(),
+            "low": self.low.copy(),
+            "close": self.close.copy(),
+            "volume": self.volume.copy(),
+        })
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self._ARRAYS)
+
+    def __repr__(self):
+        span = f"{self.date[0]} → {self.date[-1]}" if len(self) else "empty"
+        return f"PriceSeries({self.symbol!r}, rows={len(self)}, {span})"
+
+    def __reduce__(self):
+        # الحفظ (pickle) يمر بالمنشئ لأن __setattr__ مقفل
+        return (
+            _rebuild_price_series,
+            (self.symbol, self.version, *(np.asarray(getattr(self, name)) for name in self._ARRAYS)),
+        )
+
+
+def _rebuild_price_series(symbol, version, date, open, high, low, close, volume):
+    return PriceSeries(symbol, date, open, high, low, close, volume, version=version)
+
+
+class SnapshotStore:
+    """
+    مخزن لقطات الأسعار في الذاكرة (PriceSeries مقروءة من Arrow بدون نسخ الأعمدة الرقمية).
+
+    - اللقطة تُقرأ من price_history مرة واحدة لكل إصدار.
+    - الطلبات المتزامنة لنفس الرمز تُدمج (Single-Flight) فلا تتكرر القراءة.
+    - عند امتلاء المخزن نحذف الأقدم استخداماً (LRU).
+    """
+
+    def __init__(self, capacity: int = None):
+        self.capacity = capacity or settings.SNAPSHOT_CAPACITY
+        self.pool = get_db_pool()
+        self._snapshots = OrderedDict()   # symbol -> (version, PriceSeries)
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self._metrics = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def current_version(self, symbol: str):
+        """إصدار بيانات الرمز في المستودع الآن (استعلام مفتاح أساسي واحد على fetch_log)."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT last_fetch_at FROM fetch_log WHERE symbol = ?", [symbol]
+            ).fetchone()
+        return row[0].isoformat() if row and row[0] is not None else None
+
+    def open(self, symbol: str) -> MarketDataHandle:
+        """
+        يعيد مرجعاً لأحدث لقطة للرمز (ويقرؤها من المستودع إذا كانت قديمة أو غير موجودة).
+        """
+        clean_symbol = symbol.strip().upper()
+        version, series = self._get(clean_symbol, self.current_version(clean_symbol))
+        return MarketDataHandle(clean_symbol, version, len(series))
+
+    def series(self, ref) -> PriceSeries:
+        """
+        اللقطة المشتركة (غير قابلة للتعديل، فلا حاجة لنسخها). ref: مرجع MarketDataHandle أو رمز نصي.
+        المرجع يُخدم من الذاكرة مباشرة إذا كان إصداره مخزناً (بدون أي استعلام)،
+        أما الرمز النصي فيُقارن أولاً بالإصدار الحالي في المستودع.
+        """
+        if isinstance(ref, MarketDataHandle):
+            with self._lock:
+                cached = self._snapshots.get(ref.symbol)
+                if cached is not None and cached[0] == ref.version:
+                    self._snapshots.move_to_end(ref.symbol)
+                    self._metrics["hits"] += 1
+                    return cached[1]
+            symbol = ref.symbol
+        else:
+            symbol = ref.strip().upper()
+        return self._get(symbol, self.current_version(symbol))[1]
+
+    def frame(self, ref) -> pd.DataFrame:
+        """
+        نسخة pandas من اللقطة بنفس شكل DataLoader.get_data (للواجهات والسكربتات).
+        كل استدعاء يعيد DataFrame مستقلاً، فتعديله لا يغير اللقطة المشتركة.
+        """
+        return self.series(ref).to_frame()
+
+    def _get(self, symbol: str, version):
+        with self._lock:
+            cached = self._snapshots.get(symbol)
+            if cached is not None and cached[0] == version:
+                self._snapshots.move_to_end(symbol)
+                self._metrics["hits"] += 1
+                return cached
+
+        return self._loads.do((symbol, version), lambda: self._load(symbol, version))
+
+    def _load(self, symbol: str, version):
+        with self.pool.connection() as conn:
+            result = conn.execute("""
+                SELECT symbol, date, open, high, low, close, volume
+                FROM price_history WHERE symbol = ? ORDER BY date
+            """, [symbol])
+            fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+            table = fetch()
+        record(rows=table.num_rows)
+        series = PriceSeries.from_table(table, symbol, version)
+
+        with self._lock:
+            self._metrics["loads"] += 1
+            self._snapshots[symbol] = (version, series)
+            self._snapshots.move_to_end(symbol)
+            while len(self._snapshots) > self.capacity:
+                self._snapshots.popitem(last=False)
+                self._metrics["evictions"] += 1
+        return version, series
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس المخزن (للوحة الإدارة والمراقبة)."""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["symbols"] = len(self._snapshots)
+        snapshot["capacity"] = self.capacity
+        return snapshot
+
+
+# نسخة واحدة من المخزن (Singleton Pattern): مشتركة بين كل العمال والخيوط
+_snapshot_store = None
+_snapshot_store_lock = threading.Lock()
+
+def get_snapshot_store() -> SnapshotStore:
+    """
+    يعيد مخزن اللقطات المشترك. إذا لم يكن موجوداً، يقوم بإنشائه.
+    """
+    global _snapshot_store
+
+    if _snapshot_store is None:
+        with _snapshot_store_lock:
+            if _snapshot_store is None:
+                _snapshot_store = SnapshotStore()
+    return _snapshot_store
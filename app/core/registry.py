@@ -0,0 +1,179 @@
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.core.config import settings
+from app.core.single_flight import SingleFlight
+
+# ==========================================
+# مصانع المكونات الثقيلة (تُستورد وتُبنى عند أول استخدام فقط)
+# ==========================================
+def _chat_model(purpose: str):
+    # استيراد langchain_openai (ومكتبة openai) مكلف: نؤجله لأول عقدة تحتاج نموذجاً
+    from app.core.llm import create_chat_model
+    return create_chat_model(purpose)
+
+
+def _tavily_client(use_async: bool = False):
+    if not settings.TAVILY_API_KEY:
+        return None
+    from tavily import TavilyClient, AsyncTavilyClient
+    return (AsyncTavilyClient if use_async else TavilyClient)(api_key=settings.TAVILY_API_KEY)
+
+
+# الاسم → مصنع: "الوحدة:الاسم" (يُستورد عند الطلب) أو دالة بدون معاملات
+COMPONENTS = {
+    # أدوات التحليل (نماذج محفوظة ومكتبات علمية)
+    "sanitizer": "app.components.defense.sanitizer:DataSanitizer",            # joblib + sklearn
+    "forecaster": "app.components.forecasting.statistical:TimeSeriesForecaster",  # statsforecast
+    "crash_classifier": "app.components.risk.crash_clf:CrashClassifier",      # xgboost
+    "fundamental_metrics": "app.components.fundamental.metrics:FundamentalMetrics",
+    "sentiment_engine": "app.components.research.sentiment:SentimentEngine",  # tavily + LLM
+    "commander": "app.engine.strategy_team.chief_commander:ChiefCommander",
+    "ticker_recognizer": "app.components.intent.recognizer:TickerRecognizer",  # فهرس الرموز والأسماء
+
+    # نماذج اللغة (درجة الحرارة حسب الغرض: settings.LLM_TEMPERATURES)
+    # كلها تتشارك مجمع اتصالات HTTP وميزانية الاستدعاءات (app/core/llm.py)
+    **{f"llm.{purpose}": partial(_chat_model, purpose) for purpose in (
+        "chat", "critic", "reporter", "writer", "vision", "intent", "commander", "sentiment",
+    )},
+    "report_chain": "app.engine.execution_team.workers.reporter:build_report_chain",
+
+    # عملاء البحث (None إذا لم يوجد مفتاح)
+    "tavily": partial(_tavily_client, False),
+    "atavily": partial(_tavily_client, True),
+}
+
+# المكونات التي يحتاجها مخطط التحليل (ما يحمله warmup() افتراضياً)
+GRAPH_COMPONENTS = (
+    "sanitizer", "forecaster", "fundamental_metrics", "sentiment_engine", "commander",
+    "llm.chat", "llm.critic", "report_chain", "tavily", "atavily",
+)
+
+
+class LazyRegistry:
+    """
+    سجل كسول (Lazy) للمكونات الثقيلة: النماذج المحفوظة، عملاء LLM، ومكتبات التنبؤ.
+
+    استيراد أي وحدة في المشروع لا يحمّل شيئاً من هذه المكونات؛ كل مكون يُبنى مرة
+    واحدة عند أول get() ثم يُشارك بين كل العقد والخيوط. الطلبات المتزامنة لنفس
+    المكون تُدمج (Single-Flight) فلا يُبنى مرتين. warmup() يحمّلها مسبقاً عند الحاجة.
+    """
+
+    def __init__(self, factories: dict = None):
+        self._factories = dict(factories or {})
+        self._instances = {}
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self._load_ms = {}
+
+    def register(self, name: str, factory, replace: bool = False):
+        """تسجيل مكون جديد: factory نص "الوحدة:الاسم" أو دالة بدون معاملات."""
+        with self._lock:
+            if name in self._factories and not replace:
+                raise ValueError(f"المكون {name} مسجل مسبقاً.")
+            self._factories[name] = factory
+            if replace:
+                self._instances.pop(name, None)
+
+    def set(self, name: str, instance):
+        """حقن نسخة جاهزة (للاختبارات أو لاستبدال التطبيق الافتراضي)."""
+        with self._lock:
+            self._instances[name] = instance
+
+    def reset(self, name: str = None):
+        """نسيان النسخ المحملة (كلها أو واحدة) لتُبنى من جديد عند الطلب التالي."""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+                self._load_ms.clear()
+            else:
+                self._instances.pop(name, None)
+                self._load_ms.pop(name, None)
+
+    def get(self, name: str):
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            if name not in self._factories:
+                raise KeyError(f"مكون غير معروف: {name}")
+        return self._loads.do(name, lambda: self._load(name))
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            return name in self._instances
+
+    def _load(self, name: str):
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            factory = self._factories[name]
+
+        started = time.perf_counter()
+        if isinstance(factory, str):
+            module_name, attr = factory.split(":")
+            factory = getattr(importlib.import_module(module_name), attr)
+        instance = factory()
+
+        with self._lock:
+            self._instances[name] = instance
+            self._load_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+        return instance
+
+    def warmup(self, names: list = None, workers: int = 4) -> dict:
+        """
+        تحميل المكونات مسبقاً (الكل افتراضياً) بالتوازي، مثلاً أثناء انتظار مدخلات المستخدم.
+        المكون الذي يفشل تحميله لا يوقف الباقي (سيُعاد المحاولة عند أول استخدام).
+        Returns: {الاسم: زمن التحميل بالمللي ثانية، أو رسالة الخطأ}
+        """
+        names = list(names or self._factories)
+
+        def load(name):
+            try:
+                self.get(name)
+                return name, self._load_ms.get(name, 0.0)
+            except Exception as e:
+                return name, f"❌ {e}"
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(names)))) as pool:
+            return dict(pool.map(load, names))
+
+    def stats(self) -> dict:
+        """المكونات المحملة وزمن تحميل كل منها (للوحة الإدارة والمراقبة)."""
+        with self._lock:
+            return {
+                "registered": len(self._factories),
+                "loaded": sorted(self._instances),
+                "load_ms": dict(self._load_ms),
+            }
+
+
+# نسخة واحدة من السجل (Singleton Pattern)
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> LazyRegistry:
+    """
+    يعيد السجل المشترك. إذا لم يكن موجوداً، يقوم بإنشائه.
+    """
+    global _registry
+
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = LazyRegistry(COMPONENTS)
+    return _registry
+
+
+def get_component(name: str):
+    """اختصار: get_registry().get(name)"""
+    return get_registry().get(name)
+
+
+def warmup(names: list = None) -> dict:
+    """
+    تحميل مكونات مخطط التحليل مسبقاً (GRAPH_COMPONENTS افتراضياً).
+    تستدعيه الواجهات في الخلفية أثناء انتظار المستخدم، ووضع الدفعات قبل البدء.
+    """
+    return get_registry().warmup(names or GRAPH_COMPONENTS)
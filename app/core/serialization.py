@@ -0,0 +1,11 @@
+def json_default(value):
+    """
+    تحويل القيم التي لا يعرفها json.dumps (للاستخدام: default=json_default)
+    في مخرجات الدفعات (main.py) وردود خدمة HTTP (app/api/jobs.py).
+    """
+    # قيم NumPy (مثل numpy.bool_ في تقرير المخاطر) والتواريخ
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,73 @@
+import threading
+
+class _Call:
+    """استدعاء واحد قيد التنفيذ ينتظره كل من طلب نفس المفتاح."""
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    دمج الطلبات المتزامنة (Request Coalescing) حسب المفتاح.
+
+    إذا طلب عدة خيوط نفس المفتاح في نفس اللحظة، ينفذ الأول الدالة فعلياً
+    وينتظر الباقون نتيجته (أو الاستثناء نفسه) بدل تكرار العمل.
+    بعد انتهاء الاستدعاء يُحذف المفتاح، فالطلب التالي ينفذ من جديد (لا يوجد تخزين مؤقت).
+
+    الاستخدام:
+        flights = SingleFlight()
+        result = flights.do("AAPL", lambda: download("AAPL"))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._metrics = {"executed": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        """
+        ينفذ fn() مرة واحدة لكل مفتاح قيد التنفيذ ويعيد نتيجتها لكل المنتظرين.
+        ⚠️ لا تستدعِ do بنفس المفتاح من داخل fn (سيؤدي ذلك إلى انتظار الذات).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._metrics["executed"] += 1
+            else:
+                call.waiters += 1
+                self._metrics["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> list:
+        """المفاتيح التي يجري تنفيذها الآن."""
+        with self._lock:
+            return list(self._calls)
+
+    def stats(self) -> dict:
+        """لقطة من مقاييس الدمج (للوحة الإدارة والمراقبة)."""
+        with self._lock:
+            snapshot = dict(self._metrics)
+            snapshot["in_flight"] = len(self._calls)
+        return snapshot
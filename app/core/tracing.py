@@ -0,0 +1,187 @@
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from app.core.config import settings
+
+# الامتداد (Span) الحالي للعقدة قيد التنفيذ (ينتقل تلقائياً للخيوط والمهام الفرعية)
+_current_span = ContextVar("workflow_span", default=None)
+
+# معالج LangChain النشط داخل العقدة: أي استدعاء LLM يضيفه تلقائياً لعداداته
+_llm_handler = ContextVar("workflow_llm_handler", default=None)
+register_configure_hook(_llm_handler, inheritable=True)
+
+_export_lock = threading.Lock()
+
+
+class _TokenUsageHandler(BaseCallbackHandler):
+    """
+    يجمع عدد استدعاءات النموذج واستهلاك التوكنز داخل امتداد واحد.
+    الاستدعاء يُعد عند انتهائه: الرد من ذاكرة الردود (LLMResponseCache) يُعد إصابة وليس استدعاءً خارجياً.
+    """
+
+    def __init__(self, span: dict):
+        self.span = span
+
+    def on_llm_end(self, response, **kwargs):
+        cached = False
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                cached |= bool(getattr(message, "response_metadata", {}).get("cache_hit"))
+                usage = getattr(message, "usage_metadata", None) or {}
+                self._count("llm.input_tokens", usage.get("input_tokens", 0))
+                self._count("llm.output_tokens", usage.get("output_tokens", 0))
+                self._count("llm.total_tokens", usage.get("total_tokens", 0))
+        if cached:
+            self._count("llm.cache_hits", 1)
+        else:
+            self._count_call()
+
+    def on_llm_error(self, error, **kwargs):
+        # الطلب وصل للمزود (أو حاول) حتى لو فشل
+        self._count_call()
+
+    def _count_call(self):
+        self._count("llm.calls", 1)
+        self._count("node.external_calls", 1)
+
+    def _count(self, key: str, value: int):
+        with self.span["_lock"]:
+            self.span["attributes"][key] += value
+
+
+def record(rows: int = 0, external_calls: int = 0):
+    """
+    إضافة عدادات للامتداد الحالي (إن وجد). يستدعيها DataLoader ومحرك الجلب وعملاء البحث.
+    خارج أي عقدة متتبعة لا تفعل شيئاً.
+    """
+    span = _current_span.get()
+    if span is None:
+        return
+    with span["_lock"]:
+        span["attributes"]["node.rows"] += rows
+        span["attributes"]["node.external_calls"] += external_calls
+
+
+def traced(name: str, node):
+    """
+    تغليف عقدة LangGraph (متزامنة أو غير متزامنة) بامتداد تتبع.
+
+    يسجل لكل تنفيذ: زمن الجدار، زمن المعالج (للخيط المنفذ)، الصفوف المقروءة/المكتوبة،
+    الاستدعاءات الخارجية، واستهلاك توكنز النموذج. الامتداد يُضاف إلى trace_spans في الحالة
+    ويُصدّر إلى ملف JSONL (TRACE_PATH) بصيغة متوافقة مع OpenTelemetry.
+    """
+    if inspect.iscoroutinefunction(node):
+        @wraps(node)
+        async def async_wrapper(state):
+            span, tokens = _start(name, state)
+            try:
+                update = await node(state)
+            except BaseException as e:
+                _finish(span, tokens, error=e)
+                raise
+            return _attach(state, update, _finish(span, tokens))
+        return async_wrapper
+
+    @wraps(node)
+    def wrapper(state):
+        span, tokens = _start(name, state)
+        try:
+            update = node(state)
+        except BaseException as e:
+            _finish(span, tokens, error=e)
+            raise
+        return _attach(state, update, _finish(span, tokens))
+    return wrapper
+
+
+def _start(name: str, state: dict):
+    span = {
+        "trace_id": state.get("run_id") or uuid.uuid4().hex,
+        "span_id": secrets.token_hex(8),
+        "parent_span_id": None,
+        "name": name,
+        "start_time_unix_nano": time.time_ns(),
+        "attributes": {
+            "node.wall_ms": 0.0,
+            "node.cpu_ms": 0.0,
+            "node.rows": 0,
+            "node.external_calls": 0,
+            "llm.calls": 0,
+            "llm.cache_hits": 0,
+            "llm.input_tokens": 0,
+            "llm.output_tokens": 0,
+            "llm.total_tokens": 0,
+            "workflow.symbol": state.get("symbol"),
+        },
+        "status": {"code": "OK"},
+        "_lock": threading.Lock(),
+        "_wall": time.perf_counter(),
+        "_cpu": time.thread_time(),
+    }
+    tokens = (_current_span.set(span), _llm_handler.set(_TokenUsageHandler(span)))
+    return span, tokens
+
+
+def _finish(span: dict, tokens, error: BaseException = None) -> dict:
+    _current_span.reset(tokens[0])
+    _llm_handler.reset(tokens[1])
+
+    attributes = span["attributes"]
+    attributes["node.wall_ms"] = round((time.perf_counter() - span.pop("_wall")) * 1000, 3)
+    # للعقد غير المتزامنة: يشمل زمن المعالج ما نفذته الحلقة لمهام أخرى أثناء الانتظار (تقريبي)
+    attributes["node.cpu_ms"] = round((time.thread_time() - span.pop("_cpu")) * 1000, 3)
+    span["end_time_unix_nano"] = time.time_ns()
+    span.pop("_lock")
+    if error is not None:
+        span["status"] = {"code": "ERROR", "message": str(error)}
+
+    export(span)
+    return span
+
+
+def _attach(state: dict, update, span: dict):
+    if not isinstance(update, dict):
+        return update
+    update = dict(update)
+    update["trace_spans"] = [span]
+    # أول عقدة في التشغيل تثبت معرف التتبع لباقي العقد
+    if not state.get("run_id"):
+        update["run_id"] = span["trace_id"]
+    return update
+
+
+def export(span: dict):
+    """إلحاق امتداد بملف JSONL (سطر لكل امتداد)."""
+    if not settings.TRACING_ENABLED or not settings.TRACE_PATH:
+        return
+    try:
+        line = json.dumps(span, ensure_ascii=False, default=str)
+        with _export_lock:
+            os.makedirs(os.path.dirname(settings.TRACE_PATH) or ".", exist_ok=True)
+            with open(settings.TRACE_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except Exception as e:
+        # التتبع لا يجب أن يوقف التحليل
+        print(f"⚠️ Tracing: تعذر تصدير الامتداد: {e}")
+
+
+def summarize(spans: list) -> str:
+    """جدول نصي مختصر لأزمنة العقد (للطباعة في نهاية التشغيل)."""
+    lines = []
+    for span in sorted(spans or [], key=lambda s: s["start_time_unix_nano"]):
+        a = span["attributes"]
+        lines.append(
+            f"   {span['name']:<12} {a['node.wall_ms']:>9.1f} ms  cpu {a['node.cpu_ms']:>8.1f} ms  "
+            f"rows {a['node.rows']:>6}  calls {a['node.external_calls']:>3}  tokens {a['llm.total_tokens']:>6}"
+            + ("" if span["status"]["code"] == "OK" else "  ❌")
+        )
+    return "\n".join(lines)
@@ -1,5 +1,6 @@
 from langgraph.graph import StateGraph, END
 from app.engine.state import FinancialState
+from app.core.market_data import get_snapshot_store
 
 # استيراد جميع العمال (The Workers)
 from app.engine.execution_team.workers.data_loader import DataLoader
@@ -15,13 +16,15 @@ def loader_node(state):
     print("--- 🏗️ Task Manager: تشغيل عامل التحميل ---")
     symbol = state.get('symbol')
     # نحاول تحميل بيانات سنة كاملة
-    success, msg = loader.fetch_and_store_data(symbol, period="1y")
+    success, msg = loader.ensure_fresh(symbol, period="1y")
     
     if not success:
         return {"final_report": f"فشل تحميل البيانات: {msg}"}
         
-    df = loader.get_data(symbol)
-    return {"market_data": df}
+    # لقطة واحدة في الذاكرة يتشاركها باقي العمال عبر المرجع
+    snapshots = get_snapshot_store()
+    handle = snapshots.open(symbol)
+    return {"market_data": snapshots.series(handle), "market_handle": handle}
 
 class TaskManager:
     def __init__(self):
@@ -50,13 +53,13 @@ class TaskManager:
         # بعد التحميل -> اذهب للدفاع
         workflow.add_edge("loader", "defender")
         
-        # بعد الدفاع -> شغل المحللين الثلاثة (يمكن تشغيلهم بالتوالي في LangGraph البسيط)
-        workflow.add_edge("defender", "fundamental")
-        workflow.add_edge("fundamental", "technical")
-        workflow.add_edge("technical", "researcher")
+        # بعد الدفاع -> شغل المحللين الثلاثة بالتوازي (Fan-out)
+        analysts = ["fundamental", "technical", "researcher"]
+        for analyst in analysts:
+            workflow.add_edge("defender", analyst)
         
-        # بعد انتهاء الجميع -> اذهب للكاتب
-        workflow.add_edge("researcher", "writer")
+        # بعد انتهاء الجميع -> اذهب للكاتب (Join)
+        workflow.add_edge(analysts, "writer")
         
         # النهاية
         workflow.add_edge("writer", END)
@@ -1,73 +1,104 @@
-import yfinance as yf
 import pandas as pd
-from app.core.database import get_db_connection
+from datetime import timedelta
+from app.core.archive import PriceArchive
+from app.core.config import settings
+from app.core.database import get_db_pool
+from app.core.fetcher import get_market_fetcher
+from app.core.features import FeatureStore
+from app.core.market_calendar import session_state, utc_now
+from app.core.single_flight import SingleFlight
+from app.core.tracing import record
+
+# أعمدة جدول الأسعار المسموح بقراءتها (قائمة بيضاء لبناء الاستعلامات بأمان)
+PRICE_COLUMNS = ('symbol', 'date', 'open', 'high', 'low', 'close', 'volume')
+
+# اسم المصدر كما يُسجل في fetch_log
+FETCH_SOURCE = "yfinance"
+
+# دمج التحميلات المتزامنة لنفس الرمز (مشترك بين كل نسخ DataLoader)
+_fetch_flights = SingleFlight()
 
 class DataLoader:
     def __init__(self):
-        # نفتح اتصالاً مع قاعدة البيانات عند إنشاء العامل
-        self.conn = get_db_connection()
+        # مجمع الاتصالات المشترك: كل عملية تحجز مؤشراً مستقلاً آمناً للخيوط
+        # (لا نحجز أي اتصال أثناء التحميل من الشبكة)
+        self.pool = get_db_pool()
+        # محرك الجلب المشترك (حدود تزامن ومعدل عامة + إعادة المحاولة)
+        self.fetcher = get_market_fetcher()
+        # الخصائص الفنية المحسوبة مسبقاً (تُحدّث تزايدياً بعد كل كتابة)
+        self.features = FeatureStore()
 
-    def fetch_and_store_data(self, symbol: str, period: str = "2y"):
+    def fetch_and_store_data(self, symbol: str, period: str = "2y", incremental: bool = True):
         """
         يجلب البيانات من الإنترنت ويخزنها في المستودع المحلي.
+
+        الطلبات المتزامنة لنفس الرمز تُدمج (Single-Flight): تحميل واحد فقط يصل للشبكة
+        ويكتب في المستودع، وباقي الطلبات تنتظره وتتشارك نتيجته.
+
+        Args:
+            symbol: رمز السهم.
+            period: المدى الزمني عند التحميل الكامل (سهم جديد أو إعادة بناء).
+            incremental: إذا كان للرمز تاريخ مخزن، نجلب الذيل الناقص فقط
+                         (مع تداخل بسيط لالتقاط تعديلات التجزئة والتوزيعات).
         """
-        # تنظيف الرمز الأساسي
-        clean_symbol = symbol.strip().upper()
-        
-        # 🟢 بداية التعديل: إصلاح الرموز الخاصة (Mapping Fix)
-        # Yahoo Finance يستخدم رموزاً خاصة للذهب والعملات، نحولها هنا
-        original_symbol = clean_symbol # نحتفظ بالاسم الأصلي للطباعة
-        
-        if clean_symbol == "XAUUSD" or clean_symbol == "GOLD":
-            clean_symbol = "GC=F" # العقود الآجلة للذهب
+        original_symbol, _ = self._resolve_symbol(symbol)
+        if original_symbol in _fetch_flights.in_flight():
+            print(f"   >> ⏳ يوجد تحميل جارٍ لـ {original_symbol}، بانتظار نتيجته بدل تكرار الطلب...")
+        return _fetch_flights.do(
+            original_symbol,
+            lambda: self._fetch_and_store(symbol, period=period, incremental=incremental),
+        )
+
+    def _fetch_and_store(self, symbol: str, period: str = "2y", incremental: bool = True):
+        """التنفيذ الفعلي لـ fetch_and_store_data (بدون دمج الطلبات)."""
+        original_symbol, clean_symbol = self._resolve_symbol(symbol)
+        if clean_symbol != original_symbol:
             print(f"   >> 🔄 تم تحويل الرمز {original_symbol} إلى {clean_symbol} ليتوافق مع Yahoo Finance.")
-        elif clean_symbol == "EURUSD":
-            clean_symbol = "EURUSD=X"
-        elif clean_symbol == "GBPUSD":
-            clean_symbol = "GBPUSD=X"
-        elif clean_symbol == "BTC":
-            clean_symbol = "BTC-USD"
-            
+
         print(f"--- 📥 Loader: جاري الاتصال بالسوق لجلب بيانات {clean_symbol} ---")
-        
+
         try:
-            # 1. الاتصال بـ Yahoo Finance
-            ticker = yf.Ticker(clean_symbol)
-            df = ticker.history(period=period)
-            
-            # محاولة ثانية إذا فشل الجلب
-            if df.empty:
-                print("   >> ⚠️ محاولة ثانية بمدى زمني أقصر (1 سنة)...")
-                df = ticker.history(period="1y")
-            
+            # 1. الاتصال بـ Yahoo Finance (عبر محرك الجلب)
+            # آخر تاريخ مخزن لدينا (None = سهم جديد → تحميل كامل)
+            last_date = self.get_last_date(original_symbol) if incremental else None
+
+            if last_date is not None:
+                # المزامنة التزايدية: نجلب الذيل فقط مع أيام تداخل
+                start_date = last_date - timedelta(days=settings.SYNC_OVERLAP_DAYS)
+                print(f"   >> ⚡ مزامنة تزايدية منذ {start_date} (آخر تاريخ مخزن: {last_date})")
+                df = self.fetcher.history(clean_symbol, start=start_date.isoformat())
+
+                if df.empty:
+                    with self.pool.connection() as conn:
+                        self._record_fetch(conn, [original_symbol])
+                    msg = f"البيانات محدثة مسبقاً لـ {original_symbol} (لا توجد أيام جديدة)."
+                    print(f"   ✅ {msg}")
+                    return True, msg
+            else:
+                df = self.fetcher.history(clean_symbol, period=period)
+
+                # محاولة ثانية إذا فشل الجلب
+                if df.empty:
+                    print("   >> ⚠️ محاولة ثانية بمدى زمني أقصر (1 سنة)...")
+                    df = self.fetcher.history(clean_symbol, period="1y")
+
             if df.empty:
                 return False, f"فشل تحميل البيانات للرمز {clean_symbol}. تأكد من صحة الرمز."
 
             # 2. تنظيف وتنسيق البيانات
-            df.reset_index(inplace=True)
-            df['Date'] = df['Date'].dt.date
-            
-            # تنسيق الأعمدة لقاعدة البيانات
-            df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
-            df.columns = ['date', 'open', 'high', 'low', 'close', 'volume']
-            
-            # ⚠️ ملاحظة هامة: نخزن البيانات باسم الرمز الأصلي (مثل XAUUSD)
-            # لكي يجده باقي الفريق (المحلل الفني والكمي) بنفس الاسم الذي يعرفونه
-            df['symbol'] = original_symbol 
-            
-            # 3. التخزين في DuckDB
-            # نحذف البيانات القديمة لنفس الرمز (الأصلي)
-            self.conn.execute(f"DELETE FROM stock_prices WHERE symbol = '{original_symbol}'")
-            
-            self.conn.register('temp_df', df)
-            self.conn.execute("""
-                INSERT INTO stock_prices 
-                (symbol, date, open, high, low, close, volume)
-                SELECT symbol, date, open, high, low, close, volume FROM temp_df
-            """)
-            self.conn.unregister('temp_df')
-            
-            msg = f"تم بنجاح تحميل وتخزين {len(df)} يوم تداول لـ {original_symbol}."
+            df = self._normalize_history(df, original_symbol)
+
+            # 3. فحص التداخل: إذا تغيرت الأسعار المخزنة فهناك تعديل (تجزئة/توزيعات)
+            # يشمل كامل التاريخ، فنعود للتحميل الكامل بدل ترقيع الذيل فقط
+            if last_date is not None and original_symbol in self._changed_symbols(df):
+                print("   >> 🔁 تم رصد تعديل تاريخي في الأسعار (Split/Dividend). إعادة تحميل كاملة...")
+                return self._fetch_and_store(symbol, period=period, incremental=False)
+
+            # 4. التخزين في DuckDB داخل معاملة واحدة (Transaction)
+            self._store(df, replace_symbols=[] if last_date is not None else [original_symbol])
+
+            mode = "مزامنة" if last_date is not None else "تحميل وتخزين"
+            msg = f"تم بنجاح {mode} {len(df)} يوم تداول لـ {original_symbol}."
             print(f"   ✅ {msg}")
             return True, msg
 
@@ -76,14 +107,385 @@ class DataLoader:
             print(f"   ❌ {error_msg}")
             return False, error_msg
 
+    def fetch_many(self, symbols: list, period: str = "2y", incremental: bool = True, batch_size: int = 100) -> dict:
+        """
+        مسار الجلب الجماعي لقوائم المراقبة (Watchlists).
+        يجلب عدة رموز في طلب واحد لكل دفعة، يجمع كل الجداول في مخزن عمودي واحد،
+        ثم يكتبها في stock_prices بعملية INSERT ... SELECT واحدة داخل معاملة واحدة.
+
+        Returns:
+            dict: {الرمز: (success, msg)} بنفس صيغة fetch_and_store_data.
+        """
+        # خريطة: الرمز الأصلي -> رمز Yahoo (مع إزالة التكرار)
+        mapping = {}
+        for symbol in symbols:
+            if symbol and symbol.strip():
+                original_symbol, clean_symbol = self._resolve_symbol(symbol)
+                mapping[original_symbol] = clean_symbol
+
+        if not mapping:
+            return {}
+
+        print(f"--- 📥 Loader: جلب جماعي لـ {len(mapping)} رمز (دفعات من {batch_size}) ---")
+
+        # آخر تاريخ مخزن لكل الرموز باستعلام واحد
+        last_dates = self.get_last_dates(list(mapping)) if incremental else {}
+
+        frames = []
+        replace_symbols = []
+
+        try:
+            # 1. الرموز الموجودة: مزامنة تزايدية، الدفعات مجمعة حسب آخر تاريخ مخزن
+            # (رمز متأخر واحد لا يجعل الدفعة كلها تحمل تاريخاً طويلاً)
+            synced = [s for s in mapping if s in last_dates]
+            by_date = {}
+            for symbol in synced:
+                by_date.setdefault(last_dates[symbol], []).append(symbol)
+            batches, params = [], []
+            for last_date, group in sorted(by_date.items()):
+                start = (last_date - timedelta(days=settings.SYNC_OVERLAP_DAYS)).isoformat()
+                for batch in self._batches(group, batch_size):
+                    batches.append(batch)
+                    params.append({"start": start})
+            frames.extend(self._download_all(batches, mapping, params))
+
+            # إعادة التحميل الكامل للرموز التي تغير تاريخها (Split/Dividend)
+            changed = set()
+            for frame in frames:
+                changed |= self._changed_symbols(frame)
+            if changed:
+                print(f"   >> 🔁 تعديل تاريخي في {len(changed)} رمز. إعادة تحميل كاملة لها...")
+                frames = [f[~f['symbol'].isin(changed)] for f in frames]
+                replace_symbols.extend(changed)
+
+            # 2. الرموز الجديدة (أو المتغيرة): تحميل كامل بالمدى المطلوب
+            full = [s for s in mapping if s not in last_dates or s in changed]
+            batches = list(self._batches(full, batch_size))
+            frames.extend(self._download_all(batches, mapping, [{"period": period}] * len(batches)))
+
+            frames = [f for f in frames if not f.empty]
+            buffer = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+            # 3. كتابة واحدة لكل الرموز
+            counts = {}
+            if not buffer.empty:
+                stored = set(buffer['symbol'])
+                self._store(buffer, replace_symbols=[s for s in replace_symbols if s in stored])
+                counts = buffer.groupby('symbol').size().to_dict()
+                print(f"   ✅ تم تخزين {len(buffer)} صف لـ {len(counts)} رمز في عملية كتابة واحدة.")
+
+            # الرموز المحدثة مسبقاً: نسجل أننا سألنا المصدر (لتعمل سياسة الحداثة)
+            up_to_date = [s for s in synced if s not in counts and s not in changed]
+            if up_to_date:
+                with self.pool.connection() as conn:
+                    self._record_fetch(conn, up_to_date)
+
+        except Exception as e:
+            error_msg = f"خطأ فني في التحميل الجماعي: {str(e)}"
+            print(f"   ❌ {error_msg}")
+            return {symbol: (False, error_msg) for symbol in mapping}
+
+        results = {}
+        for symbol, clean_symbol in mapping.items():
+            if symbol in counts:
+                results[symbol] = (True, f"تم بنجاح تخزين {counts[symbol]} يوم تداول لـ {symbol}.")
+            elif symbol in last_dates and symbol not in changed:
+                results[symbol] = (True, f"البيانات محدثة مسبقاً لـ {symbol} (لا توجد أيام جديدة).")
+            else:
+                results[symbol] = (False, f"فشل تحميل البيانات للرمز {clean_symbol}. تأكد من صحة الرمز.")
+        return results
+
+    def _download_all(self, batches: list, mapping: dict, params: list) -> list:
+        """
+        تحميل عدة دفعات بالتوازي عبر محرك الجلب (كل دفعة طلب واحد).
+        Returns: قائمة جداول بهيكل stock_prices (جدول لكل دفعة).
+        """
+        raws = self.fetcher.many([
+            ("download", [mapping[s] for s in batch],
+             {"group_by": "ticker", "auto_adjust": True, "threads": True, **kwargs})
+            for batch, kwargs in zip(batches, params)
+        ], return_exceptions=False)
+        return [self._split_download(raw, batch, mapping) for raw, batch in zip(raws, batches)]
+
+    def _split_download(self, raw: pd.DataFrame, batch: list, mapping: dict) -> pd.DataFrame:
+        """
+        تحويل نتيجة طلب دفعة واحدة (أعمدة متعددة المستويات) إلى هيكل stock_prices.
+        """
+        tickers = [mapping[s] for s in batch]
+        frames = []
+        if raw is not None and not raw.empty:
+            available = set(raw.columns.get_level_values(0))
+            for symbol, clean_symbol in zip(batch, tickers):
+                if clean_symbol not in available:
+                    continue
+
+                # yf.download يوحد التواريخ بين الرموز، فنحذف صفوف الأيام غير المتداولة
+                df = raw[clean_symbol].dropna(subset=['Close'])
+                if not df.empty:
+                    frames.append(self._normalize_history(df, symbol))
+
+        if not frames:
+            return pd.DataFrame(columns=['date', 'open', 'high', 'low', 'close', 'volume', 'symbol'])
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def _batches(items: list, size: int):
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    @staticmethod
+    def _resolve_symbol(symbol: str) -> tuple[str, str]:
+        """
+        يعيد (الرمز الأصلي، رمز Yahoo Finance).
+        Yahoo Finance يستخدم رموزاً خاصة للذهب والعملات، نحولها هنا.
+        """
+        # تنظيف الرمز الأساسي
+        original_symbol = symbol.strip().upper()
+        clean_symbol = original_symbol
+
+        if clean_symbol == "XAUUSD" or clean_symbol == "GOLD":
+            clean_symbol = "GC=F" # العقود الآجلة للذهب
+        elif clean_symbol == "EURUSD":
+            clean_symbol = "EURUSD=X"
+        elif clean_symbol == "GBPUSD":
+            clean_symbol = "GBPUSD=X"
+        elif clean_symbol == "BTC":
+            clean_symbol = "BTC-USD"
+
+        return original_symbol, clean_symbol
+
+    def get_last_dates(self, symbols: list) -> dict:
+        """
+        يعيد {الرمز: آخر تاريخ مخزن} لمجموعة رموز باستعلام واحد.
+        """
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+                SELECT symbol, MAX(date) FROM price_history
+                WHERE list_contains(?, symbol)
+                GROUP BY symbol
+            """, [symbols]).fetchall()
+        return {symbol: last_date for symbol, last_date in rows}
+
+    def get_last_date(self, symbol: str):
+        """
+        يعيد آخر تاريخ مخزن للرمز (أو None إذا لم يكن له تاريخ).
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT MAX(date) FROM price_history WHERE symbol = ?", [symbol]
+            ).fetchone()
+        return row[0] if row else None
+
+    def _normalize_history(self, df: pd.DataFrame, symbol: str) -> pd.DataFrame:
+        """
+        تحويل مخرجات yfinance إلى هيكل جدول stock_prices.
+        """
+        df = df.reset_index()
+        df['Date'] = df['Date'].dt.date
+
+        # تنسيق الأعمدة لقاعدة البيانات
+        df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+        df.columns = ['date', 'open', 'high', 'low', 'close', 'volume']
+
+        # ⚠️ ملاحظة هامة: نخزن البيانات باسم الرمز الأصلي (مثل XAUUSD)
+        # لكي يجده باقي الفريق (المحلل الفني والكمي) بنفس الاسم الذي يعرفونه
+        df['symbol'] = symbol
+        return df
+
+    def _changed_symbols(self, df: pd.DataFrame, tolerance: float = 1e-4) -> set:
+        """
+        يقارن أسعار الإغلاق في أيام التداخل مع المخزن محلياً ويعيد الرموز التي تغيرت.
+        Yahoo يعدل التاريخ كله عند التجزئة أو التوزيعات، فأي فرق هنا يعني أن المخزن قديم.
+        """
+        if df is None or df.empty:
+            return set()
+
+        with self.pool.connection() as conn:
+            conn.register('overlap_df', df)
+            try:
+                rows = conn.execute("""
+                    SELECT n.symbol
+                    FROM overlap_df n
+                    JOIN price_history s ON s.symbol = n.symbol AND s.date = n.date
+                    GROUP BY n.symbol
+                    HAVING MAX(ABS(n.close - s.close) / NULLIF(ABS(s.close), 0)) > ?
+                """, [tolerance]).fetchall()
+            finally:
+                conn.unregister('overlap_df')
+
+        return {row[0] for row in rows}
+
+    def _store(self, df: pd.DataFrame, replace_symbols: list = ()):
+        """
+        كتابة البيانات في stock_prices داخل معاملة واحدة.
+        replace_symbols: رموز أُعيد تحميلها كاملة: نحذف أيامها المخزنة داخل مدى البيانات الجديدة
+        (في الجدول والأرشيف) قبل الإدخال. الأيام الأقدم من المدى تبقى لأنه لا مصدر آخر لها.
+        باقي الرموز: Upsert للأيام الجديدة وأيام التداخل فقط.
+        بعد الكتابة نحدّث price_features للأيام المكتوبة فقط.
+        """
+        symbols = df['symbol'].unique().tolist()
+        record(rows=len(df))
+        ranges = {
+            symbol: (first, last)
+            for symbol, (first, last) in df.groupby('symbol')['date'].agg(['min', 'max']).iterrows()
+            if symbol in set(replace_symbols)
+        }
+        with self.pool.connection() as conn:
+            conn.register('temp_df', df)
+            try:
+                conn.execute("BEGIN TRANSACTION")
+                if ranges:
+                    # نحذف البيانات القديمة لنفس الرموز (الأصلية) داخل مدى إعادة التحميل
+                    conn.execute("""
+                        DELETE FROM stock_prices s
+                        USING (SELECT unnest(?) AS symbol, unnest(?) AS first, unnest(?) AS last) r
+                        WHERE s.symbol = r.symbol AND s.date BETWEEN r.first AND r.last
+                    """, [list(ranges), [f for f, _ in ranges.values()], [l for _, l in ranges.values()]])
+
+                conn.execute("""
+                    INSERT OR REPLACE INTO stock_prices
+                    (symbol, date, open, high, low, close, volume)
+                    SELECT symbol, date, open, high, low, close, volume FROM temp_df
+                """)
+                self._record_fetch(conn, symbols)
+                # الخصائص المحسوبة من أول يوم أُعيدت كتابته لم تعد صالحة
+                self.features.invalidate(
+                    conn, df.groupby('symbol')['date'].min().to_dict(), replace_symbols
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.unregister('temp_df')
+
+        # التحميل الكامل يستبدل أيام مداه: نسختها المؤرشفة (قبل التعديل) لم تعد صالحة
+        if ranges:
+            PriceArchive().drop_range(ranges)
+
+        # الخصائص مشتقة: فشل حسابها لا يلغي الأسعار المخزنة (سيكتمل في التحديث التالي)
+        try:
+            self.features.refresh(symbols)
+        except Exception as e:
+            print(f"   ⚠️ تعذر تحديث الخصائص الفنية: {e}")
+
+    def _record_fetch(self, conn, symbols: list, source: str = FETCH_SOURCE):
+        """
+        تحديث fetch_log: وقت الجلب الآن + آخر يوم تداول مخزن لكل رمز (الساخن أو الأرشيف).
+        """
+        conn.execute("""
+            INSERT OR REPLACE INTO fetch_log (symbol, last_fetch_at, last_bar_date, source)
+            SELECT symbol, ?, MAX(date), ? FROM price_history
+            WHERE list_contains(?, symbol)
+            GROUP BY symbol
+        """, [utc_now(), source, list(symbols)])
+
+    def get_fetch_info(self, symbol: str):
+        """
+        يعيد سجل آخر جلب للرمز {last_fetch_at, last_bar_date, source} أو None.
+        """
+        clean_symbol = symbol.strip().upper()
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT last_fetch_at, last_bar_date, source FROM fetch_log WHERE symbol = ?",
+                [clean_symbol]
+            ).fetchone()
+        if not row:
+            return None
+        return {"last_fetch_at": row[0], "last_bar_date": row[1], "source": row[2]}
+
+    def is_fresh(self, symbol: str, ttl: int = None) -> bool:
+        """
+        هل البيانات المخزنة حديثة بما يكفي لتخطي الشبكة؟
+        - إذا جلبناها خلال مدة الصلاحية (TTL): نعم.
+        - إذا كان السوق مغلقاً الآن وجلبناها بعد آخر إغلاق: نعم (لا جديد حتى الجلسة القادمة).
+        """
+        info = self.get_fetch_info(symbol)
+        if not info or info["last_fetch_at"] is None or info["last_bar_date"] is None:
+            return False
+
+        ttl = settings.MARKET_DATA_TTL_SECONDS if ttl is None else ttl
+        now = utc_now()
+        if (now - info["last_fetch_at"]).total_seconds() < ttl:
+            return True
+
+        is_open, last_close = session_state(symbol.strip().upper(), now)
+        return not is_open and last_close is not None and info["last_fetch_at"] >= last_close
+
+    def ensure_fresh(self, symbol: str, period: str = "2y", ttl: int = None):
+        """
+        قراءة عبر الذاكرة (Read-Through): يجلب من الشبكة فقط إذا كانت البيانات المخزنة قديمة.
+        Returns: (success, msg) بنفس صيغة fetch_and_store_data.
+        """
+        if self.is_fresh(symbol, ttl=ttl):
+            msg = f"البيانات المخزنة لـ {symbol.strip().upper()} حديثة، تم تخطي الشبكة."
+            print(f"   ⚡ {msg}")
+            return True, msg
+        return self.fetch_and_store_data(symbol, period=period)
+
     def get_data(self, symbol: str) -> pd.DataFrame:
         """
         وظيفة القراءة: يستخدمها باقي العمال
         """
+        return self.read_prices(symbol)
+
+    def read_prices(self, symbol: str, columns: list = None, start=None, end=None,
+                    lookback: int = None, output: str = "pandas"):
+        """
+        قراءة مرنة من تاريخ الأسعار (الساخن + الأرشيف) باستعلام مُعامَل (Parameterized).
+
+        Args:
+            symbol: رمز السهم.
+            columns: الأعمدة المطلوبة فقط (الافتراضي: كل الأعمدة).
+            start / end: حدود التاريخ (شاملة).
+            lookback: آخر N يوم تداول فقط (مثلاً 14 لفحص التذبذب).
+            output: "pandas" (DataFrame) أو "arrow" (جدول Arrow بدون نسخ)
+                    أو "numpy" (قاموس {العمود: مصفوفة}).
+        """
         clean_symbol = symbol.strip().upper()
+
+        columns = list(columns) if columns else list(PRICE_COLUMNS)
+        invalid = [c for c in columns if c not in PRICE_COLUMNS]
+        if invalid:
+            raise ValueError(f"أعمدة غير معروفة: {invalid}")
+        if output not in ("pandas", "arrow", "numpy"):
+            raise ValueError(f"صيغة مخرجات غير مدعومة: {output}")
+
+        # الأعمدة من قائمة ثابتة (آمنة)، والقيم تمر كمعاملات فقط
+        projection = ", ".join(f'"{c}"' for c in columns)
+        conditions = ["symbol = ?"]
+        params = [clean_symbol]
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(end)
+
+        # price_history يوحد الجدول الساخن مع أرشيف Parquet البارد (انظر app/core/archive.py)
+        query = f"SELECT {projection}, date AS _order_date FROM price_history WHERE {' AND '.join(conditions)}"
+        if lookback:
+            # نأخذ آخر N صف ثم نعيد ترتيبها تصاعدياً
+            query += " ORDER BY date DESC LIMIT ?"
+            params.append(int(lookback))
+        query = f"SELECT {projection} FROM ({query}) ORDER BY _order_date ASC"
+
         try:
-            query = f"SELECT * FROM stock_prices WHERE symbol = '{clean_symbol}' ORDER BY date ASC"
-            return self.conn.execute(query).df()
+            with self.pool.connection() as conn:
+                result = conn.execute(query, params)
+                if output == "arrow":
+                    # to_arrow_table في الإصدارات الحديثة من DuckDB، و fetch_arrow_table في القديمة
+                    fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+                    data = fetch()
+                    rows = data.num_rows
+                elif output == "numpy":
+                    data = result.fetchnumpy()
+                    rows = len(next(iter(data.values()), []))
+                else:
+                    data = result.df()
+                    rows = len(data)
+            record(rows=rows)
+            return data
         except Exception as e:
             print(f"⚠️ خطأ في قراءة البيانات: {e}")
-            return pd.DataFrame()
\ No newline at end of file
+            return {"pandas": pd.DataFrame(), "numpy": {}}.get(output)
@@ -1,11 +1,11 @@
-from app.components.defense.sanitizer import DataSanitizer
 from app.components.defense.volatility import VolatilityGuard
-from app.engine.execution_team.workers.data_loader import DataLoader
+from app.core.features import VOLATILITY_WINDOW, FeatureStore
+from app.core.market_data import get_snapshot_store
+from app.core.registry import get_component
 
 # تهيئة أدوات الدفاع مرة واحدة (للحفاظ على الموارد)
-sanitizer = DataSanitizer()
+# نموذج التعقيم (Isolation Forest) يُحمل عند أول فحص: get_component("sanitizer")
 volatility_guard = VolatilityGuard()
-loader = DataLoader()
 
 def defender_node(state):
     """
@@ -17,9 +17,11 @@ def defender_node(state):
     
     symbol = state.get('symbol')
     
-    # 1. جلب البيانات الخام من المستودع
-    # المدافع يستدعي Loader داخلياً ليحصل على أحدث نسخة
-    df = loader.get_data(symbol)
+    # 1. جلب البيانات الخام من لقطة الذاكرة
+    # المرجع القادم من Loader يُخدم بدون استعلام ما دام إصداره حديثاً
+    # (بدون مرجع: نقارن بالإصدار الحالي في المستودع ونقرأ فقط إذا تغير)
+    # (PriceSeries غير قابلة للتعديل: التعقيم يعيد سلسلة جديدة بدل تعديل اللقطة المشتركة)
+    df = get_snapshot_store().series(state.get('market_handle') or symbol)
     
     if df.empty:
         return {
@@ -29,11 +31,20 @@ def defender_node(state):
 
     # 2. خط الدفاع الأول: التعقيم (Sanitization)
     # كشف الهجمات العدائية أو الأخطاء في البيانات (مثل قفزات السعر الوهمية)
-    df_clean, sanity_report = sanitizer.check_and_clean(df, col='close')
+    df_clean, sanity_report = get_component("sanitizer").check_and_clean(df, col='close')
     
     # 3. خط الدفاع الثاني: فحص التذبذب (Volatility Check)
     # هل السوق آمن للتداول أم خطير جداً؟ (إذا التذبذب عالٍ، نحذر المدير)
-    volatility_status = volatility_guard.check_volatility(df_clean)
+    # إذا لم يغير التعقيم شيئاً نقرأ التذبذب المحسوب مسبقاً من price_features
+    # (وإلا، أو إذا كانت الخصائص ناقصة، نحسبه من البيانات المعقمة لأن الخصائص المخزنة مبنية على الأسعار الخام)
+    features = None
+    if df_clean is df and volatility_guard.window == VOLATILITY_WINDOW:
+        features = FeatureStore().read(symbol, lookback=1)
+    if features is not None and not features.attrs.get("missing"):
+        volatility_status = volatility_guard.check_features(features)
+    else:
+        # آخر lookback يوم فقط (tail على PriceSeries عرض بدون نسخ)
+        volatility_status = volatility_guard.check_volatility(df_clean.tail(volatility_guard.lookback))
     
     # 4. تجميع التقرير الأمني
     defense_summary = f"""
@@ -1,7 +1,6 @@
-from app.components.fundamental.metrics import FundamentalMetrics
+from app.core.registry import get_component
 
-# تهيئة الأداة (يتم تحميلها مرة واحدة لسرعة الأداء)
-metrics_analyzer = FundamentalMetrics()
+# الأداة تُحمل مرة واحدة عند أول استخدام: get_component("fundamental_metrics")
 
 def fundamental_analyst_node(state):
     """
@@ -16,7 +15,7 @@ def fundamental_analyst_node(state):
         return {"fundamental_data": {"error": "لم يتم تحديد رمز السهم."}}
 
     # 1. استخدام الأداة لجلب البيانات
-    result = metrics_analyzer.get_key_metrics(symbol)
+    result = get_component("fundamental_metrics").get_key_metrics(symbol)
     
     # 2. التحقق من النتيجة
     if result.get('status') == 'error':
@@ -1,9 +1,7 @@
-from app.components.forecasting.statistical import TimeSeriesForecaster
-from app.engine.execution_team.workers.data_loader import DataLoader 
+from app.core.market_data import get_snapshot_store
+from app.core.registry import get_component
 
-# تهيئة أدوات التنبؤ مرة واحدة لسرعة الأداء
-forecaster = TimeSeriesForecaster()
-loader = DataLoader()
+# محرك التنبؤ (statsforecast) يُحمل مرة واحدة عند أول استخدام: get_component("forecaster")
 
 def quant_analyst_node(state):
     """
@@ -19,8 +17,8 @@ def quant_analyst_node(state):
     df = state.get('market_data')
     
     if df is None or df.empty:
-        print("   >> تنبيه: البيانات غير متوفرة في الحالة، جاري طلبها من المصدر...")
-        df = loader.get_data(symbol)
+        print("   >> تنبيه: البيانات غير متوفرة في الحالة، جاري طلبها من لقطة الذاكرة...")
+        df = get_snapshot_store().series(state.get('market_handle') or symbol)
         
     if df.empty:
         return {
@@ -30,7 +28,7 @@ def quant_analyst_node(state):
 
     # 2. تشغيل محرك التنبؤ (Statistical Engine)
     # نتوقع للمستقبل القريب (7 أيام) لأن النماذج الإحصائية أدق في المدى القصير
-    result = forecaster.predict_trend(df, horizon=7)
+    result = get_component("forecaster").predict_trend(df, horizon=7)
     
     # 3. معالجة النتائج وكتابة التقرير
     if result.get('status') == 'error':
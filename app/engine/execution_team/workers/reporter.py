@@ -1,36 +1,8 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
-from app.core.config import settings
+from app.core.registry import get_component
 
-# نستخدم درجة حرارة منخفضة للدقة
-llm = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY, temperature=0.3)
-
-# 🔴 التعديل هنا: تغيير اسم الدالة من writer_node إلى reporter_node
-def reporter_node(state):
-    """
-    عامل الكتابة (Reporter Worker).
-    المهمة: تجميع تقارير الفريق وصياغة التقرير النهائي.
-    """
-    print("--- 📝 Reporter: صياغة التقرير النهائي الموحد ---")
-    
-    symbol = state.get('symbol')
-    
-    # جلب التقارير الفرعية
-    fund_summary = state.get('fundamental_summary', 'بيانات أساسية غير متوفرة.')
-    tech_report = state.get('technical_report', 'بيانات فنية غير متوفرة.')
-    
-    sent_data = state.get('sentiment_report', {})
-    if isinstance(sent_data, dict):
-        sent_summary = sent_data.get('summary', 'لا توجد أخبار.')
-        sent_score = sent_data.get('score', 0)
-    else:
-        sent_summary = "بيانات المشاعر غير واضحة."
-        sent_score = 0
-    
-    defense_summary = state.get('defense_report', 'لم يتم إجراء فحص أمني.')
-
-    # هندسة الأمر
-    prompt = PromptTemplate.from_template("""
+# هندسة الأمر
+REPORT_PROMPT = PromptTemplate.from_template("""
     أنت رئيس قسم الأبحاث في مؤسسة مالية كبرى.
     لديك مسودات وتقارير من فريق التحليل بخصوص سهم: {symbol}.
     
@@ -50,19 +22,60 @@ def reporter_node(state):
     ### 📈 التوقيت الفني ونبض السوق
     ### ⚠️ المخاطر
     """)
+
+def build_report_chain():
+    """سلسلة الكتابة (الأمر + النموذج). تُبنى مرة واحدة عند أول تقرير: get_component("report_chain")."""
+    # نستخدم درجة حرارة منخفضة للدقة (llm.reporter)
+    return REPORT_PROMPT | get_component("llm.reporter")
+
+def _report_inputs(state) -> dict:
+    """جلب التقارير الفرعية من الحالة وتجهيزها للأمر."""
+    symbol = state.get('symbol')
     
-    chain = prompt | llm
-    result = chain.invoke({
+    fund_summary = state.get('fundamental_summary', 'بيانات أساسية غير متوفرة.')
+    tech_report = state.get('technical_report', 'بيانات فنية غير متوفرة.')
+    
+    sent_data = state.get('sentiment_report', {})
+    if isinstance(sent_data, dict):
+        sent_summary = sent_data.get('summary', 'لا توجد أخبار.')
+        sent_score = sent_data.get('score', 0)
+    else:
+        sent_summary = "بيانات المشاعر غير واضحة."
+        sent_score = 0
+    
+    defense_summary = state.get('defense_report', 'لم يتم إجراء فحص أمني.')
+
+    return {
         "symbol": symbol,
         "defense_summary": defense_summary,
         "fund_summary": fund_summary,
         "tech_report": tech_report,
         "sent_summary": sent_summary,
         "sent_score": sent_score
-    })
+    }
+
+# 🔴 التعديل هنا: تغيير اسم الدالة من writer_node إلى reporter_node
+def reporter_node(state):
+    """
+    عامل الكتابة (Reporter Worker).
+    المهمة: تجميع تقارير الفريق وصياغة التقرير النهائي.
+    """
+    print("--- 📝 Reporter: صياغة التقرير النهائي الموحد ---")
+    
+    # عند التشغيل عبر stream_run يبث LangGraph رموز النموذج للمستخدم أثناء التوليد
+    # (invoke يتحول لبث تلقائياً)، والعقدة نفسها تعيد النص الكامل كالمعتاد
+    result = get_component("report_chain").invoke(_report_inputs(state))
+    
+    return {
+        "final_report": result.content
+    }
+
+async def areporter_node(state):
+    """نسخة غير متزامنة من reporter_node (للمسار acreate_workflow)."""
+    print("--- 📝 Reporter: صياغة التقرير النهائي الموحد ---")
     
-    final_text = result.content
+    result = await get_component("report_chain").ainvoke(_report_inputs(state))
     
     return {
-        "final_report": final_text 
-    }
\ No newline at end of file
+        "final_report": result.content
+    }
@@ -1,7 +1,6 @@
-from app.components.research.sentiment import SentimentEngine
+from app.core.registry import get_component
 
-# تهيئة محرك المشاعر (Tavily + GPT) مرة واحدة
-sentiment_engine = SentimentEngine()
+# محرك المشاعر (Tavily + GPT) يُبنى مرة واحدة عند أول استخدام: get_component("sentiment_engine")
 
 def researcher_node(state):
     """
@@ -17,7 +16,7 @@ def researcher_node(state):
 
     # 1. تشغيل المحرك
     # (يعيد درجة رقمية + ملخص نصي للأسباب)
-    score, reason = sentiment_engine.analyze(symbol)
+    score, reason = get_component("sentiment_engine").analyze(symbol)
     
     # 2. تفسير النتيجة (لجعلها مفهومة للمدير)
     label = "محايد 😐"
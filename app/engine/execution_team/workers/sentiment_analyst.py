@@ -1,7 +1,6 @@
-from app.components.research.sentiment import SentimentEngine
+from app.core.registry import get_component
 
-# تهيئة المحرك مرة واحدة لسرعة الاستجابة
-sentiment_engine = SentimentEngine()
+# محرك المشاعر (Tavily + GPT) يُبنى مرة واحدة عند أول استخدام: get_component("sentiment_engine")
 
 # 🔴 التعديل: تغيير الاسم ليتطابق مع workflow.py
 def sentiment_node(state):
@@ -22,8 +21,27 @@ def sentiment_node(state):
         }
 
     # 1. تشغيل المحرك (البحث + التحليل بالذكاء الاصطناعي)
-    score, reason = sentiment_engine.analyze(symbol)
+    score, reason = get_component("sentiment_engine").analyze(symbol)
+    return _sentiment_update(score, reason)
+
+async def asentiment_node(state):
+    """نسخة غير متزامنة من sentiment_node (للمسار acreate_workflow)."""
+    print("--- 📰 Sentiment Analyst: قراءة نبض السوق ---")
+    
+    symbol = state.get('symbol')
     
+    if not symbol:
+        return {
+            "sentiment_report": {
+                "score": 0, 
+                "summary": "خطأ: لا يوجد رمز للبحث."
+            }
+        }
+
+    score, reason = await get_component("sentiment_engine").aanalyze(symbol)
+    return _sentiment_update(score, reason)
+
+def _sentiment_update(score: float, reason: str) -> dict:
     # 2. تصنيف النتيجة
     label = "محايد 😐"
     if score >= 0.5:
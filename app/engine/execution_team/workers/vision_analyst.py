@@ -1,14 +1,45 @@
 # app/engine/execution_team/workers/vision_analyst.py
 
+import asyncio
 import base64
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from app.core.registry import get_component
 
 def encode_image(image_path):
     """تحويل الصورة إلى Base64 ليفهمها النموذج"""
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
+# التعليمات الصارمة والذكية (Hybrid Prompt)
+VISION_PROMPT = """
+أنت خبير محترف جداً في قراءة منصات التداول (مثل MetaTrader 4/5 و TradingView).
+
+المهمة ذات الأولوية القصوى (Priority 1):
+ابحث بدقة متناهية عن "تذكرة تداول" أو بيانات صفقة مفتوحة داخل الصورة. يجب استخراج البيانات التالية بصيغة JSON حصراً وبدون أي نصوص إضافية:
+
+{
+    "Order": "رقم العملية (ID) أو null",
+    "Type": "نوع الصفقة (Buy/Sell/Limit) أو null",
+    "Size": "حجم اللوت (رقم عشري) أو null",
+    "Symbol": "رمز الزوج بدقة (مثال: EURUSD, XAUUSD) أو null",
+    "SL": "سعر وقف الخسارة أو null",
+    "TP": "سعر جني الأرباح أو null",
+    "Profit": "الربح/الخسارة العائمة مع الإشارة (+/-) أو null"
+}
+
+قواعد صارمة لاستخراج الـ JSON:
+1. ركز على الأرقام والنصوص داخل مربعات الصفقات (Trade Terminal).
+2. الرمز (Symbol) هو أهم حقل، ابحث عنه جيداً.
+3. لا تقم بتأليف بيانات غير موجودة.
+
+--------------------------------------------------
+
+حالة الطوارئ فقط (Priority 2 - Fallback):
+فقط في حال كانت الصورة **لا تحتوي بتاتاً** على أي أرقام أو بيانات تداول (مثلاً: صورة قطة، منظر طبيعي، أو شاشة فارغة تماماً):
+- هنا فقط، مسموح لك بعدم إرسال JSON.
+- بدلاً من ذلك، اكتب جملة نصية واحدة تصف محتوى الصورة باللغة العربية (مثال: "هذه صورة لمنظر طبيعي" أو "هذا مجرد رسم بياني فارغ").
+"""
+
 def vision_node(state):
     print("--- 👁️ Vision Analyst: تحليل صورة الصفقة ---")
     
@@ -16,8 +47,8 @@ def vision_node(state):
     if not image_path:
         return {"trade_ticket_data": {"error": "No image provided"}}
 
-    # 1. تجهيز النموذج (نحتاج موديل قوي للصور)
-    vision_model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    # 1. تجهيز النموذج (نحتاج موديل قوي للصور) - يُبنى مرة واحدة ويُعاد استخدامه
+    vision_model = get_component("llm.vision")
 
     # 2. تحويل الصورة
     try:
@@ -25,51 +56,41 @@ def vision_node(state):
     except Exception as e:
         return {"trade_ticket_data": {"error": f"Image load failed: {str(e)}"}}
 
-    # 3. التعليمات الصارمة (System Prompt)
-   # 3. التعليمات الصارمة والذكية (Hybrid Prompt)
-    prompt = """
-    أنت خبير محترف جداً في قراءة منصات التداول (مثل MetaTrader 4/5 و TradingView).
-    
-    المهمة ذات الأولوية القصوى (Priority 1):
-    ابحث بدقة متناهية عن "تذكرة تداول" أو بيانات صفقة مفتوحة داخل الصورة. يجب استخراج البيانات التالية بصيغة JSON حصراً وبدون أي نصوص إضافية:
-    
-    {
-        "Order": "رقم العملية (ID) أو null",
-        "Type": "نوع الصفقة (Buy/Sell/Limit) أو null",
-        "Size": "حجم اللوت (رقم عشري) أو null",
-        "Symbol": "رمز الزوج بدقة (مثال: EURUSD, XAUUSD) أو null",
-        "SL": "سعر وقف الخسارة أو null",
-        "TP": "سعر جني الأرباح أو null",
-        "Profit": "الربح/الخسارة العائمة مع الإشارة (+/-) أو null"
-    }
-
-    قواعد صارمة لاستخراج الـ JSON:
-    1. ركز على الأرقام والنصوص داخل مربعات الصفقات (Trade Terminal).
-    2. الرمز (Symbol) هو أهم حقل، ابحث عنه جيداً.
-    3. لا تقم بتأليف بيانات غير موجودة.
-
-    --------------------------------------------------
+    # 3. استدعاء النموذج (داخل الدالة)
+    response = vision_model.invoke([_vision_message(base64_image)])
+    return _parse_vision_response(response)
+
+async def avision_node(state):
+    """نسخة غير متزامنة من vision_node (للمسار acreate_workflow)."""
+    print("--- 👁️ Vision Analyst: تحليل صورة الصفقة ---")
     
-    حالة الطوارئ فقط (Priority 2 - Fallback):
-    فقط في حال كانت الصورة **لا تحتوي بتاتاً** على أي أرقام أو بيانات تداول (مثلاً: صورة قطة، منظر طبيعي، أو شاشة فارغة تماماً):
-    - هنا فقط، مسموح لك بعدم إرسال JSON.
-    - بدلاً من ذلك، اكتب جملة نصية واحدة تصف محتوى الصورة باللغة العربية (مثال: "هذه صورة لمنظر طبيعي" أو "هذا مجرد رسم بياني فارغ").
-    """
-
-    # 4. استدعاء النموذج
-    msg = HumanMessage(
+    image_path = state.get('screenshot_path')
+    if not image_path:
+        return {"trade_ticket_data": {"error": "No image provided"}}
+
+    vision_model = get_component("llm.vision")
+
+    # قراءة الملف في خيط جانبي حتى لا نحجز الحلقة
+    try:
+        base64_image = await asyncio.to_thread(encode_image, image_path)
+    except Exception as e:
+        return {"trade_ticket_data": {"error": f"Image load failed: {str(e)}"}}
+
+    response = await vision_model.ainvoke([_vision_message(base64_image)])
+    return _parse_vision_response(response)
+
+def _vision_message(base64_image: str) -> HumanMessage:
+    return HumanMessage(
         content=[
-            {"type": "text", "text": prompt},
+            {"type": "text", "text": VISION_PROMPT},
             {
                 "type": "image_url",
                 "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
             },
         ]
     )
-    
-    # التأكد من استدعاء الموديل داخل الدالة
-    response = vision_model.invoke([msg])
 
+def _parse_vision_response(response) -> dict:
     # 1. فحص الرد للتأكد أنه ليس None (تجنب خطأ attribute 'strip')
     if response is None or not hasattr(response, 'content') or not response.content:
         print("⚠️ Vision: الرد فارغ تماماً")
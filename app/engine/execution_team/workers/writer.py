@@ -1,9 +1,7 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
-from app.core.config import settings
+from app.core.registry import get_component
 
-# نستخدم نموذج ذكي للصياغة (يفضل temperature منخفضة للدقة)
-llm = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY, temperature=0.3)
+# نستخدم نموذج ذكي للصياغة (يفضل temperature منخفضة للدقة): llm.writer في السجل الكسول
 
 def writer_node(state):
     """
@@ -70,7 +68,7 @@ def writer_node(state):
     """)
     
     # 3. تشغيل الكاتب
-    chain = prompt | llm
+    chain = prompt | get_component("llm.writer")
     result = chain.invoke({
         "symbol": symbol,
         "fund_summary": fund_summary,
@@ -1,7 +1,7 @@
 from typing import TypedDict, List, Annotated, Optional, Dict, Any
-import pandas as pd
 import operator
 from langchain_core.messages import BaseMessage
+from app.core.market_data import PriceSeries
 
 class FinancialState(TypedDict):
     """
@@ -19,14 +19,24 @@ class FinancialState(TypedDict):
     user_request: str          # ماذا يريد المستخدم بالضبط؟
     
     # --- 3. البيانات الخام (Raw Data) ---
-    market_data: Optional[pd.DataFrame]  # جدول الأسعار التاريخي
+    market_data: Optional[PriceSeries]   # الأسعار التاريخية (مصفوفات NumPy للقراءة فقط، to_frame() للواجهة)
+    market_handle: Any                   # مرجع مُرقّم للقطة الأسعار في الذاكرة (MarketDataHandle)
+                                         # العمال يقرؤون عبره بدل إعادة الاستعلام من المستودع
     
     # --- 4. تقارير العمال (Worker Outputs) ---
     # كل عامل يملأ خانته الخاصة
+    # ⚠️ المحللون (الأساسي، المشاعر، الكمي) يعملون بالتوازي في نفس الخطوة:
+    # كل مفتاح هنا يكتبه عامل واحد فقط، وأي كتابة متزامنة لنفس المفتاح
+    # يرفضها LangGraph (InvalidUpdateError) بدل أن تضيع بصمت.
+    # المفاتيح غير المعرفة هنا تُحذف من الحالة، لذلك نعرف كل مخرجات العمال.
     fundamental_data: Dict[str, Any]     # (P/E, Revenue Growth, Debt)
+    fundamental_summary: str             # ملخص نصي للتحليل الأساسي (للتقرير والدردشة)
     technical_report: str                # (Trend, Support/Resistance)
+    forecast_summary: str                # ملخص سريع للتنبؤ (الاتجاه + الهدف)
+    forecast_data: Dict[str, Any]        # البيانات الخام للتنبؤ للرسم البياني ({'ds': ..., 'AutoARIMA': ...} مصفوفات)
     sentiment_report: Dict[str, Any]     # (Score, Summary, News)
     risk_report: Dict[str, Any]          # (Crash Probability, Anomalies)
+    defense_report: str                  # ملخص المدافع (جودة البيانات + التذبذب)
     
     # --- 5. التحكم والإدارة (Control Flow) ---
     plan: List[str]            # خطة العمل التي وضعها المدير (قائمة العمال المطلوبين)
@@ -40,9 +50,16 @@ class FinancialState(TypedDict):
 # --- 🟢 المتغيرات الجديدة التي يجب إضافتها الآن ---
     feedback_from_critic: str   # هنا يكتب الناقد ملاحظاته
     is_quality_passed: bool     # قرار الناقد: (True = ممتاز، False = أعد العمل)
+    quality_forced: bool        # قبول قسري من قاطع الدائرة (لا يُخزن في ذاكرة النتائج)
     retry_count: int            # عداد المحاولات (لمنع الدوران إلى الأبد)
     # 🟢 إضافات العامل البصري
     screenshot_path: str         # مسار الصورة (محلي أو رابط)
     trade_ticket_data: dict      # لتخزين البيانات المستخرجة (Order, Type, Size...)
     # --- 7. المخرج النهائي ---
-    final_report: str          # التقرير النهائي المعتمد
\ No newline at end of file
+    final_report: str          # التقرير النهائي المعتمد
+    
+    # --- 8. التتبع والأداء (Tracing) ---
+    run_id: str                # معرف التشغيل (trace_id لكل امتدادات هذا التحليل)
+    # امتداد لكل تنفيذ عقدة (زمن، معالج، صفوف، استدعاءات، توكنز)
+    # operator.add: العقد المتوازية تضيف امتداداتها دون تعارض
+    trace_spans: Annotated[List[Dict[str, Any]], operator.add]
\ No newline at end of file
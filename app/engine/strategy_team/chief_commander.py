@@ -1,8 +1,6 @@
 import json
 import os
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from app.core.config import settings
+from app.core.registry import get_component
 
 # مسار الذاكرة الدلالية (التي أنشأها المصنع)
 SEMANTIC_CACHE_PATH = "cache/semantic_net.json"
@@ -10,9 +8,13 @@ SEMANTIC_CACHE_PATH = "cache/semantic_net.json"
 
 class ChiefCommander:
     def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY, temperature=0)
         self.semantic_net = self._load_semantic_net()
 
+    @property
+    def llm(self):
+        # النموذج يُبنى عند أول استخدام فقط (السجل الكسول)
+        return get_component("llm.commander")
+
     def _load_semantic_net(self):
         """تحميل خريطة العلاقات والقطاعات من الذاكرة"""
         if os.path.exists(SEMANTIC_CACHE_PATH):
@@ -66,8 +68,7 @@ class ChiefCommander:
         return {"sector": sector, "guidelines": guidelines}
 
 # --- العقدة (Node Logic) ---
-
-commander = ChiefCommander()
+# المدير (والشبكة الدلالية) يُحمل عند أول تحليل: get_component("commander")
 
 def chief_node(state):
     print("--- 👔 Strategy Team: وضع خطة التحليل ---")
@@ -101,6 +102,7 @@ def chief_node(state):
     # ====================================================
     
     # 1. الفهم (الآن آمن لأن symbol ليس None)
+    commander = get_component("commander")
     sector = commander.identify_sector(symbol)
     
     # 2. التخطيط
@@ -112,4 +114,11 @@ def chief_node(state):
         "plan": ["loader", "defender", "fundamental", "technical", "researcher", "writer"],
         "current_step": "loader",
         "draft_report": f"ملاحظات إدارية: {plan_data['guidelines']}"
-    }
\ No newline at end of file
+    }
+async def achief_node(state):
+    """
+    نسخة غير متزامنة من chief_node (للمسار acreate_workflow).
+    المدير لا يستدعي أي خدمة خارجية (قراءة الذاكرة الدلالية المحملة مسبقاً فقط)،
+    لذلك ينفذ مباشرة دون حجز خيط.
+    """
+    return chief_node(state)
@@ -1,30 +1,67 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from app.core.config import settings
 from langchain_core.messages import SystemMessage 
-# نستخدم درجة حرارة 0 ليكون النقد صارماً ومنطقياً بحتاً
-llm = ChatOpenAI(model="gpt-4o-mini", api_key=settings.OPENAI_API_KEY, temperature=0.0)
+from app.core.registry import get_component
+from app.components.review.report_rules import ReportValidator
+
+# فحص القواعد أولاً (حتمي وبدون تكلفة)، والنموذج فقط للتقارير الغامضة
+validator = ReportValidator()
+
+# قاطع الدائرة: بعد هذا العدد من الرفض يُقبل التقرير قسراً
+MAX_RETRIES = 3
+
+# نستخدم درجة حرارة 0 ليكون النقد صارماً ومنطقياً بحتاً (llm.critic في السجل الكسول)
 
 def critic_node(state):
     print("--- 🧐 Critic: مراجعة جودة التقرير ---")
     
+    current_retries, verdict = _circuit_breaker(state)
+    if verdict is not None:
+        return verdict
+
+    # 2. فحص القواعد: يحسم أغلب التقارير بدون استدعاء الموديل
+    verdict = _prescreen(state, current_retries)
+    if verdict is not None:
+        return verdict
+
+    # 3. الحالات الغامضة: استدعاء الموديل
+    response = get_component("llm.critic").invoke([SystemMessage(content=_review_prompt(state))])
+    return _decide(response, current_retries)
+
+async def acritic_node(state):
+    """نسخة غير متزامنة من critic_node (للمسار acreate_workflow)."""
+    print("--- 🧐 Critic: مراجعة جودة التقرير ---")
+    
+    current_retries, verdict = _circuit_breaker(state)
+    if verdict is not None:
+        return verdict
+
+    # 2. فحص القواعد: يحسم أغلب التقارير بدون استدعاء الموديل
+    verdict = _prescreen(state, current_retries)
+    if verdict is not None:
+        return verdict
+
+    response = await get_component("llm.critic").ainvoke([SystemMessage(content=_review_prompt(state))])
+    return _decide(response, current_retries)
+
+def _circuit_breaker(state):
     # 1. استرجاع عدد المحاولات السابقة
     current_retries = state.get("retry_count", 0)
     
     # 🛑 قاطع الدائرة (Circuit Breaker): 
-    # إذا تجاوزنا 3 محاولات، نقبل التقرير كما هو حتى لو كان سيئاً لمنع الانهيار
-    if current_retries >= 3:
+    # إذا تجاوزنا MAX_RETRIES محاولات، نقبل التقرير كما هو حتى لو كان سيئاً لمنع الانهيار
+    if current_retries >= MAX_RETRIES:
         print(f"   >> ⚠️ تجاوز حد المحاولات ({current_retries}). قبول التقرير قسراً.")
-        return {
+        return current_retries, {
             "is_quality_passed": True, # نمرر التقرير لننهي العمل
+            "quality_forced": True,    # لكنه لم يجتز المراجعة: لا يُخزن في ذاكرة النتائج
             "feedback": "تم قبول التقرير لتجاوز عدد المحاولات المسموح بها."
         }
+    return current_retries, None
 
+def _review_prompt(state) -> str:
     report = state.get('final_report', '')
     symbol = state.get('symbol')
 
-    # 2. التقييم
-    prompt = f"""
+    return f"""
     أنت مدقق جودة صارم. راجع هذا التقرير المالي عن {symbol}.
     
     المعايير المقبولة:
@@ -37,15 +74,24 @@ def critic_node(state):
     إذا كان التقرير "فارغاً" أو يقول "لا توجد بيانات"، وتكرر ذلك، فاقبله لإنهاء الدورة.
     هل التقرير مقبول؟ (نعم/لا) مع تعليل قصير.
     """
-    
-    # استدعاء الموديل
-    response = llm.invoke([SystemMessage(content=prompt)])
+
+def _prescreen(state, current_retries: int):
+    """حكم القواعد (ReportValidator)، أو None إذا كان التقرير غامضاً ويحتاج الناقد الذكي."""
+    result = validator.check(state.get('final_report', ''))
+    print(f"   >> 📏 فحص القواعد: {result['message']}")
+    if result["passed"] is None:
+        return None
+    return _verdict(result["passed"], result["message"], current_retries)
+
+def _decide(response, current_retries: int) -> dict:
     content = response.content.lower()
     
-    # 3. القرار
     # نبحث عن كلمات الموافقة
     is_passed = "نعم" in content or "yes" in content or "مقبول" in content
-    
+    return _verdict(is_passed, response.content, current_retries)
+
+def _verdict(is_passed: bool, feedback: str, current_retries: int) -> dict:
+    # 4. القرار
     if is_passed:
         print("   >> ✅ التقرير مطابق للمعايير.")
         return {"is_quality_passed": True, "retry_count": 0}
@@ -53,6 +99,6 @@ def critic_node(state):
         print(f"   >> ❌ تم رفض التقرير (المحاولة {current_retries + 1}). إعادة التوجيه للمحرر.")
         return {
             "is_quality_passed": False, 
-            "feedback": response.content,
+            "feedback": feedback,
             "retry_count": current_retries + 1 # زيادة العداد لإخبار النظام
-        }
\ No newline at end of file
+        }
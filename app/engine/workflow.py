@@ -1,32 +1,34 @@
-import os
-from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
+import asyncio
+import time
+from functools import wraps
 from langchain_core.messages import SystemMessage, HumanMessage
-from tavily import TavilyClient
+
+from app.core.config import settings
+from app.core.analysis_cache import get_analysis_cache
+from app.core.market_data import get_snapshot_store
+from app.core.registry import get_component
+from app.core.checkpoint import get_checkpointer, aget_checkpointer, new_run_id, run_config
+from app.core.tracing import record, traced
 
 # --- استيراد الحالة ---
 from app.engine.state import FinancialState
 
 # --- استيراد العقول (الاستراتيجية) ---
-from app.engine.strategy_team.chief_commander import chief_node
-from app.engine.strategy_team.critic import critic_node
+from app.engine.strategy_team.chief_commander import chief_node, achief_node
+from app.engine.strategy_team.critic import critic_node, acritic_node
 
 # --- استيراد العمال (التنفيذ) ---
 from app.engine.execution_team.workers.data_loader import DataLoader
-from app.engine.execution_team.workers.vision_analyst import vision_node
+from app.engine.execution_team.workers.vision_analyst import vision_node, avision_node
 from app.engine.execution_team.workers.defender import defender_node
 from app.engine.execution_team.workers.fundamental import fundamental_analyst_node
-from app.engine.execution_team.workers.sentiment_analyst import sentiment_node
+from app.engine.execution_team.workers.sentiment_analyst import sentiment_node, asentiment_node
 from app.engine.execution_team.workers.quant_analyst import quant_analyst_node
-from app.engine.execution_team.workers.reporter import reporter_node
-
-# --- إعدادات النماذج والعملاء ---
-chat_model = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+from app.engine.execution_team.workers.reporter import reporter_node, areporter_node
 
-try:
-    tavily = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-except:
-    tavily = None
+# --- النماذج والعملاء ---
+# نموذج الدردشة (llm.chat) وعملاء البحث (tavily / atavily) تُبنى عند أول استخدام
+# من السجل الكسول (app/core/registry.py)، فاستيراد هذا الملف لا يحمّل أي مكتبة ثقيلة
 
 # ==========================================
 # 1. عقدة الدردشة الذكية (Utility Function)
@@ -39,7 +41,47 @@ def conversational_node(state):
     
     messages = state.get('messages', [])
     last_user_msg = messages[-1].content if messages else ""
+
+    # البحث الحي (اختياري)
+    tavily_context = ""
+    tavily = get_component("tavily")
+    if tavily and last_user_msg:
+        try:
+            record(external_calls=1)
+            search = tavily.search(query=last_user_msg, topic="news", max_results=2)
+            tavily_context = "\n".join([r['content'] for r in search['results']])
+        except:
+            pass
+
+    # إرسال الطلب للنموذج
+    response = get_component("llm.chat").invoke([SystemMessage(content=_chat_system_prompt(state, tavily_context))] + messages)
+    
+    return {"messages": [response]}
+
+async def aconversational_node(state):
+    """
+    نسخة غير متزامنة من conversational_node (بحث HTTP غير متزامن + ainvoke).
+    """
+    print("--- 💬 Chat: التحدث مع المستخدم ---")
+    
+    messages = state.get('messages', [])
+    last_user_msg = messages[-1].content if messages else ""
+
+    tavily_context = ""
+    atavily = get_component("atavily")
+    if atavily and last_user_msg:
+        try:
+            record(external_calls=1)
+            search = await atavily.search(query=last_user_msg, topic="news", max_results=2)
+            tavily_context = "\n".join([r['content'] for r in search['results']])
+        except:
+            pass
+
+    response = await get_component("llm.chat").ainvoke([SystemMessage(content=_chat_system_prompt(state, tavily_context))] + messages)
     
+    return {"messages": [response]}
+
+def _chat_system_prompt(state, tavily_context: str) -> str:
     # استرجاع سياق التحليل السابق
     symbol = state.get('symbol')
     report = state.get('final_report')
@@ -58,17 +100,8 @@ def conversational_node(state):
         -------------------------------------------
         """
 
-    # البحث الحي (اختياري)
-    tavily_context = ""
-    if tavily and last_user_msg:
-        try:
-            search = tavily.search(query=last_user_msg, topic="news", max_results=2)
-            tavily_context = "\n".join([r['content'] for r in search['results']])
-        except:
-            pass
-
     # هندسة الأمر (System Prompt)
-    system_prompt = f"""
+    return f"""
     أنت مستشار مالي ذكي ومحترف.
     
     {context_block}
@@ -81,11 +114,6 @@ def conversational_node(state):
     2. إذا كان السؤال عن السهم المحلل ({symbol})، استخدم البيانات الموجودة في السياق.
     3. إذا كان السؤال عاماً، اعتمد على معلوماتك العامة.
     """
-    
-    # إرسال الطلب للنموذج
-    response = chat_model.invoke([SystemMessage(content=system_prompt)] + messages)
-    
-    return {"messages": [response]}
 
 # ==========================================
 # 2. تغليف عامل التحميل (Loader Wrapper)
@@ -98,34 +126,91 @@ def loader_wrapper(state):
         return {"final_report": "❌ خطأ: لا يوجد رمز سهم للتحميل."}
 
     loader = DataLoader()
-    success, msg = loader.fetch_and_store_data(symbol, period="1y")
+    success, msg = loader.ensure_fresh(symbol, period="1y")
     
-    df = loader.get_data(symbol)
+    # لقطة واحدة في الذاكرة لهذا التحليل: باقي العمال يقرؤونها عبر المرجع
+    snapshots = get_snapshot_store()
+    handle = snapshots.open(symbol)
+    series = snapshots.series(handle)
     
-    if not success or df is None or df.empty:
+    if not success or series.empty:
         return {
             "market_data": None, 
             "final_report": f"❌ عذراً، لم أتمكن من العثور على بيانات للسهم {symbol}. تأكد من صحة الرمز.",
         }
     
-    return {"market_data": df}
+    return {"market_data": series, "market_handle": handle}
+
+def _in_thread(node):
+    """
+    تغليف عقدة متزامنة (قاعدة بيانات، حسابات، yfinance) لتعمل في خيط جانبي
+    داخل المخطط غير المتزامن، فلا تحجز حلقة الأحداث أثناء تنفيذها.
+    """
+    @wraps(node)
+    async def wrapper(state):
+        return await asyncio.to_thread(node, state)
+    return wrapper
 
 # ==========================================
 # 3. بناء المخطط (Main Workflow) - النسخة المصححة
 # ==========================================
-def create_workflow():
+# المحللون الذين يعملون بالتوازي (لا يعتمد أحدهم على مخرجات الآخر)
+ANALYST_NODES = ("fundamental", "sentiment", "quant")
+
+def create_workflow(checkpoint: bool = True):
+    """
+    المخطط المتزامن (للاستدعاء بـ invoke).
+    checkpoint: حفظ الحالة بعد كل خطوة في SQLite (يتطلب thread_id: استخدم prepare_run).
+    """
+    return _build_workflow({
+        "chief": chief_node,
+        "vision": vision_node,
+        "loader": loader_wrapper,
+        "defender": defender_node,
+        "fundamental": fundamental_analyst_node,
+        "sentiment": sentiment_node,
+        "quant": quant_analyst_node,
+        "reporter": reporter_node,
+        "critic": critic_node,
+    }, checkpointer=get_checkpointer() if checkpoint else None)
+
+def acreate_workflow(checkpoint: bool = True):
+    """
+    المخطط غير المتزامن (للاستدعاء بـ await app.ainvoke / app.astream).
+    عقد النماذج والبحث تستخدم ainvoke وعملاء HTTP غير متزامنين، وباقي العقد
+    (تحميل، دفاع، تحليل أساسي وكمي) تعمل في خيوط جانبية. بذلك تخدم حلقة أحداث
+    واحدة عدة تحليلات متزامنة دون خيط محجوز لكل طلب أثناء انتظار الشبكة.
+    ⚠️ نقاط الحفظ غير المتزامنة ترتبط بحلقة الأحداث: استدعها من داخل الحلقة التي ستشغل المخطط.
+    """
+    return _build_workflow({
+        "chief": achief_node,
+        "vision": avision_node,
+        "loader": loader_wrapper,
+        "defender": defender_node,
+        "fundamental": fundamental_analyst_node,
+        "sentiment": asentiment_node,
+        "quant": quant_analyst_node,
+        "reporter": areporter_node,
+        "critic": acritic_node,
+    }, offload=("loader", "defender", "fundamental", "quant"),
+       checkpointer=aget_checkpointer() if checkpoint else None)
+
+def _build_workflow(nodes: dict, offload: tuple = (), checkpointer=None):
+    """
+    بناء المخطط من قاموس العقد. كل عقدة تُغلف بامتداد تتبع (app/core/tracing.py)،
+    والعقد في offload تعمل في خيط جانبي (التتبع داخل الخيط ليقيس زمن المعالج الفعلي).
+    checkpointer: حافظ نقاط LangGraph (الحالة تُحفظ بعد كل خطوة تحت thread_id = run_id).
+    """
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(FinancialState)
     
     # أ) إضافة العقد
-    workflow.add_node("chief", chief_node)
-    workflow.add_node("vision", vision_node)
-    workflow.add_node("loader", loader_wrapper)
-    workflow.add_node("defender", defender_node)
-    workflow.add_node("fundamental", fundamental_analyst_node)
-    workflow.add_node("sentiment", sentiment_node)
-    workflow.add_node("quant", quant_analyst_node)
-    workflow.add_node("reporter", reporter_node)
-    workflow.add_node("critic", critic_node)
+    for name, node in nodes.items():
+        node = traced(name, node)
+        if name in offload:
+            node = _in_thread(node)
+        workflow.add_node(name, node)
 
     # ب) نقطة البداية
     workflow.set_entry_point("chief")
@@ -168,10 +253,13 @@ def create_workflow():
     
     # إكمال بقية المسار
     workflow.add_edge("loader", "defender")
-    workflow.add_edge("defender", "fundamental")
-    workflow.add_edge("fundamental", "sentiment")
-    workflow.add_edge("sentiment", "quant")
-    workflow.add_edge("quant", "reporter")
+
+    # المحللون الثلاثة مستقلون عن بعضهم: نشغلهم بالتوازي بعد المدافع (Fan-out)
+    # والمراسل ينتظر انتهاءهم جميعاً (Join) قبل الكتابة
+    for analyst in ANALYST_NODES:
+        workflow.add_edge("defender", analyst)
+    workflow.add_edge(list(ANALYST_NODES), "reporter")
+
     workflow.add_edge("reporter", "critic")
     
     # منطق الناقد
@@ -189,4 +277,285 @@ def create_workflow():
         }
     )
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
+
+# ==========================================
+# 4. التشغيل والاستئناف (Runs & Resume)
+# ==========================================
+def prepare_run(inputs: dict, run_id: str = None) -> tuple:
+    """
+    يجهز مدخلات تشغيل جديد وإعداداته: معرف التشغيل هو مفتاح نقاط الحفظ ومعرف التتبع.
+    الاستخدام:
+        inputs, config = prepare_run({"symbol": "AAPL"})
+        result = app.invoke(inputs, config)
+    """
+    run_id = run_id or inputs.get("run_id") or new_run_id()
+    return {**inputs, "run_id": run_id}, run_config(run_id)
+
+def pending_nodes(app, run_id: str) -> tuple:
+    """العقد التي لم تكتمل بعد في تشغيل محفوظ (فارغة إذا اكتمل التحليل)."""
+    return tuple(app.get_state(run_config(run_id)).next)
+
+async def apending_nodes(app, run_id: str) -> tuple:
+    return tuple((await app.aget_state(run_config(run_id))).next)
+
+def resume_run(app, run_id: str) -> dict:
+    """
+    استئناف تحليل متوقف من آخر خطوة مكتملة (العقد المكتملة لا تُعاد).
+    Returns: الحالة النهائية (أو الحالة المحفوظة كما هي إذا كان التحليل مكتملاً).
+    """
+    config = run_config(run_id)
+    snapshot = app.get_state(config)
+    if not snapshot.values:
+        raise ValueError(f"لا يوجد تشغيل محفوظ بالمعرف {run_id}")
+    if not snapshot.next:
+        return snapshot.values
+    print(f"🔁 استئناف التشغيل {run_id} من: {', '.join(snapshot.next)}")
+    return app.invoke(None, config)
+
+async def aresume_run(app, run_id: str) -> dict:
+    """نسخة غير متزامنة من resume_run (للمخطط الناتج من acreate_workflow)."""
+    config = run_config(run_id)
+    snapshot = await app.aget_state(config)
+    if not snapshot.values:
+        raise ValueError(f"لا يوجد تشغيل محفوظ بالمعرف {run_id}")
+    if not snapshot.next:
+        return snapshot.values
+    print(f"🔁 استئناف التشغيل {run_id} من: {', '.join(snapshot.next)}")
+    return await app.ainvoke(None, config)
+# ==========================================
+# 5. بث التقرير والتقدم أثناء التشغيل (Streaming)
+# ==========================================
+# العقدة التي يُبث نصها للمستخدم (نماذج الناقد والمدير وغيرها لا تُعرض)
+REPORT_NODE = "reporter"
+
+# أسماء العقد للعرض في أحداث التقدم
+NODE_LABELS = {
+    "chief": "🧠 المدير",
+    "vision": "👁️ المحلل البصري",
+    "loader": "📥 تحميل البيانات",
+    "defender": "🛡️ المدافع",
+    "fundamental": "💼 التحليل الأساسي",
+    "sentiment": "📰 تحليل المشاعر",
+    "quant": "🔢 التحليل الكمي",
+    "reporter": "📝 المراسل",
+    "critic": "🧐 الناقد",
+}
+
+# المخرجات الجزئية التي ترافق حدث انتهاء العقدة (ملخصات صغيرة فقط، بدون الأسعار أو التقرير)
+PROGRESS_FIELDS = (
+    "symbol", "sector", "defense_report", "fundamental_summary",
+    "forecast_summary", "sentiment_report", "is_quality_passed", "retry_count",
+)
+
+def _partial_outputs(result: dict) -> dict:
+    outputs = {k: result[k] for k in PROGRESS_FIELDS if k in result}
+    sentiment = outputs.get("sentiment_report")
+    if isinstance(sentiment, dict):
+        outputs["sentiment_report"] = {k: sentiment[k] for k in ("score", "label") if k in sentiment}
+    handle = result.get("market_handle")
+    if handle is not None:
+        outputs["rows"] = handle.rows
+    return outputs
+
+class _RunEvents:
+    """
+    يحول أحداث LangGraph إلى أحداث التشغيل:
+    - messages: رموز أي نموذج لغة يُستدعى داخل العقد (حتى مع invoke)، نأخذ منها
+      رموز المراسل فقط ونميز كل مسودة جديدة برقم خطوتها في المخطط.
+    - tasks: بداية كل عقدة ونهايتها (مع زمنها من امتداد التتبع ومخرجاتها الجزئية).
+    - values: الحالة الكاملة بعد كل خطوة (آخرها هي الحالة النهائية).
+    """
+
+    def __init__(self):
+        self.state = None
+        self.drafts = 0
+        self._step = None
+        self._started = {}   # task_id -> perf_counter (احتياط إذا لم يوجد امتداد تتبع)
+
+    def feed(self, mode: str, payload) -> list:
+        if mode == "values":
+            self.state = payload
+            return []
+        if mode == "tasks":
+            return self._task(payload)
+
+        chunk, metadata = payload
+        if metadata.get("langgraph_node") != REPORT_NODE or not isinstance(chunk.content, str) or not chunk.content:
+            return []
+
+        events = []
+        if metadata.get("langgraph_step") != self._step:
+            # إعادة كتابة بعد رفض الناقد: مسودة جديدة تحل محل السابقة
+            self._step = metadata.get("langgraph_step")
+            self.drafts += 1
+            events.append(("draft", self.drafts))
+        events.append(("token", chunk.content))
+        return events
+
+    def _task(self, task: dict) -> list:
+        node = task["name"]
+        if "result" not in task and "error" not in task:
+            self._started[task["id"]] = time.perf_counter()
+            return [("node_start", {"node": node, "label": NODE_LABELS.get(node, node)})]
+
+        started = self._started.pop(task["id"], None)
+        result = dict(task.get("result") or {})
+        spans = result.get("trace_spans") or []
+        if spans:
+            duration_ms = spans[-1]["attributes"]["node.wall_ms"]
+        else:
+            duration_ms = round((time.perf_counter() - started) * 1000, 1) if started else None
+
+        info = {
+            "node": node,
+            "label": NODE_LABELS.get(node, node),
+            "status": "error" if task.get("error") else "ok",
+            "duration_ms": duration_ms,
+            "outputs": _partial_outputs(result),
+        }
+        if task.get("error"):
+            info["error"] = str(task["error"])
+        return [("node_end", info)]
+
+def _stream_modes(progress: bool) -> list:
+    return ["messages", "values", "tasks"] if progress else ["messages", "values"]
+
+def stream_run(app, inputs, config: dict, use_cache: bool = True, progress: bool = False):
+    """
+    تشغيل تحليل مع بث التقرير النهائي رمزاً برمز أثناء توليده (بدل انتظار المخطط كاملاً).
+    inputs: مدخلات prepare_run، أو None لاستئناف تشغيل محفوظ من آخر خطوة مكتملة.
+    use_cache: الإجابة من ذاكرة النتائج إن وجدت (حدث "final" مباشرة بدون مسودات).
+    progress: إضافة أحداث بداية ونهاية كل عقدة (للواجهات وخدمة SSE).
+
+    يُنتج أحداثاً (النوع، القيمة):
+        ("draft", n)         بداية مسودة رقم n من المراسل (n > 1 عند إعادة الكتابة بعد الناقد)
+        ("token", text)      جزء جديد من نص المسودة الحالية
+        ("node_start", info) بدأت عقدة: {node, label}                      (مع progress فقط)
+        ("node_end", info)   انتهت عقدة: {node, label, status, duration_ms, outputs[, error]}
+        ("final", state)     الحالة النهائية بعد انتهاء المخطط (آخر حدث دائماً)
+    الاستخدام:
+        for kind, value in stream_run(app, inputs, config):
+            if kind == "token": print(value, end="", flush=True)
+    """
+    key = cache_key(inputs) if use_cache else None
+    cached = _from_cache(key, inputs)
+    if cached is not None:
+        yield ("final", cached)
+        return
+
+    events = _RunEvents()
+    for mode, payload in app.stream(inputs, config, stream_mode=_stream_modes(progress)):
+        yield from events.feed(mode, payload)
+    _to_cache(key, events.state)
+    yield ("final", events.state)
+
+async def astream_run(app, inputs, config: dict, use_cache: bool = True, progress: bool = False):
+    """نسخة غير متزامنة من stream_run (للمخطط الناتج من acreate_workflow)."""
+    key = await asyncio.to_thread(cache_key, inputs) if use_cache else None
+    cached = await asyncio.to_thread(_from_cache, key, inputs)
+    if cached is not None:
+        yield ("final", cached)
+        return
+
+    events = _RunEvents()
+    async for mode, payload in app.astream(inputs, config, stream_mode=_stream_modes(progress)):
+        for event in events.feed(mode, payload):
+            yield event
+    await asyncio.to_thread(_to_cache, key, events.state)
+    yield ("final", events.state)
+
+def describe_progress(kind: str, info: dict) -> str:
+    """سطر نصي قصير لحدث تقدم (للواجهات وسطر الأوامر)."""
+    if kind == "node_start":
+        return f"⏳ {info['label']}..."
+    if info["status"] == "error":
+        return f"❌ {info['label']}: {info.get('error')}"
+
+    outputs = info["outputs"]
+    details = []
+    if "rows" in outputs:
+        details.append(f"{outputs['rows']} يوم تداول")
+    if outputs.get("sector"):
+        details.append(f"القطاع: {outputs['sector']}")
+    if outputs.get("forecast_summary"):
+        details.append(str(outputs["forecast_summary"]))
+    if isinstance(outputs.get("sentiment_report"), dict) and "score" in outputs["sentiment_report"]:
+        details.append(f"المشاعر: {outputs['sentiment_report']['score']}")
+    if "is_quality_passed" in outputs:
+        details.append("مقبول ✅" if outputs["is_quality_passed"] else "إعادة كتابة 🔁")
+
+    duration = f" ({info['duration_ms']:.0f} ms)" if info.get("duration_ms") is not None else ""
+    return f"✅ {info['label']}{duration}" + (f" — {' | '.join(details)}" if details else "")
+
+# ==========================================
+# 6. ذاكرة نتائج التحليل (Analysis Result Cache)
+# ==========================================
+def cache_key(inputs: dict):
+    """
+    مفتاح ذاكرة النتائج لهذا الطلب (الرمز، الطلب، آخر يوم تداول، بصمة الإعدادات)،
+    أو None إذا لم يكن قابلاً للتخزين: الذاكرة معطلة، استئناف، تحليل صورة، أو بدون رمز.
+    """
+    if not settings.ANALYSIS_CACHE_ENABLED or not inputs or inputs.get("screenshot_path"):
+        return None
+    symbol = inputs.get("symbol")
+    if not symbol:
+        return None
+    # المفتاح يتضمن آخر يوم تداول من fetch_log (قراءة محلية). إذا كانت الأسعار قديمة نحدّثها أولاً
+    # (نفس ما يفعله loader)، وفشل التحديث يُعامل كعدم إصابة: المخطط يتولى الخطأ ولا يُخزن الناتج
+    loader = DataLoader()
+    if not loader.is_fresh(symbol):
+        try:
+            success, msg = loader.ensure_fresh(symbol, period="1y")
+        except Exception as e:
+            success, msg = False, str(e)
+        if not success:
+            print(f"⚠️ Cache: تعذر تحديث أسعار {symbol} ({msg})، تم تجاوز ذاكرة النتائج.")
+            return None
+    return get_analysis_cache().key(symbol, inputs.get("user_request"))
+
+def _from_cache(key, inputs: dict):
+    """الحالة النهائية من الذاكرة (مع لقطة الأسعار الحالية للرسم)، أو None."""
+    if key is None:
+        return None
+    result = get_analysis_cache().get(key)
+    if result is None:
+        return None
+
+    snapshots = get_snapshot_store()
+    handle = snapshots.open(result["symbol"])
+    print(f"⚡ Cache: نتيجة محفوظة لتحليل {result['symbol']} (منذ {result['cached_at']})، تم تخطي الفريق.")
+    return {
+        **inputs, **result,
+        "market_data": snapshots.series(handle),
+        "market_handle": handle,
+        "trace_spans": [],
+        "cache_hit": True,
+    }
+
+def _to_cache(key, state: dict):
+    if key is not None:
+        get_analysis_cache().put(key, state)
+
+def run_cached(app, inputs: dict, config: dict) -> dict:
+    """
+    مثل app.invoke لكن عبر ذاكرة النتائج: نفس التحليل قبل يوم تداول جديد
+    يُجاب من DuckDB خلال أجزاء من الثانية بدل تشغيل الفريق كاملاً.
+    """
+    key = cache_key(inputs)
+    cached = _from_cache(key, inputs)
+    if cached is not None:
+        return cached
+    state = app.invoke(inputs, config)
+    _to_cache(key, state)
+    return state
+
+async def arun_cached(app, inputs: dict, config: dict) -> dict:
+    """نسخة غير متزامنة من run_cached (للمخطط الناتج من acreate_workflow)."""
+    key = await asyncio.to_thread(cache_key, inputs)
+    cached = await asyncio.to_thread(_from_cache, key, inputs)
+    if cached is not None:
+        return cached
+    state = await app.ainvoke(inputs, config)
+    await asyncio.to_thread(_to_cache, key, state)
+    return state
@@ -0,0 +1,10 @@
+import sys
+from app.core.archive import PriceArchive
+
+print("⏳ جاري ضغط المستودع ونقل التاريخ القديم إلى أرشيف Parquet...")
+
+# يمكن تمرير عدد الأيام كمعامل: python compact_archive.py 365
+older_than_days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+result = PriceArchive().compact(older_than_days)
+
+print(f"✅ اكتمل الضغط: {result['rows']} صف أقدم من {result['cutoff']} في الأرشيف.")
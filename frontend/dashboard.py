@@ -4,7 +4,7 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+import threading
 import tempfile  # 🟢 (1) مكتبة جديدة للتعامل مع الملفات المؤقتة
 def load_css(file_name):
     """دالة لقراءة ملف CSS وتطبيقه"""
@@ -25,7 +25,9 @@ except FileNotFoundError:
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # استيراد المحرك
-from app.engine.workflow import create_workflow, conversational_node
+from app.engine.workflow import create_workflow, conversational_node, prepare_run, pending_nodes, resume_run, stream_run, describe_progress
+from app.core.registry import get_component, warmup
+from app.core.config import settings
 
 # --- إعداد الصفحة ---
 st.set_page_config(page_title="المحلل المالي المؤسساتي", layout="wide", page_icon="🏦")
@@ -73,14 +75,29 @@ if "last_context" not in st.session_state:
 
 if "app" not in st.session_state:
     st.session_state.app = create_workflow()
+    # تحميل النماذج في الخلفية بينما يكتب المستخدم أول رسالة (مرة واحدة لكل عملية)
+    threading.Thread(target=warmup, daemon=True).start()
 
-# --- 3. نموذج استخراج النية (Intent Extraction) ---
-extractor_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+# آخر تحليل توقف بخطأ (محفوظ في نقاط الحفظ ويمكن استئنافه)
+if "failed_run" not in st.session_state:
+    st.session_state.failed_run = None
 
-def detect_intent(user_text):
+# --- 3. استخراج النية (Intent Extraction) ---
+# المعرّف المحلي (فهرس الرموز والأسماء) يحسم أغلب الرسائل بدون نموذج لغة،
+# والنموذج يُبنى ويُسأل فقط عند ضعف الثقة (السجل الكسول، مشترك بين كل الجلسات)
+
+def detect_intent(user_text, last_symbol=None):
     """
     يحدد هل المستخدم يريد تحليل سهم جديد أم مجرد دردشة.
+    last_symbol: رمز التحليل السابق (ذكره بدون طلب تحليل = سؤال متابعة).
     """
+    intent = get_component("ticker_recognizer").recognize(user_text, last_symbol=last_symbol)
+    if intent["confidence"] >= settings.INTENT_MIN_CONFIDENCE:
+        return intent["is_analysis"], intent["symbol"]
+    return _llm_intent(user_text)
+
+def _llm_intent(user_text):
+    """الحالات الغامضة (عدة رموز، أو اسم شركة خارج الفهرس): نسأل نموذج اللغة."""
     prompt = f"""
     المستخدم أرسل: "{user_text}"
     
@@ -92,7 +109,7 @@ def detect_intent(user_text):
     الإجابة كلمة واحدة فقط: الرمز أو None.
     """
     try:
-        response = extractor_llm.invoke([SystemMessage(content=prompt)])
+        response = get_component("llm.intent").invoke([SystemMessage(content=prompt)])
         result = response.content.strip().replace("'", "").replace('"', "").upper()
         if "NONE" in result:
             return False, None
@@ -100,6 +117,91 @@ def detect_intent(user_text):
     except:
         return False, None
 
+def _show_progress(status, kind, info):
+    """تحديث صندوق التقدم: عنوانه يعرض العقدة الجارية، وكل عقدة منتهية تُضاف كسطر."""
+    if kind == "node_start":
+        status.update(label=describe_progress(kind, info))
+    else:
+        status.write(describe_progress(kind, info))
+
+def _render_stream(events) -> dict:
+    """
+    عرض التقدم والتقرير أثناء التشغيل حتى انتهاء المخطط:
+    - صندوق حالة (st.status) يعرض كل عقدة فور انتهائها مع مخرجاتها الجزئية.
+    - التقرير يُعرض أثناء كتابته (st.write_stream)، وكل مسودة جديدة من المراسل
+      (بعد رفض الناقد) تحل محل السابقة في نفس المكان.
+    عند الانتهاء يُمسح النص المبثوث ليُعرض التقرير النهائي بتنسيقه المعتاد.
+    Returns: الحالة النهائية للمخطط.
+    """
+    status = st.status("⚙️ فريق التحليل يعمل...", expanded=True)
+    box = st.empty()
+    stopped = []
+
+    def until_next_draft():
+        # رموز المسودة الحالية فقط؛ أحداث التقدم تُعرض في الطريق، والمسودة التالية أو النهاية توقف البث
+        for kind, value in events:
+            if kind == "token":
+                yield value
+            elif kind in ("node_start", "node_end"):
+                _show_progress(status, kind, value)
+            else:
+                stopped.append((kind, value))
+                return
+
+    try:
+        for _ in until_next_draft():
+            pass
+        while stopped and stopped[-1][0] == "draft":
+            draft = stopped.pop()[1]
+            with box.container():
+                if draft > 1:
+                    st.caption(f"🔁 الناقد طلب إعادة الكتابة (مسودة {draft})")
+                st.write_stream(until_next_draft())
+    except Exception:
+        status.update(label="❌ توقف التحليل", state="error")
+        raise
+
+    box.empty()
+    status.update(label="✅ اكتمل التحليل", state="complete", expanded=False)
+    return (stopped[-1][1] if stopped else None) or {}
+
+def run_analysis(inputs):
+    """
+    تشغيل المخطط بمعرف تشغيل (نقاط حفظ بعد كل خطوة) مع بث التقرير أثناء كتابته.
+    إذا فشل التحليل في منتصفه نسجله ليستأنفه المستخدم من الشريط الجانبي.
+    """
+    inputs, config = prepare_run(inputs)
+    try:
+        return _render_stream(stream_run(st.session_state.app, inputs, config, progress=True))
+    except Exception:
+        try:
+            if pending_nodes(st.session_state.app, inputs["run_id"]):
+                st.session_state.failed_run = {"run_id": inputs["run_id"], "symbol": inputs.get("symbol")}
+        except Exception:
+            pass
+        raise
+
+# --- استئناف تحليل متوقف (Resume) ---
+if st.session_state.failed_run:
+    with st.sidebar:
+        failed = st.session_state.failed_run
+        st.warning(f"⏸️ تحليل متوقف للسهم {failed['symbol'] or ''} (تم حفظ التقدم)")
+        if st.button("🔁 استئناف التحليل", use_container_width=True):
+            with st.spinner("جاري الاستئناف من آخر خطوة مكتملة..."):
+                try:
+                    result = resume_run(st.session_state.app, failed["run_id"])
+                    final_response = result.get('final_report', 'تم التحليل.')
+                    st.session_state.last_context = {
+                        "symbol": result.get('symbol'),
+                        "report": final_response,
+                        "data": result.get('market_data')
+                    }
+                    st.session_state.messages.append(AIMessage(content=final_response))
+                    st.session_state.failed_run = None
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"⚠️ فشل الاستئناف: {e}")
+
 # --- 4. عرض تاريخ المحادثة ---
 for msg in st.session_state.messages:
     role = "user" if isinstance(msg, HumanMessage) else "assistant"
@@ -141,7 +243,7 @@ if prompt := st.chat_input("اكتب طلبك هنا..."):
                         "symbol": None,
                         "user_request": prompt
                     }
-                    result = st.session_state.app.invoke(inputs)
+                    result = run_analysis(inputs)
                     final_response = result.get('final_report', 'تم التحليل.')
                     
                     # تحديث السياق وعرض الشارت إذا توفرت بيانات من الصورة
@@ -152,7 +254,7 @@ if prompt := st.chat_input("اكتب طلبك هنا..."):
                             "data": result['market_data']
                         }
                         # رسم الشارت (نفس كود الرسم الأصلي الخاص بك)
-                        df = result['market_data']
+                        df = result['market_data'].to_frame()  # PriceSeries → DataFrame للرسم فقط
                         st.subheader(f"📊 التحليل الفني للسهم المكتشف: {result.get('symbol')}")
                         fig = go.Figure(data=[go.Candlestick(
                             x=pd.to_datetime(df['date']), open=df['open'], 
@@ -166,22 +268,24 @@ if prompt := st.chat_input("اكتب طلبك هنا..."):
 
             # المسار الثاني: التحليل النصي أو الدردشة (Fallback Logic)
             else:
-                is_new_analysis, symbol = detect_intent(prompt)
+                is_new_analysis, symbol = detect_intent(prompt, st.session_state.last_context["symbol"])
 
                 if is_new_analysis:
                     st.info(f"⚙️ جاري تشغيل بروتوكول التحليل للسهم: **{symbol}**...")
                     try:
                         inputs = {"symbol": symbol, "user_request": "تحليل شامل", "messages": st.session_state.messages}
-                        result = st.session_state.app.invoke(inputs)
+                        result = run_analysis(inputs)
                         
                         if result.get('market_data') is None:
                             final_response = f"❌ لم أتمكن من العثور على بيانات للسهم **{symbol}**."
                         else:
                             final_response = result.get('final_report', 'تم التحليل.')
                             st.session_state.last_context = {"symbol": symbol, "report": final_response, "data": result['market_data']}
+                            # الرمز الجديد يُعرف محلياً في الرسائل القادمة
+                            get_component("ticker_recognizer").add(symbol)
                             
                             # رسم الشارت الأصلي
-                            df = result['market_data']
+                            df = result['market_data'].to_frame()  # PriceSeries → DataFrame للرسم فقط
                             fig = go.Figure(data=[go.Candlestick(
                                 x=pd.to_datetime(df['date']), open=df['open'], 
                                 high=df['high'], low=df['low'], close=df['close']
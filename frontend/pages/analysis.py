@@ -7,7 +7,7 @@ import plotly.graph_objects as go
 # 1. إصلاح المسارات لرؤية مجلد app
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from app.engine.workflow import create_workflow
+from app.engine.workflow import create_workflow, prepare_run, pending_nodes, resume_run, stream_run, describe_progress
 
 # --- إعداد الصفحة ---
 st.set_page_config(page_title="التحليل المالي العميق", layout="wide", page_icon="📈")
@@ -60,14 +60,51 @@ with st.sidebar:
     st.checkbox("حماية البيانات (Defender)", value=True, disabled=True)
 
 # --- زر التشغيل ---
-if st.button("🚀 بدء التحليل الشامل", use_container_width=True):
+start = st.button("🚀 بدء التحليل الشامل", use_container_width=True)
+
+# تحليل سابق توقف بخطأ: التقدم محفوظ في نقاط الحفظ فنستأنفه بدل إعادته كاملاً
+failed_run = st.session_state.get("analysis_failed_run")
+resume = bool(failed_run) and st.button(
+    f"🔁 استئناف التحليل المتوقف ({failed_run['symbol']})", use_container_width=True
+)
+if resume:
+    symbol = failed_run["symbol"]
+
+def _run_with_progress(app, inputs, config) -> dict:
+    """تشغيل التحليل مع عرض كل عقدة فور انتهائها (الوقت والمخرجات الجزئية)."""
+    status = st.status("⚙️ فريق التحليل يعمل...", expanded=True)
+    result = {}
+    try:
+        for kind, value in stream_run(app, inputs, config, progress=True):
+            if kind == "node_start":
+                status.update(label=describe_progress(kind, value))
+            elif kind == "node_end":
+                status.write(describe_progress(kind, value))
+            elif kind == "final":
+                result = value or {}
+    except Exception:
+        status.update(label="❌ توقف التحليل", state="error")
+        raise
+    status.update(label="✅ اكتمل التحليل", state="complete", expanded=False)
+    return result
+
+if start or resume:
     
     with st.spinner(f'جاري استدعاء فريق التحليل للسهم {symbol}... يرجى الانتظار'):
         try:
-            # 1. تشغيل المحرك
+            # 1. تشغيل المحرك (أو استئنافه من آخر خطوة مكتملة)
             app = create_workflow()
-            inputs = {"symbol": symbol, "user_request": "تحليل شامل وعميق"}
-            result = app.invoke(inputs)
+            if resume:
+                result = resume_run(app, failed_run["run_id"])
+            else:
+                inputs, config = prepare_run({"symbol": symbol, "user_request": "تحليل شامل وعميق"})
+                try:
+                    result = _run_with_progress(app, inputs, config)
+                except Exception:
+                    if pending_nodes(app, inputs["run_id"]):
+                        st.session_state.analysis_failed_run = {"run_id": inputs["run_id"], "symbol": symbol}
+                    raise
+            st.session_state.analysis_failed_run = None
             
             # التحقق من نجاح جلب البيانات
             if result.get('market_data') is None:
@@ -75,7 +112,8 @@ if st.button("🚀 بدء التحليل الشامل", use_container_width=True
                 st.stop()
 
             # 2. استخراج البيانات
-            hist_df = result.get('market_data')
+            # الحالة تحمل PriceSeries (مصفوفات للقراءة فقط): نحولها لـ DataFrame هنا عند الرسم فقط
+            hist_df = result.get('market_data').to_frame()
             forecast_df = result.get('forecast_data')
             report = result.get('final_report', 'لا يوجد تقرير.')
             
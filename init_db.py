@@ -1,8 +1,13 @@
 from app.core.database import get_db_connection
+from app.core.features import FeatureStore
 
 print("⏳ جاري تهيئة قاعدة البيانات...")
 
 # هذا السطر السحري سيقوم بإنشاء الملف والجداول فوراً
 conn = get_db_connection()
 
-print("✅ تم إنشاء ملف data/finance.duckdb بنجاح!")
\ No newline at end of file
+print("✅ تم إنشاء ملف data/finance.duckdb بنجاح!")
+
+# حساب الخصائص الفنية للأسعار الموجودة مسبقاً (تزايدي: لا يعيد حساب ما هو محسوب)
+rows = FeatureStore().refresh()
+print(f"✅ تم تحديث جدول الخصائص الفنية ({rows} صف جديد).")
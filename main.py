@@ -1,18 +1,29 @@
+import argparse
+import asyncio
+import contextlib
+import json
 import os
+import sys
+import time
 from dotenv import load_dotenv
-from app.engine.workflow import create_workflow
+from app.engine.workflow import acreate_workflow, prepare_run, aresume_run, apending_nodes, astream_run, arun_cached
+from app.core.tracing import summarize
+from app.core.checkpoint import aclose_checkpointer
+from app.core.registry import warmup
+from app.core.config import settings
+from app.core.serialization import json_default
 
 # تحميل المتغيرات البيئية
 load_dotenv()
 
-def main():
+async def main():
     print("==========================================")
     print("🤖 Armored MoE Analyst - النظام المالي المدرع")
     print("==========================================")
     
     # بناء الرسم البياني (The Brain)
     try:
-        app = create_workflow()
+        app = acreate_workflow()
     except ImportError:
         print("❌ خطأ: لم يتم العثور على ملف workflow.py أو هناك خطأ فيه.")
         return
@@ -20,9 +31,26 @@ def main():
         print(f"❌ خطأ في بناء النظام: {e}")
         return
 
+    # تحميل النماذج وأدوات التحليل في الخلفية أثناء انتظار أول أمر من المستخدم
+    warming = asyncio.create_task(asyncio.to_thread(warmup))
+
+    try:
+        await _session(app)
+    finally:
+        await warming
+        await aclose_checkpointer(app.checkpointer)
+
+async def _session(app):
+    # آخر تحليل توقف بخطأ (يمكن استئنافه من نقطة الحفظ بدل إعادته كاملاً)
+    failed_run_id = None
+
     while True:
         print("\n------------------------------------------")
-        symbol = input("📈 أدخل رمز السهم (أو 'q' للخروج): ").strip().upper()
+        # input يحجز الخيط، فننفذه جانبياً لتبقى حلقة الأحداث حرة
+        command = (await asyncio.to_thread(
+            input, "📈 أدخل رمز السهم (أو 'r [run_id]' للاستئناف، 'q' للخروج): "
+        )).strip()
+        symbol = command.upper()
         
         if symbol.lower() == 'q':
             print("👋 وداعاً!")
@@ -30,33 +58,215 @@ def main():
             
         if not symbol:
             continue
+
+        # الاستئناف: 'r' لآخر تحليل فشل، أو 'r <run_id>' لتحليل محدد
+        parts = command.split()
+        if parts[0].lower() == 'r' and len(parts) <= 2:
+            run_id = parts[1] if len(parts) == 2 else failed_run_id
+            if not run_id:
+                print("ℹ️ لا يوجد تحليل متوقف لاستئنافه.")
+                continue
+            try:
+                final_state = await aresume_run(app, run_id)
+                failed_run_id = None
+                _print_result(final_state)
+            except Exception as e:
+                print(f"⚠️ فشل الاستئناف: {e}")
+            continue
             
-        user_req = input("💬 هل لديك سؤال محدد؟ (اتركه فارغاً لتحليل شامل): ").strip()
+        user_req = (await asyncio.to_thread(input, "💬 هل لديك سؤال محدد؟ (اتركه فارغاً لتحليل شامل): ")).strip()
         if not user_req:
             user_req = "قم بعمل تحليل استثماري شامل لهذا السهم."
 
         print(f"\n⚙️  جاري استدعاء الفريق لتحليل {symbol}...")
         
-        # إعداد المدخلات
-        inputs = {
+        # إعداد المدخلات (run_id هو مفتاح نقاط الحفظ)
+        inputs, config = prepare_run({
             "symbol": symbol,
             "user_request": user_req,
             "retry_count": 0
-        }
+        })
 
         # تشغيل النظام
         try:
-            # نستخدم invoke لتشغيل العملية كاملة وانتظار النتيجة
-            final_state = app.invoke(inputs)
-            
-            report = final_state.get("final_report", "عذراً، لم يتم إنتاج تقرير نهائي.")
-            
-            print("\n📝 === التقرير النهائي ===")
-            print(report)
-            print("==========================\n")
+            # نبث التقرير أثناء كتابته (حلقة أحداث واحدة طوال الجلسة)
+            final_state, streamed = await _stream_report(app, inputs, config)
+            _print_result(final_state, streamed=streamed)
             
         except Exception as e:
             print(f"⚠️ حدث خطأ أثناء التحليل: {e}")
+            try:
+                pending = await apending_nodes(app, inputs["run_id"])
+            except Exception:
+                pending = ()
+            if pending:
+                failed_run_id = inputs["run_id"]
+                print(f"💾 تم حفظ التقدم حتى: {', '.join(pending)} — اكتب 'r' للاستئناف (run_id: {failed_run_id})")
+
+async def _stream_report(app, inputs, config) -> tuple:
+    """
+    طباعة التقرير رمزاً برمز أثناء توليده.
+    Returns: (الحالة النهائية، هل طُبع التقرير أثناء البث)
+    """
+    final_state, streamed = {}, False
+    async for kind, value in astream_run(app, inputs, config):
+        if kind == "draft":
+            streamed = True
+            if value == 1:
+                print("\n📝 === التقرير النهائي ===")
+            else:
+                print(f"\n\n🔁 === الناقد طلب إعادة الكتابة (مسودة {value}) ===")
+        elif kind == "token":
+            print(value, end="", flush=True)
+        else:
+            final_state = value or {}
+    if streamed:
+        print("\n==========================\n")
+    return final_state, streamed
+
+def _print_result(final_state: dict, streamed: bool = False):
+    # التقرير طُبع أثناء البث: لا نكرره (مسارات الخطأ قبل المراسل لا تبث شيئاً)
+    if not streamed:
+        report = final_state.get("final_report", "عذراً، لم يتم إنتاج تقرير نهائي.")
+        
+        print("\n📝 === التقرير النهائي ===")
+        print(report)
+        print("==========================\n")
+
+    # زمن كل عقدة في هذا التشغيل (التفاصيل الكاملة في ملف التتبع TRACE_PATH)
+    print(f"⏱️  أداء العقد (run_id: {final_state.get('run_id')}):")
+    print(summarize(final_state.get("trace_spans", [])))
+
+# ==========================================
+# وضع الدفعات (Watchlist Batch Mode)
+# ==========================================
+def load_watchlist(path: str) -> list:
+    """
+    قراءة ملف قائمة المراقبة: رمز أو أكثر في كل سطر (مفصولة بفواصل أو مسافات)،
+    والأسطر التي تبدأ بـ # تعليقات. الرموز المكررة تُحذف مع الحفاظ على الترتيب.
+    """
+    symbols = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            symbols.extend(s.strip().upper() for s in line.replace(",", " ").split())
+    return list(dict.fromkeys(s for s in symbols if s))
+
+def _prefetch(symbols: list):
+    """
+    تحديث أسعار كل الرموز القديمة بجلب جماعي واحد قبل التحليل،
+    فتجد عقدة Loader لكل رمز بيانات حديثة ولا تذهب للشبكة رمزاً رمزاً.
+    """
+    from app.engine.execution_team.workers.data_loader import DataLoader
+
+    loader = DataLoader()
+    stale = [s for s in symbols if not loader.is_fresh(s)]
+    if stale:
+        loader.fetch_many(stale, period="1y")
+
+def _batch_record(symbol: str, run_id: str, state: dict = None, error: Exception = None,
+                  pending: tuple = (), wall_ms: float = 0.0) -> dict:
+    """سطر النتيجة لرمز واحد في ملف المخرجات."""
+    record = {"symbol": symbol, "run_id": run_id, "wall_ms": round(wall_ms, 1)}
+    if error is not None:
+        record.update(status="error", error=str(error), pending_nodes=list(pending))
+        return record
+
+    state = state or {}
+    record.update(
+        status="ok" if state.get("market_data") is not None else "no_data",
+        final_report=state.get("final_report"),
+        forecast_summary=state.get("forecast_summary"),
+        fundamental_summary=state.get("fundamental_summary"),
+        sentiment=state.get("sentiment_report"),
+        risk=state.get("risk_report"),
+        cached=bool(state.get("cache_hit")),
+        nodes={span["name"]: span["attributes"]["node.wall_ms"] for span in state.get("trace_spans", [])},
+    )
+    return record
+
+async def run_watchlist(path: str, concurrency: int = None, output: str = None,
+                        user_request: str = "قم بعمل تحليل استثماري شامل لهذا السهم.") -> int:
+    """
+    تحليل كل رموز قائمة المراقبة بدون تفاعل.
+
+    كل التحليلات تعمل في نفس العملية على حلقة أحداث واحدة (المخطط غير المتزامن)،
+    بحد أقصى concurrency تحليل في نفس الوقت، فتتشارك النماذج المحملة ومجمع DuckDB
+    ولقطات الأسعار. كل نتيجة تُكتب سطر JSON فور انتهائها (output = "-" للمخرجات القياسية).
+    التحليلات الفاشلة تبقى في نقاط الحفظ ويمكن استئنافها بـ run_id.
+
+    Returns: عدد التحليلات الفاشلة (لاستخدامه كرمز خروج).
+    """
+    concurrency = concurrency or settings.BATCH_CONCURRENCY
+    output = output or settings.BATCH_OUTPUT_PATH
+    symbols = load_watchlist(path)
+    if not symbols:
+        print(f"⚠️ قائمة المراقبة {path} فارغة.")
+        return 0
+
+    print(f"📋 تحليل {len(symbols)} رمز من {path} (تزامن {concurrency}) → {output}")
+    started = time.perf_counter()
+
+    # جلب الأسعار وتحميل النماذج بالتوازي قبل بدء التحليلات
+    await asyncio.gather(asyncio.to_thread(_prefetch, symbols), asyncio.to_thread(warmup))
+
+    app = acreate_workflow()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(symbol: str) -> dict:
+        async with semaphore:
+            inputs, config = prepare_run({"symbol": symbol, "user_request": user_request, "retry_count": 0})
+            t0 = time.perf_counter()
+            try:
+                state = await arun_cached(app, inputs, config)
+            except Exception as e:
+                try:
+                    pending = await apending_nodes(app, inputs["run_id"])
+                except Exception:
+                    pending = ()
+                return _batch_record(symbol, inputs["run_id"], error=e, pending=pending,
+                                     wall_ms=(time.perf_counter() - t0) * 1000)
+            return _batch_record(symbol, inputs["run_id"], state, wall_ms=(time.perf_counter() - t0) * 1000)
+
+    counts = {"ok": 0, "no_data": 0, "error": 0}
+    if output == "-":
+        # (sys.__stdout__ لأن رسائل العمال محولة إلى stderr في هذا الوضع)
+        sink = contextlib.nullcontext(sys.__stdout__)
+    else:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        sink = open(output, "a", encoding="utf-8")
+
+    try:
+        with sink as out:
+            for task in asyncio.as_completed([analyze(symbol) for symbol in symbols]):
+                record = await task
+                counts[record["status"]] += 1
+                out.write(json.dumps(record, ensure_ascii=False, default=json_default) + "\n")
+                out.flush()
+                print(f"   {'✅' if record['status'] == 'ok' else '❌'} {record['symbol']} "
+                      f"({sum(counts.values())}/{len(symbols)})")
+    finally:
+        await aclose_checkpointer(app.checkpointer)
+
+    print(f"🏁 انتهى خلال {time.perf_counter() - started:.1f} ث: "
+          f"{counts['ok']} ناجح، {counts['no_data']} بدون بيانات، {counts['error']} فاشل.")
+    return counts["error"]
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Armored MoE Analyst")
+    parser.add_argument("--watchlist", help="ملف قائمة المراقبة لتحليل الرموز دفعة واحدة بدون تفاعل")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help=f"عدد التحليلات المتزامنة (الافتراضي {settings.BATCH_CONCURRENCY})")
+    parser.add_argument("--output", default=None,
+                        help=f"ملف JSONL للنتائج، أو - للمخرجات القياسية (الافتراضي {settings.BATCH_OUTPUT_PATH})")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = _parse_args()
+    if args.watchlist:
+        # عند الكتابة للمخرجات القياسية نحول رسائل العمال إلى stderr ليبقى JSONL نظيفاً
+        redirect = contextlib.redirect_stdout(sys.stderr) if args.output == "-" else contextlib.nullcontext()
+        with redirect:
+            failures = asyncio.run(run_watchlist(args.watchlist, args.concurrency, args.output))
+        sys.exit(1 if failures else 0)
+    asyncio.run(main())
\ No newline at end of file
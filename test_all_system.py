@@ -121,17 +121,17 @@ except Exception as e:
 print("\n--- [5/5] التشغيل التجريبي للنظام (Integration Test) ---")
 
 try:
-    from app.engine.workflow import create_workflow
+    from app.engine.workflow import create_workflow, prepare_run
     
     app = create_workflow()
     
-    inputs = {
+    inputs, config = prepare_run({
         "symbol": "AAPL",
         "user_request": "هل السهم جيد للاستثمار؟"
-    }
+    })
     
     print("⏳ جاري تشغيل المحرك (قد يستغرق بضع ثوانٍ)...")
-    final_state = app.invoke(inputs)
+    final_state = app.invoke(inputs, config)
     
     report = final_state.get('final_report')
     if report and len(report) > 50:
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# بيئة معزولة قبل استيراد app (الإعدادات تُقرأ عند الاستيراد): لا شبكة ولا ملفات المشروع الحقيقية
+_SANDBOX = tempfile.mkdtemp(prefix="armored_tests_")
+os.environ.update({
+    "OPENAI_API_KEY": "test-key",
+    "FETCH_PROVIDER": "stub",
+    "DB_PATH": os.path.join(_SANDBOX, "finance.duckdb"),
+    "ARCHIVE_PATH": os.path.join(_SANDBOX, "archive"),
+    "CHECKPOINT_PATH": os.path.join(_SANDBOX, "checkpoints.sqlite"),
+    "TRACE_PATH": os.path.join(_SANDBOX, "traces.jsonl"),
+    "LLM_CACHE_PATH": os.path.join(_SANDBOX, "llm_cache.sqlite"),
+})
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.core import database
+from app.core.config import settings
+
+
+@pytest.fixture
+def db_pool(tmp_path, monkeypatch):
+    """مجمع DuckDB جديد لكل اختبار (ملف وأرشيف في مجلد مؤقت) بدل المجمع المشترك."""
+    monkeypatch.setattr(settings, "ARCHIVE_PATH", str(tmp_path / "archive"))
+    pool = database.ConnectionPool(str(tmp_path / "finance.duckdb"), size=4, timeout=1.0)
+    database._init_schema(pool.root)
+    monkeypatch.setattr(database, "_db_pool", pool)
+    yield pool
+    pool.root.close()
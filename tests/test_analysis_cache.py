@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+import pandas as pd
+from app.core.analysis_cache import AnalysisCache
+from app.engine import workflow
+from app.engine.execution_team.workers.data_loader import DataLoader
+
+
+def _state(**overrides):
+    return {"symbol": "AAA", "user_request": "حلل AAA", "final_report": "تقرير", "market_data": [1.0], **overrides}
+
+
+def _store_fresh(symbol: str):
+    day = date.today() - timedelta(days=1)
+    DataLoader()._store(pd.DataFrame({
+        "date": [day], "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1000, "symbol": symbol,
+    }))
+
+
+def test_put_refuses_rejected_reports(db_pool):
+    cache = AnalysisCache()
+    assert not cache.put("k1", _state(is_quality_passed=False))
+    assert cache.get("k1") is None
+    # قبول قسري من قاطع الدائرة بعد تجاوز المحاولات
+    assert not cache.put("k3", _state(is_quality_passed=True, quality_forced=True))
+    assert cache.get("k3") is None
+    assert cache.put("k2", _state(is_quality_passed=True))
+    assert cache.get("k2")["final_report"] == "تقرير"
+
+
+def test_cache_key_skips_network_when_prices_are_fresh(db_pool, monkeypatch):
+    _store_fresh("AAA")
+
+    def network(*args, **kwargs):
+        raise AssertionError("cache_key must not fetch fresh prices")
+
+    monkeypatch.setattr(DataLoader, "fetch_and_store_data", network)
+
+    key = workflow.cache_key({"symbol": "AAA", "user_request": "حلل AAA"})
+    assert key == AnalysisCache().key("AAA", "حلل AAA")
+
+
+def test_cache_key_refresh_failure_is_a_miss(db_pool, monkeypatch):
+    def offline(*args, **kwargs):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(DataLoader, "fetch_and_store_data", offline)
+    assert workflow.cache_key({"symbol": "AAA", "user_request": "حلل AAA"}) is None
+
+
+def test_report_forced_by_circuit_breaker_is_not_cached(db_pool):
+    from app.engine.strategy_team.critic import MAX_RETRIES, critic_node
+
+    verdict = critic_node({"final_report": "تقرير", "symbol": "AAA", "retry_count": MAX_RETRIES})
+    assert verdict["is_quality_passed"] is True
+    assert not AnalysisCache().put("k", _state(retry_count=MAX_RETRIES, **verdict))
@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+import pandas as pd
+from app.core.archive import PriceArchive
+from app.engine.execution_team.workers.data_loader import DataLoader
+
+
+def _prices(symbol: str, days: list, close: float) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": days, "open": close, "high": close, "low": close, "close": close,
+        "volume": 1000, "symbol": symbol,
+    })
+
+
+def _old_days(n: int = 5) -> list:
+    first = date.today() - timedelta(days=1000)
+    return [first + timedelta(days=i) for i in range(n)]
+
+
+def test_compact_moves_aged_rows_to_archive(db_pool):
+    loader = DataLoader()
+    loader._store(_prices("TST", _old_days(), 100.0))
+
+    result = PriceArchive().compact(older_than_days=365)
+
+    assert result["rows"] == 5
+    with db_pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM stock_prices").fetchone()[0] == 0
+    assert loader.read_prices("TST")["close"].tolist() == [100.0] * 5
+
+
+def test_reload_then_compact_keeps_adjusted_prices(db_pool):
+    """تحميل كامل بعد تجزئة (replace_symbols) ثم ضغط: القراءة تعيد الأسعار المعدلة وليس المؤرشفة."""
+    loader = DataLoader()
+    days = _old_days()
+    loader._store(_prices("TST", days, 100.0))
+    PriceArchive().compact(older_than_days=365)
+
+    loader._store(_prices("TST", days, 999.0), replace_symbols=["TST"])
+    assert loader.read_prices("TST")["close"].tolist() == [999.0] * 5
+
+    PriceArchive().compact(older_than_days=365)
+    assert loader.read_prices("TST")["close"].tolist() == [999.0] * 5
+
+
+def test_compact_rewrites_partition_with_hot_values(db_pool):
+    """صف ساخن لنفس (الرمز، اليوم) الموجود في الأرشيف يحل محله عند الضغط بدل أن يُحذف."""
+    loader = DataLoader()
+    days = _old_days()
+    loader._store(_prices("TST", days, 100.0))
+    PriceArchive().compact(older_than_days=365)
+
+    # تعديل يومين فقط بدون إعادة تحميل كاملة (upsert في الطبقة الساخنة)
+    loader._store(_prices("TST", days[:2], 50.0))
+    result = PriceArchive().compact(older_than_days=365)
+
+    assert result["rewritten"] == 1
+    assert loader.read_prices("TST")["close"].tolist() == [50.0, 50.0, 100.0, 100.0, 100.0]
+
+
+def test_drop_range_leaves_other_symbols_and_days(db_pool):
+    loader = DataLoader()
+    days = _old_days()
+    loader._store(pd.concat([_prices("AAA", days, 1.0), _prices("BBB", days, 2.0)]))
+    PriceArchive().compact(older_than_days=365)
+
+    assert PriceArchive().drop_range({"AAA": (days[1], days[2])}) == 1
+    assert loader.read_prices("AAA")["date"].dt.date.tolist() == [days[0], days[3], days[4]]
+    assert loader.read_prices("BBB")["close"].tolist() == [2.0] * 5
+
+
+def test_full_reload_keeps_archived_history_before_reload_window(db_pool):
+    """إعادة التحميل الكاملة تجلب مدى محدوداً: الأيام المؤرشفة الأقدم منه لا تُحذف."""
+    loader = DataLoader()
+    days = _old_days(10)
+    loader._store(_prices("TST", days, 100.0))
+    PriceArchive().compact(older_than_days=365)
+
+    # تعديل تاريخي يغطي آخر 4 أيام فقط من الأرشيف
+    reloaded = days[6:]
+    assert loader._changed_symbols(_prices("TST", reloaded, 50.0)) == {"TST"}
+    loader._store(_prices("TST", reloaded, 50.0), replace_symbols=["TST"])
+
+    assert loader.read_prices("TST")["close"].tolist() == [100.0] * 6 + [50.0] * 4
+    PriceArchive().compact(older_than_days=365)
+    assert loader.read_prices("TST")["close"].tolist() == [100.0] * 6 + [50.0] * 4
+
+
+def test_fetch_log_sees_archived_symbols(db_pool):
+    loader = DataLoader()
+    days = _old_days()
+    loader._store(_prices("TST", days, 100.0))
+    PriceArchive().compact(older_than_days=365)
+
+    with db_pool.connection() as conn:
+        conn.execute("DELETE FROM fetch_log")
+        loader._record_fetch(conn, ["TST"])
+    assert loader.get_fetch_info("TST")["last_bar_date"] == days[-1]
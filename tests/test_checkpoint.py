@@ -0,0 +1,61 @@
+import sqlite3
+import time
+import uuid
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from app.core.checkpoint import _checkpoint_time, prune_checkpoints
+
+
+def _uuid6_at(timestamp: float) -> str:
+    # نفس تخطيط UUIDv6 الذي تستخدمه LangGraph لمعرفات نقاط الحفظ
+    ticks = int(timestamp * 1e7) + 0x01B21DD213814000
+    value = ((ticks >> 12) << 80) | (0x6 << 76) | ((ticks & 0x0FFF) << 64) | (0x8 << 60) | 1
+    return str(uuid.UUID(int=value))
+
+
+def _make_db(path, runs):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    SqliteSaver(conn).setup()
+    for thread_id, age_days in runs.items():
+        checkpoint_id = _uuid6_at(time.time() - age_days * 86400)
+        conn.execute(
+            "INSERT INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, type, checkpoint, metadata) "
+            "VALUES (?, '', ?, 'json', x'00', x'00')", [thread_id, checkpoint_id]
+        )
+        conn.execute(
+            "INSERT INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) "
+            "VALUES (?, '', ?, 't', 0, 'c', 'json', x'00')", [thread_id, checkpoint_id]
+        )
+    conn.commit()
+    return conn
+
+
+def _threads(conn, table):
+    return {row[0] for row in conn.execute(f"SELECT DISTINCT thread_id FROM {table}")}
+
+
+def test_checkpoint_time_decodes_uuid6():
+    now = time.time()
+    assert abs(_checkpoint_time(_uuid6_at(now)) - now) < 0.01
+
+
+def test_prune_removes_old_runs(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    conn = _make_db(path, {"fresh": 1, "old": 30})
+
+    assert prune_checkpoints(path, max_age_days=7, max_runs=100) == 1
+    assert _threads(conn, "checkpoints") == {"fresh"}
+    assert _threads(conn, "writes") == {"fresh"}
+
+
+def test_prune_keeps_latest_runs(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    conn = _make_db(path, {"a": 3, "b": 2, "c": 1})
+
+    assert prune_checkpoints(path, max_age_days=7, max_runs=2) == 1
+    assert _threads(conn, "checkpoints") == {"b", "c"}
+
+
+def test_prune_missing_file(tmp_path):
+    assert prune_checkpoints(str(tmp_path / "none.sqlite")) == 0
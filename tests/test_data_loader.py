@@ -0,0 +1,20 @@
+from datetime import date, timedelta
+from app.core.config import settings
+from app.engine.execution_team.workers.data_loader import DataLoader
+
+
+def test_fetch_many_batches_by_last_stored_date(db_pool, monkeypatch):
+    """رمز متأخر لا يسحب باقي الدفعة لتاريخ بدايته: كل تاريخ بداية له دفعته."""
+    loader = DataLoader()
+    recent, stale = date.today() - timedelta(days=1), date.today() - timedelta(days=400)
+    monkeypatch.setattr(loader, "get_last_dates", lambda symbols: {"AAA": recent, "BBB": recent, "OLD": stale})
+    requests = []
+    monkeypatch.setattr(loader, "_download_all", lambda batches, mapping, params: requests.extend(zip(batches, params)) or [])
+
+    loader.fetch_many(["AAA", "BBB", "OLD"])
+
+    overlap = timedelta(days=settings.SYNC_OVERLAP_DAYS)
+    assert sorted((sorted(batch), p["start"]) for batch, p in requests) == [
+        (["AAA", "BBB"], (recent - overlap).isoformat()),
+        (["OLD"], (stale - overlap).isoformat()),
+    ]
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from app.core.database import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.duckdb"), size=1, timeout=0.1)
+    yield pool
+    pool.root.close()
+
+
+def test_checkout_times_out_when_pool_is_exhausted(pool):
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait(5)
+    try:
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        worker.join()
+
+    assert pool.stats()["timeouts"] == 1
+    with pool.connection() as conn:   # المؤشر عاد للمجمع بعد خروج الخيط
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_nested_checkout_reuses_cursor_in_same_thread(pool):
+    # حجم المجمع 1: الحجز المتداخل كان سينتظر نفسه حتى المهلة لو لم يُعِد استخدام المؤشر
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+
+    stats = pool.stats()
+    assert (stats["checkouts"], stats["reused"], stats["in_use"], stats["idle"]) == (1, 1, 0, 1)
+
+
+def test_nested_checkout_shares_transaction(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("BEGIN")
+        with pool.connection() as inner:
+            inner.execute("INSERT INTO t VALUES (1)")
+        conn.execute("ROLLBACK")
+        assert conn.execute("SELECT count(*) FROM t").fetchone() == (0,)
+
+
+def test_other_threads_get_their_own_cursor(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.duckdb"), size=2, timeout=1.0)
+    seen = []
+
+    def checkout():
+        with pool.connection() as conn:
+            seen.append(conn)
+
+    with pool.connection() as conn:
+        worker = threading.Thread(target=checkout)
+        worker.start()
+        worker.join()
+        assert seen[0] is not conn
+    pool.root.close()
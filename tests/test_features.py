@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+import pandas as pd
+from app.core.features import FeatureStore
+from app.engine.execution_team.workers.data_loader import DataLoader
+
+
+def _prices(symbol: str, n: int) -> pd.DataFrame:
+    days = [date.today() - timedelta(days=n - i) for i in range(n)]
+    return pd.DataFrame({
+        "date": days, "open": 1.0, "high": 1.0, "low": 1.0,
+        "close": [100.0 + i for i in range(n)], "volume": 1000, "symbol": symbol,
+    })
+
+
+def _feature_rows(pool) -> int:
+    with pool.connection() as conn:
+        return conn.execute("SELECT count(*) FROM price_features").fetchone()[0]
+
+
+def test_read_reports_complete_features(db_pool):
+    DataLoader()._store(_prices("AAA", 20))   # _store يحدّث الخصائص بعد الكتابة
+
+    df = FeatureStore().read("AAA", lookback=3)
+
+    assert len(df) == 3 and df["date"].is_monotonic_increasing
+    assert df.attrs["missing"] == 0
+
+
+def test_read_does_not_write_missing_features(db_pool):
+    frame = _prices("BBB", 20)
+    with db_pool.connection() as conn:
+        conn.execute("INSERT INTO stock_prices SELECT symbol, date, open, high, low, close, volume FROM frame")
+
+    df = FeatureStore().read("BBB")
+
+    assert df.empty
+    assert df.attrs["missing"] == 20
+    assert _feature_rows(db_pool) == 0
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.fetcher import AsyncMarketFetcher, RetryableFetchError, is_transient
+
+
+class _FlakyProvider:
+    """يرفع الأخطاء المعطاة بالترتيب ثم ينجح."""
+    name = "flaky"
+    transient_errors = ()
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def call(self, kind, target, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = SimpleNamespace(status_code=status_code)
+
+
+def _fetch(provider):
+    fetcher = AsyncMarketFetcher(provider, max_concurrency=2, rate=1000, burst=10, max_retries=3, backoff=0)
+    return asyncio.run(fetcher.fetch("info", "AAA"))
+
+
+@pytest.mark.parametrize("error", [RetryableFetchError("throttled"), TimeoutError(), _HTTPError(429), _HTTPError(503)])
+def test_transient_errors_are_retried(error):
+    provider = _FlakyProvider(error)
+    assert _fetch(provider) == "ok"
+    assert provider.calls == 2
+
+
+@pytest.mark.parametrize("error", [ValueError("bad symbol"), KeyError("close"), _HTTPError(404)])
+def test_permanent_errors_raise_immediately(error):
+    provider = _FlakyProvider(error)
+    with pytest.raises(type(error)):
+        _fetch(provider)
+    assert provider.calls == 1
+
+
+def test_provider_transient_errors():
+    class ProviderRateLimit(Exception):
+        pass
+
+    assert is_transient(ProviderRateLimit(), (ProviderRateLimit,))
+    assert not is_transient(ProviderRateLimit())
@@ -0,0 +1,58 @@
+import asyncio
+import os
+
+from app.api import jobs
+from app.api.jobs import JobQueue
+
+
+def _fake_run(outcomes: list):
+    """بديل astream_run: كل تشغيل يأخذ النتيجة التالية (استثناء يُرفع أو حالة نهائية)."""
+    async def astream_run(app, inputs, config, use_cache=True, progress=False):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        yield ("final", outcome)
+    return astream_run
+
+
+async def _no_pending(app, run_id):
+    return ("vision_analyst",)
+
+
+def _upload(tmp_path) -> str:
+    path = tmp_path / "upload.jpg"
+    path.write_bytes(b"\xff\xd8")
+    return str(path)
+
+
+def test_failed_job_keeps_upload_until_resumed_successfully(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "astream_run", _fake_run([RuntimeError("vision timeout"), {"symbol": "AAA"}]))
+    monkeypatch.setattr(jobs, "apending_nodes", _no_pending)
+    path = _upload(tmp_path)
+
+    async def scenario():
+        queue = JobQueue(app=None, workers=1, max_queued=4, retention=10)
+        job = queue.submit({"screenshot_path": path}, cleanup=path)
+        await queue._run(await queue._queue.get())
+        failed = (job.status, os.path.exists(path))
+
+        queue.resume(job)
+        await queue._run(await queue._queue.get())
+        return failed, (job.status, os.path.exists(path))
+
+    assert asyncio.run(scenario()) == (("error", True), ("done", False))
+
+
+def test_evicted_failed_job_releases_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "astream_run", _fake_run([RuntimeError("boom")]))
+    monkeypatch.setattr(jobs, "apending_nodes", _no_pending)
+    path = _upload(tmp_path)
+
+    async def scenario():
+        queue = JobQueue(app=None, workers=1, max_queued=4, retention=1)
+        queue.submit({"screenshot_path": path}, cleanup=path)
+        await queue._run(await queue._queue.get())
+        queue.submit({"symbol": "BBB"})   # تجاوز حد الاحتفاظ: المهمة الفاشلة الأقدم تُزال
+        return os.path.exists(path)
+
+    assert asyncio.run(scenario()) is False
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+
+from app.core.llm import LoopBoundAsyncClient
+
+
+def _client():
+    client = LoopBoundAsyncClient(limits=httpx.Limits(max_connections=2), timeout=httpx.Timeout(5.0))
+    # بدون شبكة: كل عميل حلقة يستخدم نقل وهمي يعيد رقم الحلقة
+    client._client_options["transport"] = httpx.MockTransport(
+        lambda request: httpx.Response(200, json={"loop": id(asyncio.get_running_loop())})
+    )
+    return client
+
+
+async def _get(client):
+    response = await client.send(httpx.Request("GET", "https://example.test/"))
+    return response.json()["loop"], client._loop_client()
+
+
+def test_one_client_per_event_loop():
+    client = _client()
+    _, first_client = asyncio.run(_get(client))
+    _, second_client = asyncio.run(_get(client))
+
+    assert first_client is not second_client
+
+
+def test_same_loop_reuses_client():
+    client = _client()
+
+    async def twice():
+        (_, first), (_, second) = await _get(client), await _get(client)
+        return first is second, client.stats()["loops"]
+
+    assert asyncio.run(twice()) == (True, 1)
+
+
+def test_aclose_closes_current_loop_client():
+    client = _client()
+
+    async def run():
+        _, inner = await _get(client)
+        await client.aclose()
+        return inner
+
+    assert asyncio.run(run()).is_closed
+    assert not client.is_closed
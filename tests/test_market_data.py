@@ -0,0 +1,69 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from app.core.market_data import PriceSeries
+
+
+@pytest.fixture
+def series():
+    n = 10
+    return PriceSeries(
+        "AAA",
+        date=np.arange("2026-01-01", "2026-01-11", dtype="datetime64[D]"),
+        open=np.linspace(1, 10, n), high=np.linspace(2, 11, n), low=np.linspace(0, 9, n),
+        close=np.linspace(1, 10, n), volume=np.arange(n) * 100,
+        version="v1",
+    )
+
+
+def test_series_is_immutable(series):
+    with pytest.raises(AttributeError):
+        series.close = np.zeros(len(series))
+    with pytest.raises(ValueError):
+        series["close"][0] = 0.0
+    with pytest.raises(ValueError):
+        series.tail(3)["close"][0] = 0.0
+
+
+def test_constructor_does_not_share_caller_arrays():
+    close = np.array([1.0, 2.0, 3.0])
+    s = PriceSeries("AAA", date=np.arange(3).astype("datetime64[D]"), open=close, high=close,
+                    low=close, close=close, volume=np.arange(3))
+    close[0] = 99.0   # المصفوفة الأصلية ما زالت قابلة للتعديل عند المتصل
+    assert s["close"][0] == 1.0
+
+
+def test_slicing_does_not_copy(series):
+    tail = series.tail(3)
+    assert len(tail) == 3 and tail.symbol == "AAA" and tail.version == "v1"
+    assert np.shares_memory(tail["close"], series["close"])
+    assert np.shares_memory(series[2:5]["date"], series["date"])
+    assert series.tail(100)["close"].tolist() == series["close"].tolist()
+
+
+def test_replace_shares_untouched_columns(series):
+    cleaned = series.replace(close=np.ones(len(series)))
+    assert cleaned["close"].tolist() == [1.0] * len(series)
+    assert cleaned["open"] is series["open"]
+    assert series["close"][-1] == 10.0
+    with pytest.raises(ValueError):
+        cleaned["close"][0] = 0.0
+
+
+def test_pickle_round_trip(series):
+    restored = pickle.loads(pickle.dumps(series.tail(4)))
+    assert (restored.symbol, restored.version, len(restored)) == ("AAA", "v1", 4)
+    assert restored["close"].tolist() == series["close"][-4:].tolist()
+    assert restored["date"].dtype == np.dtype("datetime64[D]")
+    with pytest.raises(ValueError):
+        restored["close"][0] = 0.0
+
+
+def test_frame_round_trip_is_independent(series):
+    df = series.to_frame()
+    df.loc[0, "close"] = -1.0
+    assert series["close"][0] == 1.0
+    again = PriceSeries.from_frame(df)
+    assert again.symbol == "AAA" and again["close"][0] == -1.0
+    assert isinstance(df["date"].iloc[0], pd.Timestamp)
@@ -0,0 +1,100 @@
+import pytest
+from app.components.intent.recognizer import TickerRecognizer
+from app.core.config import settings
+
+
+@pytest.fixture
+def recognizer(db_pool, tmp_path):
+    return TickerRecognizer(semantic_path=str(tmp_path / "semantic_net.json"))
+
+
+def _local(result: dict) -> bool:
+    """هل يُحسم الطلب محلياً؟ (وإلا يُحال لنموذج اللغة في detect_intent)"""
+    return result["confidence"] >= settings.INTENT_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("text, symbol", [
+    ("حلل أرامكو", "2222.SR"),
+    ("ما رأيك في سهم الراجحي؟", "1120.SR"),
+    ("توقعات للراجحي", "1120.SR"),
+    ("وش توقعك للذهب اليوم؟", "GC=F"),
+    ("analyze Apple please", "AAPL"),
+    ("NVIDIA stock forecast", "NVDA"),
+    ("سعر بيتكوين", "BTC-USD"),
+])
+def test_arabic_and_english_names(recognizer, text, symbol):
+    result = recognizer.recognize(text)
+    assert (result["is_analysis"], result["symbol"], result["source"]) == (True, symbol, "index")
+    assert _local(result)
+
+
+def test_overlapping_names_resolve_to_longest_match(recognizer):
+    result = recognizer.recognize("تحليل أرامكو السعودية")
+    assert result["symbol"] == "2222.SR" and result["reason"] == "explicit"
+    assert result["matches"] == ["ارامكو السعوديه"]
+
+    # "الراجحي" داخل "مصرف الراجحي": تطابق واحد وليس تطابقين
+    assert recognizer.recognize("مصرف الراجحي")["matches"] == ["مصرف الراجحي"]
+
+
+def test_names_inside_other_words_do_not_match(recognizer):
+    # "ذهب" فعل، و"oil" جزء من "toilet"
+    for text in ("ذهب إلى السوق أمس", "the toilet is broken"):
+        result = recognizer.recognize(text)
+        assert result["symbol"] is None and result["matches"] == []
+
+
+@pytest.mark.parametrize("text", [
+    "I ate an apple today",
+    "my oil change is due",
+    "how do I set up meta tags",
+    "thanks, that was gold",
+])
+def test_common_words_are_not_decided_locally(recognizer, text):
+    # أسماء الفهرس التي هي كلمات عادية: بدون كلمة تحليل يُسأل نموذج اللغة بدل بدء تحليل
+    result = recognizer.recognize(text)
+    assert result["reason"] == "named"
+    assert not _local(result)
+
+
+@pytest.mark.parametrize("text, symbol", [("TSLA", "TSLA"), ("2222.SR", "2222.SR"), ("وش رأيك في META؟", "META")])
+def test_written_ticker_without_keyword_is_local(recognizer, text, symbol):
+    result = recognizer.recognize(text)
+    assert (result["symbol"], result["reason"]) == (symbol, "ticker")
+    assert _local(result)
+
+
+def test_explicit_ticker_outside_index(recognizer):
+    result = recognizer.recognize("analyze PLTR")
+    assert (result["symbol"], result["source"], result["reason"]) == ("PLTR", "pattern", "pattern")
+    assert _local(result)
+
+
+def test_follow_up_on_last_symbol_is_chat(recognizer):
+    result = recognizer.recognize("وش رأيك في تسلا؟", last_symbol="TSLA")
+    assert (result["is_analysis"], result["reason"]) == (False, "follow_up")
+    assert _local(result)
+
+
+def test_plain_chat_is_decided_locally(recognizer):
+    result = recognizer.recognize("شكراً لك")
+    assert (result["is_analysis"], result["reason"]) == (False, "chat")
+    assert _local(result)
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("حلل شركة المراعي", "unknown_name"),      # كلمة تحليل واسم خارج الفهرس
+    ("قارن أبل مع مايكروسوفت", "ambiguous"),   # أكثر من رمز
+    ("PLTR", "pattern_only"),                   # رمز محتمل بدون كلمة تحليل
+])
+def test_no_confident_match_falls_back_to_llm(recognizer, text, reason):
+    result = recognizer.recognize(text)
+    assert result["reason"] == reason
+    assert not _local(result)
+    assert recognizer.stats()["low_confidence"] == 1
+
+
+def test_add_extends_index(recognizer):
+    assert recognizer.recognize("حلل 4190")["symbol"] is None
+    recognizer.add("4190.SR")
+    assert recognizer.recognize("حلل 4190")["symbol"] == "4190.SR"
@@ -0,0 +1,95 @@
+import pytest
+from app.components.review.report_rules import (
+    ReportValidator, RECOMMENDATION_PATTERN, PRICE_PATTERN, TECHNICAL_PATTERN,
+)
+
+SECTIONS = """
+### الملخص والتوصية
+{summary}
+
+### الوضع المالي
+الإيرادات مستقرة والديون منخفضة مقارنة بالقطاع، مع هوامش ربح جيدة.
+
+### التوقيت الفني
+{technical}
+
+### المخاطر
+تقلبات أسعار النفط والطلب العالمي.
+"""
+
+
+def _report(summary: str, technical: str = "السعر الحالي 27.50 ريال فوق المتوسط المتحرك 50.") -> str:
+    return SECTIONS.format(summary=summary, technical=technical)
+
+
+@pytest.mark.parametrize("text", [
+    "التوصية: شراء",
+    "ننصح بالاحتفاظ بالسهم",
+    "فرصة جيدة للشراء عند الدعم",
+    "والبيع أفضل الآن",
+    "Recommendation: HOLD",
+])
+def test_recommendation_words(text):
+    assert RECOMMENDATION_PATTERN.search(text)
+
+
+@pytest.mark.parametrize("text", [
+    "نمو المبيعات قوي هذا الربع",
+    "الأداء طبيعي مقارنة بالسوق",
+    "مبيعات الشركة ارتفعت",
+    "the seller market",
+])
+def test_words_containing_recommendation_are_not_recommendations(text):
+    assert not RECOMMENDATION_PATTERN.search(text)
+
+
+def test_report_with_recommendation_passes():
+    result = ReportValidator().check(_report("الشركة في وضع جيد. التوصية: شراء."))
+    assert result["passed"] is True
+
+
+def test_sales_mention_without_recommendation_is_not_approved():
+    """ذكر المبيعات لا يُعد توصية: الحكم يُحال للناقد الذكي بدل القبول المباشر."""
+    result = ReportValidator().check(_report("نمو المبيعات مستمر والوضع طبيعي."))
+    assert result["passed"] is None
+    assert "توصية واضحة (شراء/بيع/احتفاظ)" in result["missing"]
+
+
+def test_no_recommendation_and_no_price_is_rejected():
+    result = ReportValidator().check(_report("نمو المبيعات مستمر والوضع طبيعي.", technical="لا تعليق."))
+    assert result["passed"] is False
+
+
+def test_short_report_is_rejected():
+    assert ReportValidator().check("شراء")["passed"] is False
+
+
+@pytest.mark.parametrize("text", ["السعر الحالي 27.50 ريال", "$182.3", "يتداول عند 31.2", "close at 45", "120 دولار"])
+def test_price_needs_currency_or_price_context(text):
+    assert PRICE_PATTERN.search(text)
+
+
+@pytest.mark.parametrize("text", ["نمو الإيرادات 3.5%", "هامش الربح 12.4 بالمئة", "السعر ارتفع 3.5%", "في 2024 نما الربح"])
+def test_bare_numbers_are_not_prices(text):
+    assert not PRICE_PATTERN.search(text)
+
+
+def test_generic_direction_word_is_not_technical():
+    assert not TECHNICAL_PATTERN.search("الاتجاه العام للشركة إيجابي")
+    assert TECHNICAL_PATTERN.search("السهم في اتجاه صاعد فوق الدعم")
+
+
+def test_echoed_prompt_template_does_not_pass():
+    """تقرير يكرر قالب الأمر "(شراء/بيع/انتظار مع السبب)" ليس فيه توصية ولا سعر."""
+    report = _report(
+        "(شراء/بيع/انتظار مع السبب).",
+        technical="الاتجاه العام مستقر، ونمو الإيرادات 3.5% هذا الربع.",
+    )
+    assert ReportValidator().check(report)["passed"] is False
+
+
+def test_recommendation_outside_summary_section_is_not_enough():
+    report = _report("الشركة في وضع جيد.") + "\n### ملاحظات\nالتوصية: شراء.\n"
+    result = ReportValidator().check(report)
+    assert result["passed"] is None
+    assert "توصية واضحة (شراء/بيع/احتفاظ)" in result["missing"]
@@ -0,0 +1,31 @@
+import base64
+import os
+import pytest
+from fastapi import HTTPException
+from app.api import server
+from app.core.config import settings
+
+
+def test_oversized_screenshot_is_rejected_before_decoding(monkeypatch):
+    monkeypatch.setattr(settings, "API_MAX_SCREENSHOT_BYTES", 30)
+    monkeypatch.setattr(server.base64, "b64decode", lambda *a, **k: pytest.fail("decoded an oversized body"))
+
+    with pytest.raises(HTTPException) as error:
+        server._save_screenshot(base64.b64encode(b"x" * 31).decode())
+    assert error.value.status_code == 413
+
+
+def test_screenshot_at_limit_is_saved(monkeypatch):
+    monkeypatch.setattr(settings, "API_MAX_SCREENSHOT_BYTES", 30)
+    path = server._save_screenshot(base64.b64encode(b"x" * 30).decode())
+    try:
+        with open(path, "rb") as f:
+            assert f.read() == b"x" * 30
+    finally:
+        os.remove(path)
+
+
+def test_invalid_base64_is_422():
+    with pytest.raises(HTTPException) as error:
+        server._save_screenshot("not base64!")
+    assert error.value.status_code == 422
@@ -0,0 +1,75 @@
+import threading
+import time
+import pytest
+from app.core.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def _run_concurrently(flights: SingleFlight, key, fn):
+    """يشغل CALLERS خيطاً على نفس المفتاح، ويطلق fn بعد أن ينضم الجميع للاستدعاء الجاري."""
+    release = threading.Event()
+    outcomes = [None] * CALLERS
+
+    def gated():
+        release.wait(5)
+        return fn()
+
+    def caller(i):
+        try:
+            outcomes[i] = ("ok", flights.do(key, gated))
+        except Exception as e:
+            outcomes[i] = ("error", e)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flights.stats()["coalesced"] < CALLERS - 1 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    def download():
+        calls.append(1)
+        return object()
+
+    outcomes = _run_concurrently(flights, "AAPL", download)
+
+    assert len(calls) == 1
+    assert {kind for kind, _ in outcomes} == {"ok"}
+    assert len({id(value) for _, value in outcomes}) == 1
+    assert flights.stats() == {"executed": 1, "coalesced": CALLERS - 1, "in_flight": 0}
+
+
+def test_error_reaches_every_waiter():
+    flights = SingleFlight()
+    error = ConnectionError("offline")
+
+    def download():
+        raise error
+
+    outcomes = _run_concurrently(flights, "AAPL", download)
+
+    assert outcomes == [("error", error)] * CALLERS
+    assert flights.in_flight() == []
+
+
+def test_next_call_after_completion_runs_again():
+    flights = SingleFlight()
+    assert flights.do("AAPL", lambda: 1) == 1
+    assert flights.do("AAPL", lambda: 2) == 2
+
+    def fail():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        flights.do("AAPL", fail)
+    assert flights.stats()["executed"] == 3
@@ -0,0 +1,82 @@
+import threading
+import time
+from datetime import date, timedelta
+import pandas as pd
+from app.core.config import settings
+from app.core.market_data import MarketDataHandle, SnapshotStore
+from app.engine.execution_team.workers.data_loader import DataLoader
+
+
+def _store(symbol: str, close: float, n: int = 5):
+    days = [date.today() - timedelta(days=n - i) for i in range(n)]
+    DataLoader()._store(pd.DataFrame({
+        "date": days, "open": close, "high": close, "low": close, "close": close,
+        "volume": 1000, "symbol": symbol,
+    }))
+
+
+def test_handle_is_served_from_memory_until_version_changes(db_pool):
+    _store("AAA", 1.0)
+    store = SnapshotStore(capacity=4)
+
+    handle = store.open("aaa")
+    assert (handle.symbol, handle.rows) == ("AAA", 5)
+    first = store.series(handle)
+    assert store.series(handle) is first
+    assert store.series("AAA") is first
+    assert store.stats()["loads"] == 1
+
+    # جلب جديد يغير الإصدار (last_fetch_at): الرمز النصي يقرأ اللقطة الجديدة
+    time.sleep(0.01)
+    _store("AAA", 2.0)
+    fresh = store.series("AAA")
+    assert fresh is not first and fresh["close"][-1] == 2.0
+    assert store.open("AAA") != handle
+    assert store.stats()["loads"] == 2
+
+
+def test_handle_equality_is_symbol_and_version():
+    assert MarketDataHandle("AAA", "v1", 5) == MarketDataHandle("AAA", "v1", 9)
+    assert MarketDataHandle("AAA", "v1") != MarketDataHandle("AAA", "v2")
+    assert len({MarketDataHandle("AAA", "v1"), MarketDataHandle("AAA", "v1")}) == 1
+
+
+def test_lru_eviction_at_capacity(db_pool, monkeypatch):
+    monkeypatch.setattr(settings, "SNAPSHOT_CAPACITY", 2)
+    for symbol in ("AAA", "BBB", "CCC"):
+        _store(symbol, 1.0)
+    store = SnapshotStore()
+    assert store.capacity == 2
+
+    store.open("AAA")
+    store.open("BBB")
+    store.open("AAA")          # AAA الأحدث استخداماً، BBB الأقدم
+    store.open("CCC")
+
+    stats = store.stats()
+    assert (stats["symbols"], stats["evictions"], stats["loads"]) == (2, 1, 3)
+    store.open("AAA")
+    assert store.stats()["loads"] == 3    # ما زال في الذاكرة
+    store.open("BBB")
+    assert store.stats()["loads"] == 4    # أُزيل وأُعيدت قراءته
+
+
+def test_concurrent_loads_are_coalesced(db_pool):
+    _store("AAA", 1.0)
+    store = SnapshotStore(capacity=4)
+    load = store._load
+
+    def slow_load(symbol, version):
+        time.sleep(0.2)      # يكفي لانضمام باقي الخيوط للقراءة الجارية
+        return load(symbol, version)
+
+    store._load = slow_load
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.series("AAA"))) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 6 and all(series is results[0] for series in results)
+    assert store.stats()["loads"] == 1
@@ -0,0 +1,37 @@
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app.core.llm_cache import LLMCacheStore, LLMResponseCache
+from app.core.tracing import traced
+
+
+def _model(tmp_path, replies: int):
+    usage = {"input_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+    messages = iter([AIMessage(content="رد", usage_metadata=usage) for _ in range(replies)])
+    store = LLMCacheStore(path=str(tmp_path / "llm_cache.sqlite"))
+    return GenericFakeChatModel(messages=messages, cache=LLMResponseCache("test", ttl=60, store=store))
+
+
+def _span(node) -> dict:
+    update = traced("node", node)({"symbol": "AAPL"})
+    return update["trace_spans"][0]["attributes"]
+
+
+def test_model_call_counted_with_tokens(tmp_path):
+    model = _model(tmp_path, replies=1)
+    attributes = _span(lambda state: {"answer": model.invoke("سؤال").content})
+    assert attributes["llm.calls"] == 1
+    assert attributes["node.external_calls"] == 1
+    assert attributes["llm.cache_hits"] == 0
+    assert attributes["llm.total_tokens"] == 15
+
+
+def test_cached_reply_is_not_counted_as_call(tmp_path):
+    model = _model(tmp_path, replies=1)
+    model.invoke("سؤال")  # خارج أي عقدة: يملأ الذاكرة
+
+    attributes = _span(lambda state: {"answer": model.invoke("سؤال").content})
+    assert attributes["llm.calls"] == 0
+    assert attributes["node.external_calls"] == 0
+    assert attributes["llm.cache_hits"] == 1
+    assert attributes["llm.total_tokens"] == 0